@@ -0,0 +1,137 @@
+# Admin endpoints (index lifecycle); guarded by ADMIN_TOKEN
+import os
+from typing import Optional, List
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from loguru import logger
+
+from . import profiling
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin routes are disabled unless ADMIN_TOKEN is set, and then require X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled (ADMIN_TOKEN not set)")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+class BuildRequest(BaseModel):
+    promote: bool = False
+
+
+class PromoteRequest(BaseModel):
+    version: str
+
+
+class ProfileRequest(BaseModel):
+    mode: str = profiling.SAMPLING  # sampling | cprofile
+    requests: Optional[int] = None  # stop after this many profiled requests
+    seconds: Optional[float] = None  # ... or after this long (capped at PROFILE_MAX_SECONDS)
+    interval_ms: Optional[float] = None  # sampling period (default PROFILE_INTERVAL_MS)
+    routes: Optional[List[str]] = None  # e.g. ["/find-recipe"]; default every route
+
+
+@router.get("/index")
+async def index_status(request: Request):
+    return request.app.state.index.status()
+
+
+@router.post("/index/build")
+async def index_build(body: BuildRequest, request: Request):
+    version = request.app.state.index.build(promote=body.promote)
+    logger.info(f"[Admin] index build started: {version} (promote={body.promote})")
+    return {"version": version, "status": "building"}
+
+
+@router.post("/index/promote")
+async def index_promote(body: PromoteRequest, request: Request):
+    index = request.app.state.index
+    build = index.builds.get(body.version)
+    if build and build.get("status") != "ready":
+        raise HTTPException(status_code=409, detail=f"Version {body.version} is {build.get('status')}")
+    try:
+        # loading the new version happens off the event loop so live requests keep flowing
+        serving = await run_in_threadpool(index.promote, body.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"serving": serving.version}
+
+
+@router.post("/index/rollback")
+async def index_rollback(request: Request):
+    try:
+        serving = await run_in_threadpool(request.app.state.index.rollback)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"serving": serving.version}
+
+
+@router.post("/index/shards/{shard}/rebuild")
+async def index_rebuild_shard(shard: int, request: Request):
+    rag = request.app.state.index.current.rag
+    try:
+        chunks = await run_in_threadpool(rag.rebuild_shard, shard)
+    except (ValueError, IndexError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"shard": shard, "chunks": chunks}
+
+
+@router.get("/watcher")
+async def watcher_status(request: Request):
+    watcher = request.app.state.watcher
+    if watcher is None:
+        raise HTTPException(status_code=404, detail="Recipe watcher not running (set WATCH_RECIPES=true)")
+    return watcher.stats()
+
+
+
+@router.post("/profile")
+async def profile_start(body: ProfileRequest, request: Request):
+    """Profile this worker's next N requests and/or a time window."""
+    if body.requests is not None and body.requests <= 0:
+        raise HTTPException(status_code=400, detail="requests must be > 0")
+    try:
+        session = profiling.start(request.app, mode=body.mode, requests=body.requests, seconds=body.seconds,
+                                  interval_ms=body.interval_ms, routes=body.routes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.status()
+
+
+@router.get("/profile")
+async def profile_status():
+    """The running session, or the last finished one with its per-endpoint summary."""
+    session = profiling.current()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile session yet")
+    return session.status()
+
+
+@router.post("/profile/stop")
+async def profile_stop():
+    session = await run_in_threadpool(profiling.stop)
+    if session is None:
+        raise HTTPException(status_code=409, detail="No profile session running")
+    return session.status()
+
+
+@router.get("/profile/{session_id}/{filename}")
+async def profile_file(session_id: str, filename: str):
+    """Download a .pstats / .collapsed / summary.json file of a finished session."""
+    path = os.path.join(profiling.PROFILE_DIR, session_id, filename)
+    root = os.path.abspath(profiling.PROFILE_DIR)
+    if not os.path.abspath(path).startswith(root + os.sep) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile file not found")
+    return FileResponse(path, filename=f"{session_id}-{filename}")
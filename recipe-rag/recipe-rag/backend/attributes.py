@@ -0,0 +1,169 @@
+# Structured recipe attributes extracted at index time (diet, cuisine, time, ingredients)
+import os
+import re
+from typing import List, Dict, Any, Optional, Iterable, Set
+
+from .tools import extract_ingredients_from_text
+from .chunkers import split_sections
+from .shopping_list import structured_ingredients
+
+MEAT_FISH = [
+    "chicken", "beef", "pork", "bacon", "pancetta", "ham", "sausage", "turkey", "lamb", "veal",
+    "prosciutto", "salami", "pepperoni", "chorizo", "duck", "fish", "salmon", "tuna", "cod",
+    "shrimp", "prawn", "crab", "lobster", "anchov", "clam", "mussel", "scallop", "gelatin",
+]
+ANIMAL_PRODUCTS = [
+    "egg", "milk", "butter", "cheese", "cream", "yogurt", "yoghurt", "honey", "parmesan",
+    "mozzarella", "ricotta", "feta", "cheddar", "mayonnaise", "ghee", "buttermilk",
+]
+# Non-animal ingredients that contain an animal keyword
+ANIMAL_EXCEPTIONS = ["peanut butter", "almond milk", "oat milk", "soy milk", "coconut milk",
+                     "coconut cream", "eggplant", "vegan", "cream of tartar", "fish sauce free"]
+
+CUISINE_KEYWORDS = {
+    "italian": ["spaghetti", "pasta", "penne", "ziti", "lasagna", "risotto", "parmesan", "mozzarella",
+                "basil", "oregano", "pesto", "marinara", "prosciutto", "ricotta", "pizza"],
+    "mexican": ["tortilla", "salsa", "taco", "jalapeno", "jalapeño", "cilantro", "enchilada",
+                "quesadilla", "chili powder", "black beans", "guacamole"],
+    "indian": ["curry", "garam masala", "turmeric", "cumin seeds", "naan", "paneer", "dal", "ghee"],
+    "asian": ["soy sauce", "sesame", "ginger", "rice vinegar", "fish sauce", "hoisin", "noodles",
+              "tofu", "sriracha", "fried rice"],
+    "mediterranean": ["feta", "chickpea", "hummus", "tahini", "olives", "couscous", "quinoa"],
+}
+
+# longest recipe id list an ingredient filter may push into `where`; larger sets are applied after the query
+INGREDIENT_FILTER_MAX_IDS = int(os.getenv("INGREDIENT_FILTER_MAX_IDS", 500))
+
+_TIME_LINE = re.compile(r"(prep|cook|total)\s*time\s*:?\s*(.+)", re.I)
+_DURATION = re.compile(r"(\d+)(?:\s*-\s*(\d+))?\s*(hours?|hrs?|minutes?|mins?)\b", re.I)
+
+
+def _minutes(text: str) -> int:
+    total = 0
+    for lo, hi, unit in _DURATION.findall(text):
+        n = int(hi or lo)
+        total += n * 60 if unit.lower().startswith(("h",)) else n
+    return total
+
+
+def _keyword_pattern(keywords: List[str]):
+    # match at word starts so "ham" does not hit "graham"
+    return re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + ")")
+
+
+_MEAT_FISH_RE = _keyword_pattern(MEAT_FISH)
+_ANIMAL_PRODUCTS_RE = _keyword_pattern(ANIMAL_PRODUCTS)
+
+
+def _has_any(ingredients: Iterable[str], pattern, exceptions: List[str] = ()) -> bool:
+    for ing in ingredients:
+        if any(x in ing for x in exceptions):
+            continue
+        if pattern.search(ing):
+            return True
+    return False
+
+
+def recipe_ingredients(text: str) -> List[str]:
+    """Ingredient names from the Ingredients section only (instruction lines excluded)."""
+    block = next((body for name, body in split_sections(text) if name == "ingredients"), None)
+    return extract_ingredients_from_text(block if block is not None else text)
+
+
+def extract_recipe_attributes(text: str) -> Dict[str, Any]:
+    sections = dict(split_sections(text))
+    title = sections.get("title", "").splitlines()[0] if sections.get("title") else ""
+    title = re.sub(r"^(#+\s*|title\s*:\s*)", "", title.strip(), flags=re.I).strip("* ")
+    ingredients = recipe_ingredients(text)
+
+    # explicit "Prep Time / Cook Time" lines win; otherwise add up durations in the instructions
+    # (None means no timing information was found)
+    explicit = [m.group(2) for m in (_TIME_LINE.search(l) for l in text.splitlines()) if m]
+    total_time = sum(_minutes(t) for t in explicit) if explicit else _minutes(sections.get("instructions", ""))
+    total_time = total_time or None
+
+    haystack = " ".join(ingredients + [title.lower()])
+    scores = {c: sum(1 for k in kws if k in haystack) for c, kws in CUISINE_KEYWORDS.items()}
+    cuisine = max(scores, key=scores.get) if any(scores.values()) else "other"
+
+    vegetarian = not _has_any(ingredients, _MEAT_FISH_RE, ANIMAL_EXCEPTIONS)
+    return {
+        "title": title,
+        "ingredients": ingredients,
+        "vegetarian": vegetarian,
+        "vegan": vegetarian and not _has_any(ingredients, _ANIMAL_PRODUCTS_RE, ANIMAL_EXCEPTIONS),
+        "cuisine": cuisine,
+        "total_time": total_time,
+        "n_ingredients": len(ingredients),
+        # quantities/units parsed once for the shopping-list engine
+        "structured_ingredients": structured_ingredients(text),
+    }
+
+
+def chunk_metadata(recipe_id: str, attrs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Scalar subset stored on every chunk (Chroma metadata values must be str/int/float/bool).
+    Unknown total_time is left out, so a max_total_time filter never matches it.
+    """
+    meta = {
+        "recipe_id": recipe_id,
+        "vegetarian": bool(attrs.get("vegetarian", False)),
+        "vegan": bool(attrs.get("vegan", False)),
+        "cuisine": attrs.get("cuisine", "other"),
+        "n_ingredients": int(attrs.get("n_ingredients", 0)),
+    }
+    if attrs.get("total_time"):
+        meta["total_time"] = int(attrs["total_time"])
+    return meta
+
+
+class IngredientIndex:
+    """Inverted index ingredient -> recipe ids, used to resolve ingredient filters to an id set."""
+
+    def __init__(self, recipe_attrs: Dict[str, Dict[str, Any]]):
+        self.all: Set[str] = set(recipe_attrs)
+        self.postings: Dict[str, Set[str]] = {}
+        for rid, attrs in recipe_attrs.items():
+            for ing in attrs.get("ingredients", []):
+                self.postings.setdefault(ing, set()).add(rid)
+
+    def recipes_with(self, term: str) -> Set[str]:
+        # same containment rule as ingredient_matcher_tool (u in r or r in u)
+        term = term.lower().strip()
+        out: Set[str] = set()
+        for ing, rids in self.postings.items():
+            if term in ing or ing in term:
+                out |= rids
+        return out
+
+    def allowed(self, include: Iterable[str] = (), exclude: Iterable[str] = ()) -> Set[str]:
+        allowed = set(self.all)
+        for term in include:
+            allowed &= self.recipes_with(term)
+        for term in exclude:
+            allowed -= self.recipes_with(term)
+        return allowed
+
+
+def build_where(filters: Dict[str, Any], allowed_ids: Optional[Set[str]] = None,
+                excluded_ids: Optional[Set[str]] = None) -> Optional[Dict[str, Any]]:
+    """Translate search filters into a Chroma `where` clause (allowed/excluded_ids: recipe_id $in / $nin)."""
+    clauses = []
+    for key in ("vegetarian", "vegan"):
+        if filters.get(key) is not None:
+            clauses.append({key: {"$eq": bool(filters[key])}})
+    if filters.get("cuisine"):
+        clauses.append({"cuisine": {"$eq": filters["cuisine"].lower()}})
+    if filters.get("max_total_time") is not None:
+        # $gt 0 also skips chunks of indexes built when unknown time was stored as 0
+        clauses.append({"total_time": {"$gt": 0}})
+        clauses.append({"total_time": {"$lte": int(filters["max_total_time"])}})
+    if filters.get("max_ingredients") is not None:
+        clauses.append({"n_ingredients": {"$lte": int(filters["max_ingredients"])}})
+    if allowed_ids is not None:
+        clauses.append({"recipe_id": {"$in": sorted(allowed_ids)}})
+    if excluded_ids:
+        clauses.append({"recipe_id": {"$nin": sorted(excluded_ids)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,126 @@
+# Workload capture: one JSON line per request (arrival time + full body) for offline replay,
+# and the parser that reads captures and request logs back
+import os
+import re
+import json
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+from loguru import logger
+
+# JSONL path; empty disables capture
+CAPTURE_FILE = os.getenv("CAPTURE_FILE", "")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))
+# bodies longer than this are marked truncated (and skipped on replay)
+CAPTURE_BODY_MAX_BYTES = int(os.getenv("CAPTURE_BODY_MAX_BYTES", 65536))
+# path prefixes never captured (scrapes, admin operations)
+CAPTURE_EXCLUDE = tuple(p for p in os.getenv("CAPTURE_EXCLUDE", "/metrics,/admin,/docs,/openapi.json").split(",") if p)
+
+
+class CaptureWriter:
+    """Appends request records on a background thread; a full queue drops records rather than blocking."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._writer, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"[Capture] queue full, {self.dropped} records dropped so far")
+
+    def _writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_writer: Optional[CaptureWriter] = None
+_writer_lock = threading.Lock()
+
+
+def capture_enabled(path: str) -> bool:
+    return bool(CAPTURE_FILE) and not path.startswith(CAPTURE_EXCLUDE)
+
+
+def get_writer() -> Optional[CaptureWriter]:
+    global _writer
+    if _writer is None and CAPTURE_FILE:
+        with _writer_lock:
+            if _writer is None:
+                _writer = CaptureWriter(CAPTURE_FILE)
+                logger.info(f"[Capture] recording requests to {CAPTURE_FILE} (sample_rate={CAPTURE_SAMPLE_RATE})")
+    return _writer
+
+
+# loguru's default text format, as logs/backend.log is written without LOG_JSON
+_LOG_LINE = re.compile(
+    r"^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}) \| \w+\s*\| .*? - \[API\] "
+    r"(?P<method>[A-Z]+) (?P<path>\S+) status=(?P<status>\d+) time_ms=(?P<ms>[\d.]+) body=(?P<body>.*)$"
+)
+_TRUNCATED = re.compile(r"\.\.\.\(\+\d+ bytes\)$")
+
+
+def _split_path(path: str):
+    path, _, query = path.partition("?")
+    return path, query
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    One request from a capture record, a LOG_JSON (loguru serialize) record or a plain
+    backend.log line; None for anything else. Log lines are written when the response
+    finishes, so the arrival time is the log time minus the duration.
+    """
+    line = line.rstrip("\n")
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        if "ts" in data and "method" in data:  # capture file (or a saved workload)
+            return data
+        extra = data.get("record", {}).get("extra", {})
+        if "method" not in extra or "body" not in extra:
+            return None
+        path, query = _split_path(extra["path"])
+        body = extra["body"] or ""
+        return {
+            "ts": data["record"]["time"]["timestamp"] - extra["duration_ms"] / 1000,
+            "method": extra["method"], "path": path, "query_string": query,
+            "body": body,
+            "truncated": bool(_TRUNCATED.search(body)) or extra.get("req_bytes", 0) > len(body.encode("utf-8")),
+            "status": extra["status"], "duration_ms": extra["duration_ms"],
+        }
+    m = _LOG_LINE.match(line)
+    if not m:
+        return None
+    body = m["body"]
+    truncated = bool(_TRUNCATED.search(body))
+    path, query = _split_path(m["path"])
+    ended = datetime.strptime(m["time"], "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    return {
+        "ts": ended - float(m["ms"]) / 1000,
+        "method": m["method"], "path": path, "query_string": query,
+        "body": body, "truncated": truncated,
+        "status": int(m["status"]), "duration_ms": float(m["ms"]),
+    }
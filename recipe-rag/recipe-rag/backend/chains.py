@@ -1,11 +1,66 @@
 # Final ranking logic + tools
 import os
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 from loguru import logger
 
 from .rag import RecipeRAG
-from .tools import ingredient_matcher_tool, shopping_list_tool, recipe_search_tool
+from .metrics import timed
+from .tracing import span
+from .tools import ingredient_matcher_tool, shopping_list_tool, recipe_search_tool, extract_ingredients_from_text
+
+
+def ingredient_containment(user_ingredients: List[str], vocab: List[str]) -> np.ndarray:
+    """U[i, v] = user ingredient i matches vocab ingredient v (u in r or r in u, as ingredient_matcher_tool)."""
+    users = [u.lower().strip() for u in user_ingredients]
+    U = np.zeros((len(users), len(vocab)), dtype=bool)
+    for i, u in enumerate(users):
+        for v, r in enumerate(vocab):
+            if u in r or r in u:
+                U[i, v] = True
+    return U
+
+
+def rerank_candidates(query_emb: np.ndarray, recipe_embs: np.ndarray, recipe_ings: List[List[str]],
+                      user_ingredients: List[str], weights: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Score all candidate recipes at once.
+    - embedding: cosine(query, recipe embedding)               (R,)
+    - coverage:  matched user ingredients / recipe ingredients (R,)
+    - missing:   recipe ingredients no user ingredient covers  (R,)
+    final = F @ weights with F = [embedding, coverage, missing] (R x 3).
+    """
+    R = len(recipe_ings)
+    vocab_index: Dict[str, int] = {}
+    rows, cols = [], []
+    for r, ings in enumerate(recipe_ings):
+        for ing in ings:
+            rows.append(r)
+            cols.append(vocab_index.setdefault(ing, len(vocab_index)))
+    M = np.zeros((R, len(vocab_index)), dtype=np.float32)
+    M[rows, cols] = 1.0
+    with timed("ingredient_match"):
+        U = ingredient_containment(user_ingredients, list(vocab_index)).astype(np.float32)
+
+    n_ing = M.sum(axis=1)
+    matched = M @ U.T > 0                       # (R, n_user): user ingredient i used by recipe r
+    covered = M * (U.sum(axis=0) > 0)           # (R, V): recipe ingredient covered by some user ingredient
+    coverage = matched.sum(axis=1) / np.maximum(1.0, n_ing)
+    missing = n_ing - covered.sum(axis=1)
+
+    norms = np.linalg.norm(recipe_embs, axis=1) + 1e-12
+    embedding = (recipe_embs @ query_emb) / norms
+
+    F = np.stack([embedding, coverage, missing], axis=1)
+    return {
+        "final": F @ weights,
+        "embedding": embedding,
+        "coverage": coverage,
+        "missing": missing,
+        "matched": matched,
+        "covered": covered.astype(bool),
+        "vocab_index": vocab_index,
+    }
 
 
 class RecipeChain:
@@ -13,67 +68,138 @@ class RecipeChain:
         self.rag = rag or RecipeRAG()
         self.alpha = float(os.getenv("RERANK_EMBED_WEIGHT", 0.75))
         self.beta = float(os.getenv("RERANK_ING_WEIGHT", 0.25))
+        # penalty per recipe ingredient the user lacks (0 keeps the original alpha/beta ranking)
+        self.gamma = float(os.getenv("RERANK_MISSING_WEIGHT", 0.0))
         self.top_k_raw = int(os.getenv("RERANK_TOPK_RAW", 5))
+        self.top_n = int(os.getenv("RERANK_TOP_N", 3))
         self.tools = [
             ingredient_matcher_tool,
             shopping_list_tool,
             recipe_search_tool
         ]
 
-    def run(self, ingredients: List[str]) -> Dict[str, Any]:
+    @property
+    def weights(self) -> np.ndarray:
+        return np.array([self.alpha, self.beta, -self.gamma], dtype=np.float32)
+
+    def _recipe_embeddings(self, recipe_names: List[str], chunk_ids: List[List[str]], texts: List[str]) -> np.ndarray:
+        """Mean of stored chunk vectors per recipe; one batched embed() call if the store can't return them."""
+        flat = [cid for ids in chunk_ids for cid in ids]
+        stored = {}
+        try:
+            stored = self.rag.store.get_embeddings(flat)
+        except Exception as e:
+            logger.warning(f"[Chain] stored embeddings unavailable, re-embedding candidates: {e}")
+        if stored and all(cid in stored for cid in flat):
+            owner = np.repeat(np.arange(len(recipe_names)), [len(ids) for ids in chunk_ids])
+            E = np.asarray([stored[cid] for cid in flat], dtype=np.float32)
+            E = E / (np.linalg.norm(E, axis=1, keepdims=True) + 1e-12)
+            out = np.zeros((len(recipe_names), E.shape[1]), dtype=np.float32)
+            np.add.at(out, owner, E)
+            return out
+        return np.asarray(self.rag.embedder.embed(texts), dtype=np.float32)
+
+    def retrieve(self, ingredients: List[str], top_n: int = None):
+        """Embed the ingredient query and fetch the nearest max(top_k_raw, top_n) distinct recipes with their chunks."""
         query = " ".join(ingredients)
         logger.info(f"[Chain] Running chain for query: {query}")
+        top_n = top_n or self.top_n
 
-        # embed query
-        query_emb = self.rag.embedder.embed([query])[0]
-        # Convert numpy array to list if needed
-        if hasattr(query_emb, 'tolist'):
-            query_emb = query_emb.tolist()
-        query_emb = np.array(query_emb)
-        query_emb = query_emb / (np.linalg.norm(query_emb) + 1e-12)
-
-        # retrieve
-        retrieved = self.rag.store.query(query_emb.tolist(), top_k=self.top_k_raw)
-        logger.info(f"[Chain] Retrieved {len(retrieved)} candidate chunks")
+        with span("chain.retrieve", ingredients=len(ingredients)) as s:
+            # embed query
+            query_emb = self.rag.embedder.embed([query])[0]
+            # Convert numpy array to list if needed
+            if hasattr(query_emb, 'tolist'):
+                query_emb = query_emb.tolist()
+            query_emb = np.array(query_emb, dtype=np.float32)
+            query_emb = query_emb / (np.linalg.norm(query_emb) + 1e-12)
 
-        if not retrieved:
-            return {"error": "No recipes found"}
+            # retrieve whole recipes, so a recipe with many matching chunks can't crowd out the others
+            recipes = self.rag._search_collapsed(query_emb.tolist(), max(self.top_k_raw, top_n), chunks=True)
+            s.set(recipes=len(recipes), chunks=sum(len(r["chunks"]) for r in recipes))
+        logger.info(f"[Chain] Retrieved {len(recipes)} candidate recipes")
 
-        # group by filename
         groups = {}
-        for chunk_id, score, chunk_text in retrieved:
-            recipe_name = chunk_id.split("::")[0]
-            groups.setdefault(recipe_name, {"ids": [], "texts": []})
-            groups[recipe_name]["ids"].append(chunk_id)
-            groups[recipe_name]["texts"].append(chunk_text)
-
-        reranked = []
-        for recipe_name, info in groups.items():
-            # average embedding for recipe: try to get chunk embeddings from metadata file via rag.store? (not stored in chroma_meta to save space).
-            # fallback: embed the concatenated texts (cheap because groups are small)
-            avg_emb = np.asarray(self.rag.embedder.embed(["\n".join(info["texts"])])).mean(axis=0)
-            avg_emb = avg_emb / (np.linalg.norm(avg_emb) + 1e-12)
-            embed_score = float(np.dot(query_emb, avg_emb))
-
-            full_text = "\n".join(info["texts"])
-            matches, recipe_ing = ingredient_matcher_tool(ingredients, full_text)
-            ing_score = len(matches) / max(1, len(recipe_ing))
-
-            final_score = self.alpha * embed_score + self.beta * ing_score
-            reranked.append((final_score, recipe_name, full_text, matches, recipe_ing))
-
-        reranked.sort(key=lambda x: x[0], reverse=True)
-        best_score, best_recipe_id, best_text, matched_ing, all_ing = reranked[0]
-        missing = shopping_list_tool(ingredients, best_text)
+        for r in recipes:
+            groups[r["recipe_id"]] = {"ids": [c[0] for c in r["chunks"]], "texts": [c[2] for c in r["chunks"]],
+                                      "distance": r["distance"]}
+        return query_emb, groups
 
+    def rerank(self, ingredients: List[str], query_emb: np.ndarray, groups: Dict[str, Dict[str, Any]],
+               top_n: int = None) -> Iterator[Dict[str, Any]]:
+        """Score all candidates at once, then build the ranked result dicts one at a time."""
+        top_n = top_n or self.top_n
+        names = list(groups)
+        texts = ["\n".join(groups[n]["texts"]) for n in names]
+        # precomputed ingredient lists from index time; fall back to parsing the retrieved text
+        recipe_ings = []
+        # the span closes before the first yield, so it never straddles a streamed response
+        with span("chain.rerank", candidates=len(names), top_n=top_n):
+            with timed("ingredient_extract"):
+                for name, text in zip(names, texts):
+                    attrs = self.rag.recipe_attrs.get(name)
+                    recipe_ings.append(attrs["ingredients"] if attrs else extract_ingredients_from_text(text))
+
+            recipe_embs = self._recipe_embeddings(names, [groups[n]["ids"] for n in names], texts)
+            with timed("rerank"):
+                scores = rerank_candidates(query_emb, recipe_embs, recipe_ings, ingredients, self.weights)
+
+        order = np.argsort(-scores["final"], kind="stable")[:top_n]
+        users = [u.lower().strip() for u in ingredients]
+        vocab_index = scores["vocab_index"]
+        for r in order:
+            yield {
+                "recipe_id": names[r],
+                "score": float(scores["final"][r]),
+                "scores": {
+                    "embedding": float(scores["embedding"][r]),
+                    "ingredient_coverage": float(scores["coverage"][r]),
+                    "missing_count": int(scores["missing"][r]),
+                },
+                "recipe": texts[r],
+                "matched_ingredients": sorted({users[i] for i in np.flatnonzero(scores["matched"][r])}),
+                "missing_ingredients": [ing for ing in recipe_ings[r]
+                                        if not scores["covered"][r, vocab_index[ing]]],
+            }
+
+    def run(self, ingredients: List[str], top_n: int = None) -> Dict[str, Any]:
+        top_n = top_n or self.top_n
+        # the re-rank settings are part of the key: sweeps change them on a live chain
+        key = ("chain", tuple(ingredients), top_n, self.top_k_raw, self.alpha, self.beta, self.gamma)
+        return self.rag.cached(key, lambda: self._run(ingredients, top_n))
+
+    def _run(self, ingredients: List[str], top_n: int) -> Dict[str, Any]:
+        with span("chain.run", ingredients=len(ingredients)) as s:
+            query_emb, groups = self.retrieve(ingredients, top_n)
+            if not groups:
+                s.set(results=0)
+                return {"error": "No recipes found"}
+            results = list(self.rerank(ingredients, query_emb, groups, top_n))
+            s.set(results=len(results))
+
+        best = results[0]
         return {
-            "recipe_id": best_recipe_id,
-            "score": best_score,
-            "recipe": best_text,
-            "matched_ingredients": matched_ing,
-            "missing_ingredients": missing,
+            "recipe_id": best["recipe_id"],
+            "score": best["score"],
+            "recipe": best["recipe"],
+            "matched_ingredients": best["matched_ingredients"],
+            "missing_ingredients": best["missing_ingredients"],
+            "results": results,
         }
-        
+
+    def run_stream(self, ingredients: List[str], top_n: int = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        run() as events: ("candidates", ...) as soon as retrieval finishes, then one
+        ("result", ...) per reranked recipe, best first.
+        """
+        query_emb, groups = self.retrieve(ingredients, top_n)
+        if not groups:
+            yield "error", {"error": "No recipes found"}
+            return
+        yield "candidates", {"candidates": [{"recipe_id": n, "distance": g["distance"]} for n, g in groups.items()]}
+        for rank, item in enumerate(self.rerank(ingredients, query_emb, groups, top_n)):
+            yield "result", dict(item, rank=rank)
+
     def rank_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Apply final ranking logic to search results"""
         # Sort by relevance score (highest first)
@@ -0,0 +1,158 @@
+# Pluggable recipe chunkers (fixed window / section-aware)
+import os
+import re
+from typing import List, Tuple, Dict, Callable
+
+CHUNKER = os.getenv("CHUNKER", "fixed")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 800))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 100))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 512))
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with cl100k_base when tiktoken is installed, else the ~4 chars/token heuristic."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+class FixedWindowChunker:
+    """
+    Original chunker: fixed character windows with overlap.
+    Cuts anywhere, including mid-line inside ingredient lists.
+    """
+    name = "fixed"
+
+    def __init__(self, size: int = None, overlap: int = None):
+        self.size = size or CHUNK_SIZE
+        self.overlap = CHUNK_OVERLAP if overlap is None else overlap
+
+    def __call__(self, text: str) -> List[str]:
+        text = text.strip()
+        if not text:
+            return []
+        chunks = []
+        i = 0
+        L = len(text)
+        while i < L:
+            end = min(i + self.size, L)
+            chunks.append(text[i:end])
+            if end == L:
+                break
+            i = end - self.overlap
+        return chunks
+
+
+# Section headers, matched after stripping markdown decoration ("# ", "*...*").
+SECTION_PATTERNS = [
+    ("title", re.compile(r"^title\s*:", re.I)),
+    ("ingredients", re.compile(r"^ingredients\b", re.I)),
+    ("instructions", re.compile(r"^(instructions|directions|method|steps|preparation)\b", re.I)),
+]
+
+
+def _section_of(line: str):
+    s = line.strip().strip("*#_ ").strip()
+    for name, pat in SECTION_PATTERNS:
+        if pat.match(s):
+            return name
+    return None
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a recipe into (section_name, text) blocks using the same
+    Title / Ingredients / Instructions headers extract_ingredients_from_text
+    relies on. Text before the first recognised header is treated as the title
+    block (covers "# Recipe Title" markdown files).
+    """
+    sections: List[Tuple[str, List[str]]] = []
+    current, buf = "title", []
+    for line in text.strip().splitlines():
+        name = _section_of(line)
+        if name and name != "title" and buf:
+            sections.append((current, buf))
+            current, buf = name, []
+        elif name == "title" and buf and current != "title":
+            sections.append((current, buf))
+            current, buf = "title", []
+        buf.append(line.rstrip())
+    if buf:
+        sections.append((current, buf))
+    return [(name, "\n".join(lines).strip()) for name, lines in sections if "\n".join(lines).strip()]
+
+
+class SectionChunker:
+    """
+    Section-aware chunker:
+    - keeps Title / Ingredients / Instructions blocks whole,
+    - packs consecutive sections into one chunk up to max_tokens,
+    - splits an oversized section on line boundaries only,
+    - no overlap; each split-off chunk is prefixed with the recipe title for context.
+    """
+    name = "section"
+
+    def __init__(self, max_tokens: int = None):
+        self.max_tokens = max_tokens or CHUNK_MAX_TOKENS
+
+    def _split_lines(self, block: str, budget: int) -> List[str]:
+        parts, buf, used = [], [], 0
+        for line in block.splitlines():
+            t = count_tokens(line) + 1
+            if buf and used + t > budget:
+                parts.append("\n".join(buf))
+                buf, used = [], 0
+            buf.append(line)
+            used += t
+        if buf:
+            parts.append("\n".join(buf))
+        return parts
+
+    def __call__(self, text: str) -> List[str]:
+        text = text.strip()
+        if not text:
+            return []
+        sections = split_sections(text)
+        title = next((body.splitlines()[0] for name, body in sections if name == "title"), "")
+        title_tokens = count_tokens(title) + 1 if title else 0
+
+        chunks: List[str] = []
+        buf: List[str] = []
+        used = 0
+        for _, body in sections:
+            t = count_tokens(body) + 1
+            if buf and used + t > self.max_tokens:
+                chunks.append("\n\n".join(buf))
+                buf, used = [], 0
+            if t > self.max_tokens:
+                for part in self._split_lines(body, self.max_tokens - title_tokens):
+                    chunks.append(part if not title or part.startswith(title) else f"{title}\n{part}")
+                continue
+            if not buf and chunks and title and not body.startswith(title):
+                buf.append(title)
+                used += title_tokens
+            buf.append(body)
+            used += t
+        if buf:
+            chunks.append("\n\n".join(buf))
+        return chunks
+
+
+CHUNKERS: Dict[str, Callable[..., Callable[[str], List[str]]]] = {
+    FixedWindowChunker.name: FixedWindowChunker,
+    SectionChunker.name: SectionChunker,
+}
+
+
+def get_chunker(name: str = None, **kwargs) -> Callable[[str], List[str]]:
+    """Instantiate a chunker by name (CHUNKER env var by default)."""
+    name = (name or CHUNKER).lower()
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown chunker '{name}' (available: {', '.join(CHUNKERS)})")
+    return CHUNKERS[name](**kwargs)
@@ -2,27 +2,95 @@
 import os
 import math
 import time
-from typing import List
+import threading
+import contextvars
+from collections import OrderedDict
+from typing import Any, List, Optional
 from loguru import logger
 from dotenv import load_dotenv
 
+from .metrics import timed, EMBED_CALLS, EMBED_TEXTS, EMBED_TOKENS, EMBED_CACHE, EMBED_ERRORS
+from .tracing import span, add_event
+from .hash_embeddings import hash_embed
+
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+# optional OpenAI-compatible endpoint (e.g. benchmarks/load/fake_openai.py for load tests)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 OPENAI_BATCH_SIZE = int(os.getenv("OPENAI_BATCH_SIZE", 32))
 OPENAI_RETRY_SECONDS = float(os.getenv("OPENAI_RETRY_SECONDS", 1.0))
+# in-memory LRU of text -> vector (repeated queries skip the API); 0 disables
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", 2048))
+# openai | hash (offline feature hashing for scale/load tests; no key, no network)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openai").lower()
+EMBED_HASH_DIM = int(os.getenv("EMBED_HASH_DIM", 384))
+
+# set in the calling context whenever embed() hands out placeholder (all-zero) vectors;
+# RecipeRAG.cached resets it per computation and never caches a result that saw a failure
+embed_failed: contextvars.ContextVar[bool] = contextvars.ContextVar("embed_failed", default=False)
+
+
+def _placeholders(n: int) -> List[List[float]]:
+    embed_failed.set(True)
+    return [[0.0] * 1536 for _ in range(n)]
+
+
+if EMBED_BACKEND not in ("openai", "hash"):
+    raise RuntimeError(f"Unknown EMBED_BACKEND '{EMBED_BACKEND}' (openai | hash)")
+
+client = None
+if EMBED_BACKEND == "openai":
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY missing in environment (.env)")
+
+    try:
+        from openai import OpenAI
+    except Exception as e:
+        raise RuntimeError("Install the official openai package: pip install openai") from e
+
+    # Initialize OpenAI client
+    client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL) if OPENAI_API_KEY and OPENAI_API_KEY != "your_openai_api_key_here" else None
+
 
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY missing in environment (.env)")
+class LRUCache:
+    """Thread-safe LRU; embeddings are keyed by (model, text)."""
 
-try:
-    from openai import OpenAI
-except Exception as e:
-    raise RuntimeError("Install the official openai package: pip install openai") from e
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY and OPENAI_API_KEY != "your_openai_api_key_here" else None
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> list:
+        """Keys, most recently used first."""
+        with self._lock:
+            return list(reversed(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+
+# shared by every Embedder in the process (index versions come and go, queries repeat)
+_cache = LRUCache(EMBED_CACHE_SIZE) if EMBED_CACHE_SIZE > 0 else None
 
 
 class Embedder:
@@ -30,12 +98,19 @@ class Embedder:
     Official OpenAI embedder (text-embedding-3-*).
     - Batches inputs to avoid hitting request size limits.
     - Retries on transient errors with exponential backoff.
+    - Serves repeated texts from an in-memory LRU (EMBED_CACHE_SIZE).
+    - EMBED_BACKEND=hash swaps the API for offline feature hashing (scale and load tests).
+    - When the API is unavailable it returns all-zero vectors and sets embed_failed.
     """
 
     def __init__(self, model: str = None):
-        self.model = model or OPENAI_EMBED_MODEL
+        self.backend = EMBED_BACKEND
+        self.model = model or (f"hash-{EMBED_HASH_DIM}" if self.backend == "hash" else OPENAI_EMBED_MODEL)
         self.client = client
-        if self.client is None:
+        self.cache = _cache
+        if self.backend == "hash":
+            logger.info(f"[Embedder] Using offline hash embeddings (dim={EMBED_HASH_DIM})")
+        elif self.client is None:
             logger.warning(f"[Embedder] OpenAI API key not configured - embeddings will not work")
         else:
             logger.info(f"[Embedder] Using OpenAI embed model: {self.model}")
@@ -43,12 +118,37 @@ class Embedder:
     def embed(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
+
+        if self.backend == "hash":
+            # cheaper to recompute than to cache
+            with timed("embed"), span("embedder.embed", texts=len(texts), model=self.model):
+                EMBED_TEXTS.inc(amount=len(texts))
+                return hash_embed(texts, EMBED_HASH_DIM).tolist()
         
         if self.client is None:
             logger.error("[Embedder] OpenAI client not configured")
             # Return dummy embeddings for testing
-            return [[0.0] * 1536 for _ in texts]
+            return _placeholders(len(texts))
+
+        with timed("embed"), span("embedder.embed", texts=len(texts), model=self.model) as s:
+            if self.cache is None:
+                return self._embed_batches(texts) or _placeholders(len(texts))
+            out = [self.cache.get((self.model, t)) for t in texts]
+            missing = [i for i, v in enumerate(out) if v is None]
+            s.set(cache_hits=len(texts) - len(missing))
+            EMBED_CACHE.inc("hit", amount=len(texts) - len(missing))
+            if missing:
+                EMBED_CACHE.inc("miss", amount=len(missing))
+                fresh = self._embed_batches([texts[i] for i in missing])
+                if fresh is None:
+                    return _placeholders(len(texts))
+                for i, emb in zip(missing, fresh):
+                    out[i] = emb
+                    self.cache.put((self.model, texts[i]), emb)
+            return out
 
+    def _embed_batches(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """API calls in OPENAI_BATCH_SIZE batches; None once a batch has failed 5 times."""
         # simple batching
         out = []
         n = len(texts)
@@ -58,19 +158,27 @@ class Embedder:
             tries = 0
             while True:
                 try:
+                    EMBED_CALLS.inc()
                     resp = self.client.embeddings.create(model=self.model, input=chunk)
                     # response.data length equals len(chunk)
                     out.extend([d.embedding for d in resp.data])
+                    EMBED_TEXTS.inc(amount=len(chunk))
+                    usage = getattr(resp, "usage", None)
+                    tokens = (getattr(usage, "total_tokens", 0) or 0) if usage is not None else 0
+                    EMBED_TOKENS.inc(amount=tokens)
+                    add_event("embed.batch", texts=len(chunk), tokens=tokens, attempt=tries + 1)
                     break
                 except Exception as e:
+                    EMBED_ERRORS.inc()
                     tries += 1
                     sleep = OPENAI_RETRY_SECONDS * (2 ** (tries - 1))
+                    add_event("embed.retry", attempt=tries, error=str(e)[:200], backoff_s=sleep)
                     logger.warning(f"[Embedder] embedding batch failed (try={tries}) -> {e}. retrying in {sleep:.1f}s")
                     time.sleep(sleep)
                     if tries >= 5:
                         logger.error(f"OpenAI embedding failed after {tries} attempts: {e}")
-                        # Return dummy embeddings as fallback
-                        return [[0.0] * 1536 for _ in texts]
+                        # caller falls back to dummy embeddings
+                        return None
         return out
 
 
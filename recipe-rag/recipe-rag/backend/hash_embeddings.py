@@ -0,0 +1,31 @@
+# Offline embeddings: signed feature hashing (no API, no model download)
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def hash_embed(texts: List[str], dim: int) -> np.ndarray:
+    """
+    Words and word bigrams hashed (crc32) into dim signed buckets, rows L2-normalized.
+    Deterministic, and texts sharing words land close together, so retrieval over a
+    corpus ranks sensibly - good enough for load, scale and pipeline tests, not for quality.
+    """
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = tokenize(text)
+        for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            out[row, h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norms = np.linalg.norm(out, axis=1)
+    empty = norms == 0
+    out[empty, 0] = 1.0
+    norms[empty] = 1.0
+    return out / norms[:, None]
@@ -0,0 +1,270 @@
+# Versioned index builds with atomic promotion / rollback
+import os
+import json
+import time
+import shutil
+import threading
+from typing import Dict, Any, Optional, NamedTuple
+from loguru import logger
+
+from .rag import RecipeRAG, PERSIST_DIR
+from .chains import RecipeChain
+from .warmup import WARMUP_ENABLED, popular_queries, warm
+from .shared_index import INDEX_READ_ONLY, index_lock, export as export_shared
+
+INDEX_VERSIONS_DIR = os.getenv("INDEX_VERSIONS_DIR", os.path.join(PERSIST_DIR, "versions"))
+INDEX_POINTER_FILE = os.getenv("INDEX_POINTER_FILE", os.path.join(PERSIST_DIR, "CURRENT.json"))
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", 5))
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", 3))
+
+LEGACY_VERSION = "legacy"
+
+
+def read_pointer() -> Dict[str, Any]:
+    try:
+        with open(INDEX_POINTER_FILE, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"[Index] unreadable pointer file {INDEX_POINTER_FILE}: {e}")
+        return {}
+
+
+def prepare_index(recipe_dir: str = "../data/recipes") -> str:
+    """
+    Leader step of multi-worker serving (start_server.py --workers N): build or validate
+    the version the pointer file names (or the legacy index) once, under its lock, and
+    export its shared files for read-only workers. Returns the version.
+    """
+    version = read_pointer().get("current") or LEGACY_VERSION
+    path = PERSIST_DIR if version == LEGACY_VERSION else os.path.join(INDEX_VERSIONS_DIR, version)
+    with index_lock(path):
+        rag = RecipeRAG(recipe_dir=recipe_dir, persist_dir=path, read_only=False)
+        if version == LEGACY_VERSION:
+            rag.build_index()
+        if not rag.chunk_to_file:
+            raise RuntimeError(f"Index version '{version}' has no metadata (incomplete build?)")
+        export_shared(rag)
+    logger.info(f"[Index] prepared '{version}' for read-only workers ({len(rag.full_recipes)} recipes)")
+    return version
+
+
+class ServingIndex(NamedTuple):
+    """Everything a request needs, swapped as one reference."""
+    version: str
+    rag: RecipeRAG
+    chain: RecipeChain
+
+
+class IndexManager:
+    """
+    Owns the index a worker is serving.
+    - Builds go to INDEX_VERSIONS_DIR/<version>/ in a background thread while
+      the current version keeps serving.
+    - Promotion loads the new version fully, then swaps self._serving (a single
+      reference assignment) and rewrites INDEX_POINTER_FILE with os.replace.
+    - Other worker processes notice the pointer change via watch() and swap too.
+    - Every version is warmed (backend/warmup.py) before it starts serving, at
+      startup and on each swap, so the first requests after a reindex hit warm caches.
+    Without a pointer file the pre-versioning layout (PERSIST_DIR itself) is served.
+    Building or loading a version holds its index_lock, so workers started together
+    never ingest twice; read-only workers (INDEX_READ_ONLY) attach to the export
+    written by prepare_index() or by the worker that built the version.
+    """
+
+    def __init__(self, recipe_dir: str = "../data/recipes"):
+        self.recipe_dir = recipe_dir
+        self.builds: Dict[str, Dict[str, Any]] = {}
+        self._loaded: Dict[str, RecipeRAG] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.warmup: Dict[str, Any] = {}
+
+        self._pointer_mtime = self._pointer_stat()
+        pointer = self._read_pointer()
+        if pointer.get("current"):
+            version = pointer["current"]
+            rag = self._open(version)
+        else:
+            version = LEGACY_VERSION
+            # the first worker builds; the others wait here and then load what it wrote
+            with index_lock(PERSIST_DIR, exclusive=not INDEX_READ_ONLY):
+                rag = RecipeRAG(recipe_dir=recipe_dir)
+                rag.build_index()  # this will skip embedding if DB + meta exist
+        self._serving = self._warm(self._make_serving(version, rag))
+        logger.info(f"[Index] serving version '{version}'")
+
+    # -- serving ---------------------------------------------------------------
+
+    @property
+    def current(self) -> ServingIndex:
+        return self._serving
+
+    def _make_serving(self, version: str, rag: RecipeRAG) -> ServingIndex:
+        return ServingIndex(version, rag, RecipeChain(rag))
+
+    def _warm(self, serving: ServingIndex, previous: Optional[ServingIndex] = None) -> ServingIndex:
+        """Fill the caches of a version about to serve; queries still hot in `previous` go first."""
+        if not WARMUP_ENABLED:
+            return serving
+        try:
+            cache = previous.rag.result_cache if previous else None
+            queries = popular_queries(recent=cache.keys() if cache is not None else (),
+                                      default_top_n=serving.chain.top_n)
+            self.warmup = dict(warm(serving.rag, serving.chain, queries), version=serving.version,
+                               finished_at=time.time())
+        except Exception as e:
+            logger.warning(f"[Warmup] skipped for '{serving.version}': {e}")
+        return serving
+
+    def _version_dir(self, version: str) -> str:
+        if version == LEGACY_VERSION:
+            return PERSIST_DIR
+        return os.path.join(INDEX_VERSIONS_DIR, version)
+
+    def _open(self, version: str) -> RecipeRAG:
+        if version in self._loaded:
+            return self._loaded[version]
+        path = self._version_dir(version)
+        if not os.path.isdir(path):
+            raise ValueError(f"Unknown index version '{version}'")
+        with index_lock(path, exclusive=False):
+            rag = RecipeRAG(recipe_dir=self.recipe_dir, persist_dir=path)
+        if not rag.chunk_to_file:
+            raise ValueError(f"Index version '{version}' has no metadata (incomplete build?)")
+        rag._index_loaded = True
+        return rag
+
+    # -- pointer file ------------------------------------------------------------
+
+    def _pointer_stat(self) -> Optional[int]:
+        try:
+            return os.stat(INDEX_POINTER_FILE).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_pointer(self) -> Dict[str, Any]:
+        return read_pointer()
+
+    def _write_pointer(self, current: str, previous: Optional[str]):
+        os.makedirs(os.path.dirname(INDEX_POINTER_FILE) or ".", exist_ok=True)
+        tmp = f"{INDEX_POINTER_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"current": current, "previous": previous, "promoted_at": time.time()}, fh)
+        os.replace(tmp, INDEX_POINTER_FILE)
+        self._pointer_mtime = self._pointer_stat()
+
+    # -- build / promote / rollback ----------------------------------------------
+
+    def versions(self):
+        if not os.path.isdir(INDEX_VERSIONS_DIR):
+            return []
+        return sorted(v for v in os.listdir(INDEX_VERSIONS_DIR) if os.path.isdir(os.path.join(INDEX_VERSIONS_DIR, v)))
+
+    def build(self, promote: bool = False) -> str:
+        """Start a background build of a fresh version; returns the version name."""
+        version = time.strftime("v%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        self.builds[version] = {"status": "building", "started_at": time.time()}
+        thread = threading.Thread(target=self._build, args=(version, promote), name=f"index-build-{version}", daemon=True)
+        thread.start()
+        return version
+
+    def _build(self, version: str, promote: bool):
+        info = self.builds[version]
+        try:
+            path = self._version_dir(version)
+            # builds write a fresh directory, so they are allowed on read-only workers
+            with index_lock(path):
+                rag = RecipeRAG(recipe_dir=self.recipe_dir, persist_dir=path, read_only=False)
+                rag.build_index()
+                if not rag.chunk_to_file:
+                    raise RuntimeError("build produced no chunks")
+                if INDEX_READ_ONLY:
+                    export_shared(rag)
+            if not INDEX_READ_ONLY:
+                # read-only workers reopen it attached to the export, like their peers
+                self._loaded[version] = rag
+            info.update(status="ready", finished_at=time.time(), chunks=len(rag.chunk_to_file),
+                        recipes=len(rag.full_recipes))
+            logger.info(f"[Index] build {version} ready ({info['chunks']} chunks)")
+            if promote:
+                self.promote(version)
+        except Exception as e:
+            info.update(status="failed", finished_at=time.time(), error=str(e))
+            logger.error(f"[Index] build {version} failed: {e}")
+
+    def promote(self, version: str) -> ServingIndex:
+        with self._lock:
+            old = self._serving
+            if version == old.version:
+                return old
+            rag = self._open(version)
+            serving = self._warm(self._make_serving(version, rag), old)
+            self._write_pointer(version, old.version)
+            self._serving = serving
+            self._loaded.pop(version, None)
+            logger.info(f"[Index] promoted '{version}' (previous '{old.version}')")
+        self._prune()
+        return serving
+
+    def rollback(self) -> ServingIndex:
+        previous = self._read_pointer().get("previous")
+        if not previous:
+            raise ValueError("No previous index version to roll back to")
+        return self.promote(previous)
+
+    def _prune(self):
+        pointer = self._read_pointer()
+        keep = {pointer.get("current"), pointer.get("previous")}
+        keep.update(v for v, b in self.builds.items() if b.get("status") == "building")
+        stale = [v for v in self.versions() if v not in keep]
+        for version in stale[:max(0, len(stale) - max(0, INDEX_KEEP_VERSIONS - 2))]:
+            shutil.rmtree(self._version_dir(version), ignore_errors=True)
+            self._loaded.pop(version, None)
+            logger.info(f"[Index] pruned old version '{version}'")
+
+    # -- multi-worker pickup -----------------------------------------------------
+
+    def refresh(self):
+        """Swap to whatever the pointer file names if another process promoted."""
+        mtime = self._pointer_stat()
+        if mtime is None or mtime == self._pointer_mtime:
+            return
+        self._pointer_mtime = mtime
+        version = self._read_pointer().get("current")
+        if version and version != self._serving.version:
+            serving = self._warm(self._make_serving(version, self._open(version)), self._serving)
+            with self._lock:
+                self._serving = serving
+            logger.info(f"[Index] picked up promoted version '{version}'")
+
+    def watch(self):
+        """Poll the pointer file every INDEX_POLL_SECONDS in a daemon thread."""
+        if INDEX_POLL_SECONDS <= 0:
+            return
+
+        def loop():
+            while not self._stop.wait(INDEX_POLL_SECONDS):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"[Index] refresh failed: {e}")
+
+        threading.Thread(target=loop, name="index-pointer-watch", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        pointer = self._read_pointer()
+        serving = self._serving
+        return {
+            "serving": serving.version,
+            "pointer": pointer,
+            "chunks": len(serving.rag.chunk_to_file),
+            "recipes": len(serving.rag.full_recipes),
+            "versions": self.versions(),
+            "builds": self.builds,
+            "warmup": self.warmup,
+        }
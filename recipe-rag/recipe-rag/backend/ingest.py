@@ -0,0 +1,389 @@
+# Bulk corpus ingestion (JSONL / CSV / tar / zip) with resumable checkpoints
+import os
+import csv
+import json
+import time
+import tarfile
+import zipfile
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Type
+from loguru import logger
+
+from .rag import RecipeRAG
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 256))
+INGEST_CHECKPOINT_EVERY = int(os.getenv("INGEST_CHECKPOINT_EVERY", 2048))
+
+# Default record field names; the first one present wins.
+DEFAULT_FIELD_MAP = {
+    "id": ["id", "recipe_id", "slug", "sku", "filename"],
+    "title": ["title", "name"],
+    "ingredients": ["ingredients", "ingredient_list"],
+    "instructions": ["instructions", "steps", "directions", "method"],
+    "text": ["text", "content", "body"],
+}
+
+
+# ---------------------------------------------------------------------------
+# Source adapters
+# ---------------------------------------------------------------------------
+# An adapter streams records out of one kind of dump. Each record is yielded
+# together with an opaque, JSON-serializable position that the adapter can be
+# restarted from. Adding a format = subclass RecordSource + @register_source.
+# A record that cannot be parsed is yielded as None (with its position) and
+# counted as skipped, so one bad line does not abort a long run.
+
+SOURCES: List[Type["RecordSource"]] = []
+
+
+def register_source(cls):
+    SOURCES.append(cls)
+    return cls
+
+
+class RecordSource:
+    extensions: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def matches(cls, path: str) -> bool:
+        return path.lower().endswith(cls.extensions)
+
+    def records(self, position: Optional[Any] = None) -> Iterator[Tuple[Optional[Dict[str, Any]], Any]]:
+        raise NotImplementedError
+
+
+def _json_record(line: bytes, where: str) -> Optional[Dict[str, Any]]:
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        logger.warning(f"[Ingest] {where}: malformed JSON, skipped ({e})")
+        return None
+    if not isinstance(record, dict):
+        logger.warning(f"[Ingest] {where}: not a JSON object, skipped")
+        return None
+    return record
+
+
+def _jsonl_records(fh, skip: int = 0) -> Iterator[Tuple[Optional[Dict[str, Any]], int]]:
+    """JSONL over a non-seekable binary stream; position = records consumed."""
+    n = 0
+    for lineno, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        n += 1
+        if n <= skip:
+            continue
+        yield _json_record(line, f"line {lineno}"), n
+
+
+def _csv_records(fh, skip: int = 0) -> Iterator[Tuple[Optional[Dict[str, Any]], int]]:
+    """CSV (header row required) over a binary stream; position = records consumed."""
+    bad: List[int] = []
+
+    # decode line by line: archive member streams are not seekable, which TextIOWrapper requires
+    def lines():
+        for lineno, line in enumerate(fh, 1):
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError:
+                bad.append(lineno)
+                yield "\n"  # a blank row, which DictReader drops
+
+    n = 0
+
+    def undecodable():
+        nonlocal n
+        for lineno in bad:
+            n += 1
+            if n > skip:
+                logger.warning(f"[Ingest] line {lineno}: not valid UTF-8, skipped")
+                yield None, n
+        bad.clear()
+
+    for row in csv.DictReader(lines()):
+        yield from undecodable()
+        n += 1
+        if n > skip:
+            yield row, n
+    yield from undecodable()
+
+
+@register_source
+class JsonlSource(RecordSource):
+    """Position is the byte offset after the last consumed line, so resume is a seek."""
+    extensions = (".jsonl", ".ndjson")
+
+    def records(self, position=None):
+        with open(self.path, "rb") as fh:
+            if position:
+                fh.seek(position)
+            while True:
+                line = fh.readline()
+                if not line:
+                    break
+                if line.strip():
+                    yield _json_record(line, f"byte {fh.tell() - len(line)}"), fh.tell()
+
+
+@register_source
+class CsvSource(RecordSource):
+    extensions = (".csv",)
+
+    def records(self, position=None):
+        with open(self.path, "rb") as fh:
+            yield from _csv_records(fh, skip=position or 0)
+
+
+# Readers for archive members, keyed by member extension.
+MEMBER_READERS = {
+    ".jsonl": _jsonl_records,
+    ".ndjson": _jsonl_records,
+    ".csv": _csv_records,
+}
+
+
+def _member_reader(name: str):
+    name = name.lower()
+    for ext, reader in MEMBER_READERS.items():
+        if name.endswith(ext):
+            return reader
+    if name.endswith(".txt"):
+        return None  # one recipe per member
+    return False  # not a recipe member
+
+
+class _ArchiveSource(RecordSource):
+    """Position is [member_index, records_consumed_in_member]."""
+
+    def _members(self) -> Iterator[Tuple[str, Any]]:
+        raise NotImplementedError
+
+    def records(self, position=None):
+        start_member, start_rec = position or (0, 0)
+        for idx, (name, opener) in enumerate(self._members()):
+            if idx < start_member:
+                continue
+            reader = _member_reader(name)
+            if reader is False:
+                continue
+            skip = start_rec if idx == start_member else 0
+            with opener() as fh:
+                if reader is None:
+                    if skip:
+                        continue
+                    text = fh.read().decode("utf-8")
+                    yield {"id": os.path.basename(name), "text": text}, [idx + 1, 0]
+                else:
+                    for rec, n in reader(fh, skip=skip):
+                        yield rec, [idx, n]
+
+
+@register_source
+class TarSource(_ArchiveSource):
+    extensions = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+    def _members(self):
+        # streaming mode: members are read in order without loading the index into memory
+        with tarfile.open(self.path, "r|*") as tf:
+            for m in tf:
+                if m.isfile():
+                    yield m.name, (lambda m=m: tf.extractfile(m))
+
+
+@register_source
+class ZipSource(_ArchiveSource):
+    extensions = (".zip",)
+
+    def _members(self):
+        with zipfile.ZipFile(self.path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, (lambda info=info: zf.open(info))
+
+
+def get_source(path: str) -> RecordSource:
+    for cls in SOURCES:
+        if cls.matches(path):
+            return cls(path)
+    raise ValueError(f"No ingestion adapter for '{path}' (known: {[c.__name__ for c in SOURCES]})")
+
+
+# ---------------------------------------------------------------------------
+# Record -> recipe mapping
+# ---------------------------------------------------------------------------
+
+def _pick(record: Dict[str, Any], names: List[str]):
+    for name in names:
+        val = record.get(name)
+        if val not in (None, ""):
+            return val
+    return None
+
+
+def _as_lines(val) -> List[str]:
+    if val is None:
+        return []
+    if isinstance(val, str):
+        # CSV dumps often carry lists as JSON strings or newline/pipe separated text
+        stripped = val.strip()
+        if stripped.startswith("["):
+            try:
+                return [str(v).strip() for v in json.loads(stripped) if str(v).strip()]
+            except ValueError:
+                pass
+        sep = "\n" if "\n" in stripped else "|"
+        return [v.strip() for v in stripped.split(sep) if v.strip()]
+    return [str(v).strip() for v in val if str(v).strip()]
+
+
+def record_to_recipe(record: Dict[str, Any], field_map: Dict[str, List[str]] = None) -> Optional[Tuple[str, str]]:
+    """
+    Map a catalog record onto the (recipe_id, text) model used by RecipeRAG.
+    Structured records are rendered in the same Title/Ingredients/Instructions
+    layout as the files in data/recipes so chunking and ingredient extraction
+    behave identically for both paths.
+    """
+    fm = field_map or DEFAULT_FIELD_MAP
+    rid = _pick(record, fm["id"])
+    if rid is None:
+        return None
+    rid = str(rid)
+    if not rid.lower().endswith(".txt"):
+        rid = f"{rid}.txt"
+
+    text = _pick(record, fm["text"])
+    if text:
+        return rid, str(text).strip()
+
+    title = _pick(record, fm["title"])
+    ingredients = _as_lines(_pick(record, fm["ingredients"]))
+    instructions = _as_lines(_pick(record, fm["instructions"]))
+    if not (title or ingredients or instructions):
+        return None
+
+    parts = []
+    if title:
+        parts.append(f"Title: {title}")
+    if ingredients:
+        parts.append("Ingredients:\n" + "\n".join(f"- {i}" for i in ingredients))
+    if instructions:
+        parts.append("Instructions:\n" + "\n".join(f"{n}. {s}" for n, s in enumerate(instructions, 1)))
+    return rid, "\n\n".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Checkpointed ingestion loop
+# ---------------------------------------------------------------------------
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    return {}
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def ingest(source_path: str, rag: RecipeRAG = None, checkpoint_path: str = None,
+           batch_size: int = None, checkpoint_every: int = None,
+           field_map: Dict[str, List[str]] = None, limit: int = None) -> Dict[str, Any]:
+    """
+    Stream records from source_path into the index.
+    - Records are embedded in batches of batch_size (one embed() call per batch).
+    - Every checkpoint_every records the store is persisted, the new records' metadata is
+      appended to the metadata journal and the source position is written to
+      checkpoint_path; a rerun resumes from there. The full metadata is written once, at the end.
+    Returns run statistics (records, chunks, records/sec, embeddings/sec).
+    """
+    rag = rag or RecipeRAG()
+    source = get_source(source_path)
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    checkpoint_every = checkpoint_every or INGEST_CHECKPOINT_EVERY
+    checkpoint_path = checkpoint_path or source_path + ".checkpoint.json"
+
+    state = load_checkpoint(checkpoint_path)
+    if state and state.get("source") != os.path.abspath(source_path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to {state.get('source')}")
+    if state.get("done"):
+        logger.info(f"[Ingest] {source_path} already fully ingested (checkpoint {checkpoint_path})")
+        return state
+    state = state or {"source": os.path.abspath(source_path), "position": None, "records": 0, "chunks": 0, "skipped": 0}
+    if state["position"] is not None:
+        logger.info(f"[Ingest] resuming {source_path} after {state['records']} records")
+
+    run_records = run_chunks = 0
+    embed_seconds = 0.0
+    started = time.perf_counter()
+    since_checkpoint = 0
+    batch: List[Tuple[str, str]] = []
+    position = state["position"]
+
+    def flush():
+        nonlocal run_chunks, embed_seconds
+        if not batch:
+            return
+        t0 = time.perf_counter()
+        n = rag.add_recipes(batch, source=state["source"])
+        embed_seconds += time.perf_counter() - t0
+        run_chunks += n
+        state["chunks"] += n
+        batch.clear()
+
+    def checkpoint(final: bool = False):
+        rag.store.persist()
+        # intermediate checkpoints append only the records since the last one; the final one compacts
+        if final:
+            rag._save_meta()
+        else:
+            rag._save_meta_delta()
+        state["position"] = position
+        state["updated_at"] = time.time()
+        save_checkpoint(checkpoint_path, state)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        logger.info(f"[Ingest] checkpoint records={state['records']} chunks={state['chunks']} "
+                    f"records/s={run_records / elapsed:.1f} embeddings/s={run_chunks / max(embed_seconds, 1e-9):.1f}")
+
+    for record, pos in source.records(state["position"]):
+        mapped = record_to_recipe(record, field_map) if record is not None else None
+        position = pos
+        state["records"] += 1
+        run_records += 1
+        since_checkpoint += 1
+        if mapped is None:
+            state["skipped"] += 1
+        else:
+            batch.append(mapped)
+        if len(batch) >= batch_size:
+            flush()
+        if since_checkpoint >= checkpoint_every:
+            flush()
+            checkpoint()
+            since_checkpoint = 0
+        if limit and run_records >= limit:
+            break
+    else:
+        state["done"] = True
+
+    flush()
+    checkpoint(final=True)
+    rag._index_loaded = True
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    stats = dict(state)
+    stats.update({
+        "run_records": run_records,
+        "run_chunks": run_chunks,
+        "seconds": elapsed,
+        "records_per_sec": run_records / elapsed,
+        "embeddings_per_sec": run_chunks / max(embed_seconds, 1e-9),
+    })
+    logger.info(f"[Ingest] finished {source_path}: {run_records} records, {run_chunks} chunks in {elapsed:.1f}s "
+                f"({stats['records_per_sec']:.1f} records/s, {stats['embeddings_per_sec']:.1f} embeddings/s)")
+    return stats
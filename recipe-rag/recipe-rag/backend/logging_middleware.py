@@ -1,33 +1,141 @@
 # Request logging middleware
+import os
+import time
+import random
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 from loguru import logger
-import time
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start = time.time()
-        body = await request.body()
+from .metrics import HTTP_REQUESTS, HTTP_SECONDS
+from .tracing import current_trace_id
+from .capture import capture_enabled, get_writer, CAPTURE_SAMPLE_RATE, CAPTURE_BODY_MAX_BYTES
+
+# fraction of requests logged (errors and slow requests are always logged)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+# request body bytes kept on sampled requests; 0 disables body capture
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", 512))
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", 1000))
+
+
+class LoggingMiddleware:
+    """
+    Pure ASGI request logger (no BaseHTTPMiddleware task/stream wrapping).
+    - One line per request with structured fields via logger.bind
+      (method, path, status, duration_ms, req_bytes, resp_bytes, client, body, trace_id).
+    - perf_counter timing; the body is copied from the receive stream as the app
+      reads it, capped at body_max_bytes, never awaited up front.
+    - Sampled at sample_rate; status >= 500 and requests over slow_ms always log.
+    - Request count/latency metrics are recorded for every request.
+    - With CAPTURE_FILE set, requests are also recorded with their arrival time and
+      full body (backend/capture.py) for benchmarks/load/replay.py.
+    Sinks are added with enqueue=True, so emission happens off the event loop.
+    """
+
+    def __init__(self, app, sample_rate: float = None, body_max_bytes: int = None, slow_ms: float = None):
+        self.app = app
+        self.sample_rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.body_max_bytes = LOG_BODY_MAX_BYTES if body_max_bytes is None else body_max_bytes
+        self.slow_ms = LOG_SLOW_MS if slow_ms is None else slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        arrived = time.time()
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        log_cap = self.body_max_bytes if sampled else 0
+        capturing = capture_enabled(scope.get("path", "")) and (
+            CAPTURE_SAMPLE_RATE >= 1.0 or random.random() < CAPTURE_SAMPLE_RATE)
+        cap = max(log_cap, CAPTURE_BODY_MAX_BYTES) if capturing else log_cap
+        body = bytearray()
+        sizes = {"req": 0, "resp": 0}
+        status = 500  # if the app raises before starting a response
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                sizes["req"] += len(chunk)
+                if len(body) < cap:
+                    body.extend(chunk[:cap - len(body)])
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["resp"] += len(message.get("body", b""))
+            await send(message)
+
         try:
-            req_text = body.decode("utf-8") if body else ""
-        except Exception:
-            req_text = str(body)
-        logger.info(f"[API-IN] {request.method} {request.url} body={req_text}")
-        response = await call_next(request)
-        elapsed = (time.time() - start) * 1000
-        logger.info(f"[API-OUT] {request.method} {request.url} status={response.status_code} time_ms={elapsed:.1f}")
-        return response
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            # route template (e.g. /admin/index/shards/{shard}/rebuild) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(scope.get("method", ""), route, str(status))
+            HTTP_SECONDS.observe(elapsed / 1000, route)
+            if sampled or status >= 500 or elapsed >= self.slow_ms:
+                self._emit(scope, status, elapsed, sizes, body[:log_cap])
+            if capturing:
+                self._capture(scope, arrived, status, elapsed, sizes, body)
+
+    def _emit(self, scope, status: int, elapsed: float, sizes, body: bytearray):
+        path = scope.get("path", "")
+        if scope.get("query_string"):
+            path = f"{path}?{scope['query_string'].decode('latin-1')}"
+        text = body.decode("utf-8", errors="replace")
+        # also when nothing was captured (unsampled slow / 5xx requests), so "body=" never reads as a complete empty body
+        if sizes["req"] > len(body):
+            text += f"...(+{sizes['req'] - len(body)} bytes)"
+        client = scope.get("client")
+        fields = {
+            "method": scope.get("method"),
+            "path": path,
+            "status": status,
+            "duration_ms": round(elapsed, 2),
+            "req_bytes": sizes["req"],
+            "resp_bytes": sizes["resp"],
+            "client": client[0] if client else None,
+            "body": text,
+            "trace_id": current_trace_id(),
+        }
+        level = "WARNING" if status >= 500 else "INFO"
+        logger.bind(**fields).log(level, f"[API] {fields['method']} {path} status={status} "
+                                         f"time_ms={elapsed:.1f} body={text}")
+
+    def _capture(self, scope, arrived: float, status: int, elapsed: float, sizes, body: bytearray):
+        writer = get_writer()
+        if writer is None:
+            return
+        headers = dict(scope.get("headers", []))
+        writer.write({
+            "ts": arrived,
+            "method": scope.get("method"),
+            "path": scope.get("path", ""),
+            "query_string": scope.get("query_string", b"").decode("latin-1"),
+            "content_type": headers.get(b"content-type", b"").decode("latin-1") or None,
+            "accept": headers.get(b"accept", b"").decode("latin-1") or None,
+            "body": body.decode("utf-8", errors="replace"),
+            "truncated": sizes["req"] > len(body),
+            "status": status,
+            "duration_ms": round(elapsed, 2),
+            "trace_id": current_trace_id(),
+        })
+
 
 # Legacy function for backward compatibility
 async def log_requests(request: Request, call_next):
     """Log incoming requests and response times"""
-    start_time = time.time()
-    
+    start_time = time.perf_counter()
+
     logger.info(f"Request: {request.method} {request.url}")
-    
+
     response = await call_next(request)
-    
-    process_time = time.time() - start_time
+
+    process_time = time.perf_counter() - start_time
     logger.info(f"Response: {response.status_code} - {process_time:.3f}s")
-    
-    return response
\ No newline at end of file
+
+    return response
@@ -1,23 +1,46 @@
 # FastAPI entrypoint
 import os
-from fastapi import FastAPI, HTTPException
+import sys
+import hashlib
+from typing import List, Dict, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from loguru import logger
 from dotenv import load_dotenv
 
-from .rag import RecipeRAG
-from .chains import RecipeChain
+from .index_manager import IndexManager
+from .shared_index import INDEX_READ_ONLY
+from .watcher import RecipeWatcher
+from .admin import router as admin_router
 from .logging_middleware import LoggingMiddleware
+from .tracing import TracingMiddleware, span, current_span
+from .profiling import ProfilingMiddleware
+from .shopping_list import meal_plan_recipes
+from .pantry import recipe_similarity
+from .streaming import select_fields, negotiate, stream_events
+from .metrics import timed, register_gauge, render as render_metrics
+from . import embeddings
 from .utils import ensure_recipes_exist
 
 load_dotenv()
 
-# Configure logging
-logger.add("logs/backend.log", rotation="10 MB", retention="7 days", enqueue=True)
+# Configure logging; enqueue=True hands records to a writer thread so request handlers never block on I/O
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+logger.remove()
+logger.add(sys.stderr, level=LOG_LEVEL, enqueue=True)
+# LOG_JSON=true writes one JSON object per line, including the middleware's bound request fields
+logger.add("logs/backend.log", level=LOG_LEVEL, rotation="10 MB", retention="7 days", enqueue=True,
+           serialize=os.getenv("LOG_JSON", "false").lower() in ("1", "true", "yes"))
 
 app = FastAPI(title="Recipe Finder — RAG Engine")
 
+# Profiling hook (admin-triggered); added first = innermost, so cProfile sees the handler
+# rather than the logging/tracing around it
+app.add_middleware(ProfilingMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -29,76 +52,238 @@ app.add_middleware(
 
 # Add logging middleware
 app.add_middleware(LoggingMiddleware)
+# added last = outermost, so the request log line carries the trace id
+app.add_middleware(TracingMiddleware)
 
 BASE_DIR = os.path.dirname(__file__)
 RECIPE_DIR = os.getenv("RECIPE_DIR", "../data/recipes")
 FULL_RECIPE_DIR = os.path.abspath(os.path.join(BASE_DIR, RECIPE_DIR))
+# per-recipe attributes too large to repeat on every search hit
+LIST_ATTRS = ("ingredients", "structured_ingredients")
 
 ensure_recipes_exist(FULL_RECIPE_DIR)
 
 try:
     # pass recipe_dir as relative to backend
-    rag = RecipeRAG(recipe_dir=RECIPE_DIR)
-    rag.build_index()  # this will skip embedding if DB + meta exist
+    index = IndexManager(recipe_dir=RECIPE_DIR)
+    index.watch()  # pick up versions promoted by other workers
+    app.state.index = index
+    app.state.watcher = None
+    if os.getenv("WATCH_RECIPES", "false").lower() in ("1", "true", "yes"):
+        if INDEX_READ_ONLY:
+            # every worker would re-embed the same edits into the same store
+            logger.warning("[INIT] WATCH_RECIPES ignored on read-only workers; rebuild through /admin/index/build")
+        else:
+            app.state.watcher = RecipeWatcher(lambda: index.current.rag, FULL_RECIPE_DIR)
+            app.state.watcher.start()
     logger.info("[INIT] RAG ready.")
 except Exception as e:
     logger.error(f"[INIT] Failed to build RAG index: {e}")
     raise
 
-chain = RecipeChain(rag)
+@app.on_event("shutdown")
+def stop_watcher():
+    # lets the watcher fold its metadata journal into chroma_meta.pkl
+    if app.state.watcher is not None:
+        app.state.watcher.stop()
+
+app.include_router(admin_router)
+
+# read at scrape time only
+register_gauge("recipe_index_chunks", "Chunks in the serving index", lambda: len(index.current.rag.chunk_to_file))
+register_gauge("recipe_index_recipes", "Recipes in the serving index", lambda: len(index.current.rag.full_recipes))
+register_gauge("recipe_embed_cache_entries", "Entries in the in-memory embedding cache",
+               lambda: len(embeddings._cache) if embeddings._cache is not None else 0)
 
 class Query(BaseModel):
     ingredients: list
+    top_n: Optional[int] = Field(None, ge=1)  # alternatives in "results" (default RERANK_TOP_N)
+    fields: Optional[List[str]] = None  # keep only these keys per result, e.g. ["recipe_id", "score"]
+
+class SearchFilters(BaseModel):
+    vegetarian: Optional[bool] = None
+    vegan: Optional[bool] = None
+    cuisine: Optional[str] = None
+    max_total_time: Optional[int] = None
+    max_ingredients: Optional[int] = None
+    include_ingredients: List[str] = []
+    exclude_ingredients: List[str] = []
 
 class SearchQuery(BaseModel):
     query: str
     k: int = 5
+    filters: Optional[SearchFilters] = None
+    collapse: bool = False  # return k distinct recipes instead of k chunks
+    fields: Optional[List[str]] = None  # keep only these keys per result, e.g. omit "content"
+
+class ShoppingListRequest(BaseModel):
+    recipes: List[str] = []  # recipe ids ("recipe_12.txt") or titles
+    meal_plan: Dict[str, Dict[str, Optional[str]]] = {}  # {day: {meal: recipe}} as in the Streamlit planner
+    pantry: List[str] = []  # "flour" covers it entirely, "500 g rice" is subtracted
+    servings: float = Field(1.0, gt=0)
+
+class PantryQuery(BaseModel):
+    ingredients: List[str]
+    offset: int = 0
+    limit: Optional[int] = None  # default PANTRY_PAGE_SIZE
+    similarity_weight: float = 0.0  # >0 blends in vector similarity (one embedding call)
 
 @app.get("/")
 async def root():
     return {"message": "Recipe RAG API is running"}
 
-@app.post("/find-recipe")
-async def find_recipe(q: Query):
+def format_search_results(rag, results, collapse: bool):
+    """Yield API dicts for RecipeRAG.search results (collapsed dicts or chunk tuples)."""
+    if collapse:
+        for r in results:
+            filename = r['recipe_id']
+            yield {
+                'id': r['id'],  # best chunk of the recipe
+                'filename': filename,
+                'content': r['content'],
+                'score': r['score'],
+                'distance': r['distance'],
+                'aggregate_score': r['aggregate_score'],
+                'matched_chunks': r['matched_chunks'],
+                'attributes': {k: v for k, v in rag.recipe_attrs.get(filename, {}).items() if k not in LIST_ATTRS}
+            }
+    else:
+        for chunk_id, distance, content in results:
+            filename = rag.chunk_to_file.get(chunk_id, "unknown")
+            yield {
+                'id': chunk_id,
+                'filename': filename,
+                'content': content,
+                'score': 1.0 - distance,  # Convert distance to similarity score
+                'distance': distance,
+                'attributes': {k: v for k, v in rag.recipe_attrs.get(filename, {}).items() if k not in LIST_ATTRS}
+            }
+
+def timed_json(result) -> JSONResponse:
+    """What FastAPI does with a returned dict, but recorded as the serialize stage."""
+    with timed("serialize"), span("serialize"):
+        return JSONResponse(jsonable_encoder(result))
+
+def _validate_ingredients(q: Query):
     if not isinstance(q.ingredients, list) or not q.ingredients:
         raise HTTPException(status_code=400, detail="Provide a non-empty list of ingredients")
     logger.info(f"[API] Ingredients received: {q.ingredients}")
-    return chain.run(q.ingredients)
+
+@app.post("/find-recipe")
+async def find_recipe(q: Query):
+    _validate_ingredients(q)
+    current_span().set(ingredients=len(q.ingredients))
+    result = index.current.chain.run(q.ingredients, top_n=q.top_n)
+    if q.fields and "results" in result:
+        result = dict(select_fields(result, q.fields), results=[select_fields(r, q.fields) for r in result["results"]])
+    return timed_json(result)
+
+@app.post("/find-recipe/stream")
+def find_recipe_stream(q: Query, request: Request, format: Optional[str] = None):
+    """/find-recipe as NDJSON or SSE: retrieval candidates first, then one event per reranked recipe."""
+    _validate_ingredients(q)
+    chain = index.current.chain
+    return stream_events(chain.run_stream(q.ingredients, top_n=q.top_n),
+                         negotiate(format, request.headers.get("accept")), q.fields)
 
 @app.post("/search")
 async def search_recipes(q: SearchQuery):
     """Search for recipes using semantic search"""
     try:
-        logger.info(f"[API] Search query: {q.query}, k={q.k}")
+        filters = q.filters.model_dump(exclude_none=True) if q.filters else None
+        logger.info(f"[API] Search query: {q.query}, k={q.k}, filters={filters}, collapse={q.collapse}")
         
-        # Use RAG pipeline for search
-        results = rag.search(q.query, top_k=q.k)
+        # Use RAG pipeline for search; hold one version for the whole request
+        version = index.current
+        current_span().set(index_version=version.version, k=q.k)
+        rag = version.rag
+        results = rag.search(q.query, top_k=q.k, filters=filters, collapse=q.collapse)
         
         # Format results
-        formatted_results = []
-        for chunk_id, distance, content in results:
-            filename = rag.chunk_to_file.get(chunk_id, "unknown")
-            formatted_results.append({
-                'id': chunk_id,
-                'filename': filename,
-                'content': content,
-                'score': 1.0 - distance,  # Convert distance to similarity score
-                'distance': distance
-            })
+        formatted_results = [select_fields(r, q.fields) for r in format_search_results(rag, results, q.collapse)]
         
-        return {
+        return timed_json({
             "query": q.query,
             "results": formatted_results,
             "count": len(formatted_results)
-        }
+        })
         
     except Exception as e:
         logger.error(f"[API] Search failed: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.post("/search/stream")
+def search_recipes_stream(q: SearchQuery, request: Request, format: Optional[str] = None):
+    """/search as NDJSON or SSE: a "meta" event once retrieval finishes, then one event per result."""
+    filters = q.filters.model_dump(exclude_none=True) if q.filters else None
+    logger.info(f"[API] Search stream: {q.query}, k={q.k}, filters={filters}, collapse={q.collapse}")
+    rag = index.current.rag
+
+    def events():
+        results = rag.search(q.query, top_k=q.k, filters=filters, collapse=q.collapse)
+        yield "meta", {"query": q.query, "count": len(results)}
+        for item in format_search_results(rag, results, q.collapse):
+            yield "result", item
+
+    return stream_events(events(), negotiate(format, request.headers.get("accept")), q.fields)
+
+@app.post("/shopping-list")
+async def shopping_list(q: ShoppingListRequest):
+    refs = q.recipes + meal_plan_recipes(q.meal_plan)
+    if not refs:
+        raise HTTPException(status_code=400, detail="Provide recipes or a meal_plan")
+    result = index.current.rag.shopping_list.build(refs, pantry=q.pantry, servings=q.servings)
+    logger.info(f"[API] Shopping list: {len(refs)} meals -> {len(result['items'])} items in {result['elapsed_ms']}ms")
+    return result
+
+@app.post("/pantry")
+async def pantry(q: PantryQuery):
+    """Rank every recipe by how few ingredients are missing from the pantry."""
+    if not q.ingredients:
+        raise HTTPException(status_code=400, detail="Provide a non-empty list of ingredients")
+    if q.offset < 0 or (q.limit is not None and q.limit <= 0):
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit > 0")
+    rag = index.current.rag
+    pantry_index = rag.pantry_index
+    similarity = recipe_similarity(rag, pantry_index, q.ingredients) if q.similarity_weight else None
+    return pantry_index.rank(q.ingredients, offset=q.offset, limit=q.limit,
+                             similarity=similarity, similarity_weight=q.similarity_weight)
+
+def recipe_etag(content: str) -> str:
+    return '"' + hashlib.sha1(content.encode("utf-8")).hexdigest()[:20] + '"'
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+@app.get("/recipes/{recipe_id:path}")
+async def get_recipe(recipe_id: str, request: Request):
+    """Full recipe text and attributes. The ETag is a content hash; If-None-Match answers 304 when unchanged."""
+    rag = index.current.rag
+    filename = recipe_id if recipe_id.endswith(".txt") else f"{recipe_id}.txt"
+    content = rag.full_recipes.get(filename)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Unknown recipe '{recipe_id}'")
+    # clients may keep the body but must revalidate (live indexing can change it in place)
+    headers = {"ETag": recipe_etag(content), "Cache-Control": "no-cache"}
+    if etag_matches(headers["ETag"], request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder({
+        "recipe_id": filename,
+        "content": content,
+        "attributes": rag.recipe_attrs.get(filename, {}),
+    }), headers=headers)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition; everything is rendered on demand."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "index_version": index.current.version}
 
 if __name__ == "__main__":
     import uvicorn
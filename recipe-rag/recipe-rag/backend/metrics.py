@@ -0,0 +1,152 @@
+# In-process metrics (counters, histograms, scrape-time gauges) rendered in Prometheus text format
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple, Sequence, Optional
+
+# seconds; covers sub-ms numpy work up to multi-second embedding retries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, v in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Evaluated only at scrape time, so keeping it current costs nothing."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        # gauges are re-registered when the serving app (and its callbacks) is recreated
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "recipe_stage_seconds", "Time spent per pipeline stage", ["stage"]))
+EMBED_CALLS = REGISTRY.register(Counter(
+    "recipe_embed_api_calls_total", "Embedding API requests (one per batch, retries included)"))
+EMBED_TEXTS = REGISTRY.register(Counter(
+    "recipe_embed_texts_total", "Texts sent to the embedding API"))
+EMBED_TOKENS = REGISTRY.register(Counter(
+    "recipe_embed_tokens_total", "Tokens billed by the embedding API"))
+EMBED_CACHE = REGISTRY.register(Counter(
+    "recipe_embed_cache_total", "Embedding cache lookups", ["result"]))
+RESULT_CACHE = REGISTRY.register(Counter(
+    "recipe_result_cache_total", "Search / find-recipe result cache lookups", ["kind", "result"]))
+EMBED_ERRORS = REGISTRY.register(Counter(
+    "recipe_embed_errors_total", "Failed embedding API requests"))
+SHARD_QUERY_ERRORS = REGISTRY.register(Counter(
+    "recipe_shard_query_errors_total", "Failed per-shard vector queries (the shard is left out of the merge)", ["shard"]))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "recipe_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "recipe_http_request_seconds", "HTTP request latency by route", ["route"]))
+
+
+class timed:
+    """with timed("embed"): ...  -> recipe_stage_seconds{stage="embed"}"""
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+        return False
+
+
+def register_gauge(name: str, help: str, fn: Callable[[], float]) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, fn))
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,162 @@
+# Exhaustive pantry ranking: recipe x ingredient CSR matrix scored with one sparse mat-vec
+import os
+import json
+import time
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+
+from .metrics import timed
+
+PANTRY_PAGE_SIZE = int(os.getenv("PANTRY_PAGE_SIZE", 20))
+# collapsed vector hits that get a similarity value when blending (others count as 0)
+PANTRY_SIMILARITY_CANDIDATES = int(os.getenv("PANTRY_SIMILARITY_CANDIDATES", 100))
+
+
+class PantryIndex:
+    """
+    recipe_attrs ingredients as a sparse recipe x vocabulary matrix, kept in both
+    CSR (indptr/indices, per-recipe rows) and CSC (col_ptr/col_rows, per-ingredient) form.
+    - A pantry becomes a 0/1 vector over the vocabulary (same u-in-r / r-in-u rule as
+      ingredient_matcher_tool). covered = M @ x is one bincount over the CSC columns
+      of the pantry's ingredients, so cost scales with their postings, not with nnz.
+    - Ranking is (missing asc, coverage desc, recipe id); the optional blend adds
+      weight * vector similarity to coverage - missing. Only the rows up to the
+      requested page are sorted (np.partition), the rest is never ordered.
+    - save()/load() store the arrays as .npy files; load(mmap_mode="r") lets worker
+      processes share one copy through the page cache.
+    """
+
+    ARRAYS = ("vocab_arr", "indptr", "indices", "rows", "n_ingredients", "col_rows", "col_ptr")
+
+    def __init__(self, recipe_attrs: Dict[str, Dict[str, Any]]):
+        self.recipe_ids = sorted(recipe_attrs)
+        self.position = {rid: i for i, rid in enumerate(self.recipe_ids)}
+        vocab: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        for rid in self.recipe_ids:
+            for ing in dict.fromkeys(recipe_attrs[rid].get("ingredients", [])):
+                indices.append(vocab.setdefault(ing, len(vocab)))
+            indptr.append(len(indices))
+        self.vocab = vocab
+        self.vocab_arr = np.array(list(vocab), dtype=str)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        # row id of every stored entry, so the mat-vec is a single bincount
+        self.rows = np.repeat(np.arange(len(self.recipe_ids), dtype=np.int32), np.diff(self.indptr))
+        self.n_ingredients = np.diff(self.indptr).astype(np.float64)
+        by_col = np.argsort(self.indices, kind="stable")
+        self.col_rows = self.rows[by_col]
+        self.col_ptr = np.concatenate([[0], np.cumsum(np.bincount(self.indices, minlength=len(vocab)))]).astype(np.int64)
+        self._term_ids = lru_cache(maxsize=4096)(self._match_term)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"pantry_{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "pantry_recipe_ids.json"), "w", encoding="utf-8") as fh:
+            json.dump(self.recipe_ids, fh)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "PantryIndex":
+        """Attach to arrays written by save() without rebuilding from recipe_attrs."""
+        index = cls.__new__(cls)
+        with open(os.path.join(directory, "pantry_recipe_ids.json"), encoding="utf-8") as fh:
+            index.recipe_ids = json.load(fh)
+        index.position = {rid: i for i, rid in enumerate(index.recipe_ids)}
+        for name in cls.ARRAYS:
+            setattr(index, name, np.load(os.path.join(directory, f"pantry_{name}.npy"), mmap_mode=mmap_mode))
+        index.vocab = {v: i for i, v in enumerate(index.vocab_arr.tolist())}
+        index._term_ids = lru_cache(maxsize=4096)(index._match_term)
+        return index
+
+    def _match_term(self, term: str) -> np.ndarray:
+        # u in r: vectorized substring search over the vocabulary
+        hits = set(np.flatnonzero(np.char.find(self.vocab_arr, term) >= 0).tolist()) if len(self.vocab) else set()
+        # r in u: every substring of the (short) pantry term looked up in the vocabulary
+        n = len(term)
+        for i in range(n):
+            for j in range(i + 1, n + 1):
+                v = self.vocab.get(term[i:j])
+                if v is not None:
+                    hits.add(v)
+        return np.fromiter(sorted(hits), dtype=np.int64)
+
+    def pantry_columns(self, pantry: Iterable[str]) -> np.ndarray:
+        """Vocabulary ids covered by the pantry (the nonzeros of x)."""
+        ids = [self._term_ids(t.lower().strip()) for t in pantry if t.strip()]
+        return np.unique(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+
+    def score(self, pantry: Iterable[str]) -> Dict[str, np.ndarray]:
+        cols = self.pantry_columns(pantry)
+        x = np.zeros(len(self.vocab), dtype=bool)
+        x[cols] = True
+        postings = [self.col_rows[self.col_ptr[v]:self.col_ptr[v + 1]] for v in cols]
+        hit_rows = np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32)
+        covered = np.bincount(hit_rows, minlength=len(self.recipe_ids)).astype(np.float64)
+        return {
+            "covered": covered,
+            "missing": self.n_ingredients - covered,
+            "coverage": covered / np.maximum(1.0, self.n_ingredients),
+            "pantry_vector": x,
+        }
+
+    def rank(self, pantry: Iterable[str], offset: int = 0, limit: int = None,
+             similarity: Optional[np.ndarray] = None, similarity_weight: float = 0.0) -> Dict[str, Any]:
+        with timed("pantry_rank"):
+            return self._rank(pantry, offset, limit, similarity, similarity_weight)
+
+    def _rank(self, pantry, offset, limit, similarity, similarity_weight) -> Dict[str, Any]:
+        started = time.perf_counter()
+        limit = limit or PANTRY_PAGE_SIZE
+        s = self.score(pantry)
+        if similarity is not None and similarity_weight:
+            key = -(s["coverage"] - s["missing"] + similarity_weight * similarity)
+        else:
+            # missing is integral and coverage lies in [0, 1], so this orders (missing asc, coverage desc)
+            key = s["missing"] + 0.999 * (1.0 - s["coverage"])
+        k = offset + limit
+        if k < len(key):
+            # keep every row tied with the k-th key so paging stays deterministic
+            threshold = np.partition(key, k - 1)[k - 1]
+            candidates = np.flatnonzero(key <= threshold)
+        else:
+            candidates = np.arange(len(key))
+        # np.lexsort sorts by the last key first; ties fall back to recipe id order
+        order = candidates[np.lexsort((candidates, key[candidates]))]
+        page = order[offset:offset + limit]
+
+        x = s["pantry_vector"]
+        results = []
+        for r in page:
+            row = self.indices[self.indptr[r]:self.indptr[r + 1]]
+            have = x[row]
+            item = {
+                "recipe_id": self.recipe_ids[r],
+                "missing_count": int(s["missing"][r]),
+                "coverage": float(s["coverage"][r]),
+                "matched_ingredients": self.vocab_arr[row[have]].tolist(),
+                "missing_ingredients": self.vocab_arr[row[~have]].tolist(),
+            }
+            if similarity is not None:
+                item["similarity"] = float(similarity[r])
+            results.append(item)
+        return {
+            "results": results,
+            "total": len(self.recipe_ids),
+            "offset": offset,
+            "limit": limit,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+
+def recipe_similarity(rag, index: PantryIndex, pantry: List[str], candidates: int = None) -> np.ndarray:
+    """1 - distance for the nearest recipes to the joined pantry text (one embed + one collapsed query)."""
+    sims = np.zeros(len(index.recipe_ids), dtype=np.float32)
+    for hit in rag.search(" ".join(pantry), top_k=candidates or PANTRY_SIMILARITY_CANDIDATES, collapse=True):
+        i = index.position.get(hit["recipe_id"])
+        if i is not None:
+            sims[i] = hit["score"]
+    return sims
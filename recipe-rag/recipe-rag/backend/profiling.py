@@ -0,0 +1,356 @@
+# On-demand profiling of a live worker: the next N requests or a time window, per endpoint
+import os
+import io
+import re
+import sys
+import time
+import json
+import uuid
+import asyncio
+import inspect
+import pstats
+import cProfile
+import threading
+from collections import Counter as Tally
+from typing import Dict, List, Optional, Any, Set
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from .streaming import encode_events
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+# sampling profiler period; 5 ms keeps the sampler well under 1% of a core
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+# hard cap on a session so a forgotten profile cannot run forever
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))
+# modules reported separately as "hot_paths" in the summary
+PROFILE_FOCUS = [m.strip() for m in os.getenv("PROFILE_FOCUS", "chains.py,tools.py,vectorstore_chroma.py").split(",") if m.strip()]
+TOP_FUNCTIONS = 25
+# how often a request queued behind a cProfile'd one checks whether it may start
+SERIAL_POLL_SECONDS = 0.002
+
+SAMPLING = "sampling"
+CPROFILE = "cprofile"
+
+# streamed bodies run after their endpoint returned, so the endpoint frame is gone by then
+STREAMED = "(streamed responses)"
+
+# the only thing the request path looks at when no session is running
+_session: Optional["ProfileSession"] = None
+_last: Optional["ProfileSession"] = None
+_lock = threading.Lock()
+
+
+def _slug(route: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+class ProfileSession:
+    """
+    One profiling run.
+    - sampling: a background thread snapshots every thread's stack each interval_ms and
+      attributes it to the endpoint function found on that stack (async handlers on the
+      event loop and sync handlers in the threadpool alike). Output: collapsed stacks.
+    - cprofile: deterministic cProfile around each request. While the session runs, requests
+      are served one at a time, since cProfile charges everything the event loop runs while
+      it is enabled. Only the event-loop thread is seen: routes whose handler runs in the
+      threadpool (sync and streaming endpoints) carry a warning in the summary and need
+      sampling mode. Output: pstats.
+    Ends after `requests` profiled requests or `seconds`, whichever comes first.
+    """
+
+    def __init__(self, mode: str, endpoints: Dict[Any, str], requests: Optional[int] = None,
+                 seconds: Optional[float] = None, interval_ms: float = None, routes: Optional[List[str]] = None,
+                 threadpool_routes: Optional[Set[str]] = None):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.mode = mode
+        self.endpoints = endpoints  # endpoint code object -> "POST /find-recipe"
+        self.threadpool_routes = threadpool_routes or set()
+        self.max_requests = requests
+        self.seconds = min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.interval = (interval_ms or PROFILE_INTERVAL_MS) / 1000
+        self.routes = set(routes) if routes else None
+        self.started = time.time()
+        self.deadline = time.perf_counter() + self.seconds
+        self.finished: Optional[float] = None
+        self.requests = 0
+        self.per_route_requests: Tally = Tally()
+        self.out_dir = os.path.join(PROFILE_DIR, self.id)
+        self.files: List[str] = []
+        self.summary: Dict[str, Any] = {}
+        # sampling state
+        self.stacks: Dict[str, Tally] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._timer: Optional[threading.Timer] = None
+        # cprofile state
+        self.stats: Dict[str, pstats.Stats] = {}
+        self._busy = threading.Lock()  # held from begin_request to end_request
+
+    # lifecycle -------------------------------------------------------------
+    def start(self):
+        # ends an idle session too (no requests arriving to notice the deadline)
+        self._timer = threading.Timer(self.seconds, _expire, args=(self,))
+        self._timer.daemon = True
+        self._timer.start()
+        if self.mode == SAMPLING:
+            self._thread = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+            self._thread.start()
+        logger.info(f"[Profile] session {self.id} started: mode={self.mode} requests={self.max_requests} "
+                    f"seconds={self.seconds}")
+
+    def wants(self, route: str) -> bool:
+        # "POST /find-recipe" or just "/find-recipe"
+        return self.routes is None or route in self.routes or route.split(" ", 1)[-1] in self.routes
+
+    def expired(self) -> bool:
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            return True
+        return time.perf_counter() >= self.deadline
+
+    def request_done(self, route: str):
+        # the caller ends an expired session (ProfilingMiddleware, off the event loop)
+        self.requests += 1
+        self.per_route_requests[route] += 1
+
+    def finish(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.finished = time.time()
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.summary = self._write_sampling() if self.mode == SAMPLING else self._write_pstats()
+        with open(os.path.join(self.out_dir, "summary.json"), "w") as f:
+            json.dump(self.status(), f, indent=2)
+        self.files.append("summary.json")
+        logger.info(f"[Profile] session {self.id} finished: {self.requests} requests -> {self.out_dir}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "running": self.finished is None,
+            "started": self.started,
+            "elapsed_s": round((self.finished or time.time()) - self.started, 3),
+            "max_requests": self.max_requests,
+            "max_seconds": self.seconds,
+            "requests": self.requests,
+            "per_route_requests": dict(self.per_route_requests),
+            "samples": self.samples if self.mode == SAMPLING else None,
+            "out_dir": self.out_dir,
+            "files": self.files,
+            "summary": self.summary,
+        }
+
+    # sampling --------------------------------------------------------------
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                route = None
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(_frame_name(code))
+                    if route is None:
+                        route = self.endpoints.get(code)
+                    frame = frame.f_back
+                # threads not inside a handler (idle loop, pool workers, writers) are not counted
+                if route is None or (route != STREAMED and not self.wants(route)):
+                    continue
+                self.stacks.setdefault(route, Tally())[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def _write_sampling(self) -> Dict[str, Any]:
+        summary = {}
+        everything: Tally = Tally()
+        for route, stacks in self.stacks.items():
+            everything.update(stacks)
+            self._write_collapsed(f"{_slug(route)}.collapsed", stacks)
+            summary[route] = self._top_from_stacks(stacks)
+        self._write_collapsed("all.collapsed", everything)
+        summary["_all"] = self._top_from_stacks(everything)
+        return summary
+
+    def _write_collapsed(self, name: str, stacks: Tally):
+        # flamegraph.pl / speedscope "collapsed" format: frame;frame;frame count
+        with open(os.path.join(self.out_dir, name), "w") as f:
+            for stack, n in stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        self.files.append(name)
+
+    @staticmethod
+    def _top_from_stacks(stacks: Tally) -> Dict[str, Any]:
+        total = sum(stacks.values())
+        self_time: Tally = Tally()
+        inclusive: Tally = Tally()
+        for stack, n in stacks.items():
+            frames = stack.split(";")
+            self_time[frames[-1]] += n
+            for fr in set(frames):
+                inclusive[fr] += n
+
+        def pct(n):
+            return round(100.0 * n / total, 2) if total else 0.0
+
+        return {
+            "samples": total,
+            "top_self": [{"function": fn, "samples": n, "pct": pct(n)} for fn, n in self_time.most_common(TOP_FUNCTIONS)],
+            "hot_paths": [{"function": fn, "samples": n, "pct": pct(n)} for fn, n in inclusive.most_common()
+                          if fn.split(":")[0] in PROFILE_FOCUS][:TOP_FUNCTIONS],
+        }
+
+    # cprofile --------------------------------------------------------------
+    def begin_request(self) -> Optional[cProfile.Profile]:
+        if self.mode != CPROFILE or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def end_request(self, profiler: cProfile.Profile, route: str):
+        profiler.disable()
+        try:
+            if self.wants(route):
+                if route in self.stats:
+                    self.stats[route].add(profiler)
+                else:
+                    self.stats[route] = pstats.Stats(profiler)
+                self.request_done(route)
+        finally:
+            self._busy.release()
+
+    def _write_pstats(self) -> Dict[str, Any]:
+        summary = {}
+        for route, stats in self.stats.items():
+            name = f"{_slug(route)}.pstats"
+            stats.dump_stats(os.path.join(self.out_dir, name))
+            self.files.append(name)
+            summary[route] = self._top_from_pstats(stats)
+            if route in self.threadpool_routes:
+                summary[route]["warning"] = ("handler runs in the threadpool, which cProfile does not see; "
+                                             "use sampling mode for this route")
+        return summary
+
+    @staticmethod
+    def _top_from_pstats(stats: pstats.Stats) -> Dict[str, Any]:
+        rows = []
+        for (filename, line, fn), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append({"function": f"{os.path.basename(filename)}:{fn}:{line}", "calls": nc,
+                         "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)})
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        stats.stream = sys.stdout
+        return {
+            "total_ms": round(stats.total_tt * 1000, 3),
+            "top_self": sorted(rows, key=lambda r: -r["tottime_ms"])[:TOP_FUNCTIONS],
+            "hot_paths": sorted((r for r in rows if r["function"].split(":")[0] in PROFILE_FOCUS),
+                                key=lambda r: -r["cumtime_ms"])[:TOP_FUNCTIONS],
+            "report": text.getvalue(),
+        }
+
+
+def endpoint_codes(app) -> Dict[Any, str]:
+    """Endpoint function code object -> "METHOD /route" for every API route of the app."""
+    out = {}
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        code = getattr(endpoint, "__code__", None)
+        if code is not None:
+            methods = ",".join(sorted(getattr(route, "methods", None) or []))
+            out[code] = f"{methods} {route.path}".strip()
+    out[encode_events.__code__] = STREAMED
+    return out
+
+
+def threadpool_routes(app) -> Set[str]:
+    """ "METHOD /route" of every endpoint that starlette runs in the threadpool (plain def handlers)."""
+    out = set()
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is not None and not inspect.iscoroutinefunction(endpoint):
+            methods = ",".join(sorted(getattr(route, "methods", None) or []))
+            out.add(f"{methods} {route.path}".strip())
+    return out
+
+
+def start(app, mode: str = SAMPLING, requests: Optional[int] = None, seconds: Optional[float] = None,
+          interval_ms: float = None, routes: Optional[List[str]] = None) -> ProfileSession:
+    global _session
+    if mode not in (SAMPLING, CPROFILE):
+        raise ValueError(f"mode must be '{SAMPLING}' or '{CPROFILE}'")
+    with _lock:
+        if _session is not None:
+            raise RuntimeError(f"profile session {_session.id} is already running")
+        session = ProfileSession(mode, endpoint_codes(app), requests=requests, seconds=seconds,
+                                 interval_ms=interval_ms, routes=routes, threadpool_routes=threadpool_routes(app))
+        session.start()
+        _session = session
+    return session
+
+
+def stop() -> Optional[ProfileSession]:
+    """End the running session (idempotent) and write its output."""
+    global _session, _last
+    with _lock:
+        session, _session = _session, None
+        if session is None:
+            return None
+        _last = session
+    session.finish()
+    return session
+
+
+def _expire(session: ProfileSession):
+    if _session is session:
+        stop()
+
+
+def current() -> Optional[ProfileSession]:
+    return _session or _last
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI hook for cProfile sessions and request counting. With no session running
+    a request costs one global read; nothing is imported, enabled or allocated.
+    Ending a session joins the sampler and writes files, so it runs in the threadpool.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = _session
+        if session is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = session.begin_request()
+        # cprofile: wait for the request being profiled instead of running beside it
+        while profiler is None and session.mode == CPROFILE and _session is session:
+            await asyncio.sleep(SERIAL_POLL_SECONDS)
+            profiler = session.begin_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                # "METHOD /path", as reported by the sampler
+                route = f"{scope.get('method', '')} {route}"
+            if profiler is not None:
+                session.end_request(profiler, route or "unmatched")
+            elif route is not None and session.mode == SAMPLING and session.wants(route):
+                session.request_done(route)
+            if session.expired() and _session is session:
+                await run_in_threadpool(stop)
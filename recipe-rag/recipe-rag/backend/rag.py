@@ -1,18 +1,33 @@
 # RAG pipeline (Chroma + Embedding + Chunker)
 import os
-import uuid
+import json
 import pickle
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Iterable, Tuple, Callable, Set
 from loguru import logger
 
-from .embeddings import Embedder
-from .vectorstore_chroma import ChromaStore
+from .embeddings import Embedder, LRUCache, embed_failed
+from .vectorstore_sharded import get_store
+from .chunkers import get_chunker
+from .attributes import extract_recipe_attributes, chunk_metadata, build_where, IngredientIndex, INGREDIENT_FILTER_MAX_IDS
+from .shopping_list import ShoppingListEngine
+from .pantry import PantryIndex
+from .tracing import span
+from .metrics import RESULT_CACHE
+from .shared_index import INDEX_READ_ONLY, attach as attach_shared
 
-# chunk config
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 800))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 100))
 PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./vectordata")
 META_FILE = os.path.join(PERSIST_DIR, "chroma_meta.pkl")
+# search / find-recipe results per index version; 0 disables
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+# recipe_sources value for recipes read from recipe_dir (build_index, the watcher)
+RECIPE_DIR_SOURCE = "recipe_dir"
+
+
+def filters_key(filters: Dict[str, Any] = None):
+    """Canonical, hashable form of search filters; unset and empty filters all map to None."""
+    filters = {k: v for k, v in (filters or {}).items() if v not in (None, "", [])}
+    return json.dumps(filters, sort_keys=True, default=str) if filters else None
 
 
 class RecipeRAG:
@@ -20,52 +35,158 @@ class RecipeRAG:
     RAG using OpenAI embeddings + Chroma DB.
     - Will not re-embed if vector DB + metadata exists.
     - Stores chunk metadata in chroma_meta.pkl (ids->file, full recipes)
+    - read_only (default INDEX_READ_ONLY) never writes the index and attaches to the
+      memory-mapped export in <persist_dir>/shared when it is current (shared_index.py).
     """
 
-    def __init__(self, recipe_dir: str = "../data/recipes"):
+    def __init__(self, recipe_dir: str = "../data/recipes", persist_dir: str = None, chunker=None,
+                 read_only: bool = None):
         base = os.path.dirname(__file__)
         self.recipe_dir = os.path.abspath(os.path.join(base, recipe_dir))
+        self.persist_dir = persist_dir or PERSIST_DIR
+        self.meta_file = os.path.join(self.persist_dir, "chroma_meta.pkl")
+        # changes appended since meta_file was last written in full (see _save_meta_delta)
+        self.meta_journal = self.meta_file + ".journal"
+        self._pending_meta: List[Dict[str, Any]] = []
+        # chunker is any callable text -> List[str]; defaults to the CHUNKER env setting
+        self.chunker = chunker or get_chunker()
         self.embedder = Embedder()
-        self.store = ChromaStore()
+        self.store = get_store(persist_dir=self.persist_dir)
         # metadata
         self.chunk_to_file: Dict[str, str] = {}
         self.full_recipes: Dict[str, str] = {}
+        # structured attributes per recipe (diet, cuisine, time, ingredients); mirrored on chunk metadata
+        self.recipe_attrs: Dict[str, Dict[str, Any]] = {}
+        # where each recipe came from: RECIPE_DIR_SOURCE or an ingest source path (absent for older indexes)
+        self.recipe_sources: Dict[str, str] = {}
+        self._ingredient_index: IngredientIndex = None
+        self._shopping_list: ShoppingListEngine = None
+        self._pantry_index: PantryIndex = None
+        # results of repeated queries; cleared whenever the index changes in place
+        self.result_cache = LRUCache(SEARCH_CACHE_SIZE) if SEARCH_CACHE_SIZE > 0 else None
+        self._generation = 0
+        # one lazy index build at a time (see _lazy)
+        self._lazy_lock = threading.Lock()
+        self.read_only = INDEX_READ_ONLY if read_only is None else read_only
+        self.shared_dir: str = None
         # load metadata if present
         self._load_meta()
         self._index_loaded = False
 
     def _chunk_text(self, text: str) -> List[str]:
-        text = text.strip()
-        if not text:
-            return []
-        chunks = []
-        i = 0
-        L = len(text)
-        while i < L:
-            end = min(i + CHUNK_SIZE, L)
-            chunks.append(text[i:end])
-            if end == L:
-                break
-            i = end - CHUNK_OVERLAP
-        return chunks
+        return self.chunker(text)
 
     def _load_meta(self):
-        if os.path.exists(META_FILE):
+        if self.read_only and self._attach_shared():
+            return
+        if os.path.exists(self.meta_file):
             try:
-                with open(META_FILE, "rb") as fh:
+                with open(self.meta_file, "rb") as fh:
                     meta = pickle.load(fh)
                 self.chunk_to_file = meta.get("chunk_to_file", {})
                 self.full_recipes = meta.get("full_recipes", {})
+                self.recipe_attrs = meta.get("recipe_attrs", {})
+                self.recipe_sources = meta.get("recipe_sources", {})
+                self._replay_journal()
+                built_with = meta.get("chunker")
+                if built_with and built_with != getattr(self.chunker, "name", None):
+                    logger.warning(f"[RAG] index was built with chunker '{built_with}' — rebuild to apply the current chunker")
                 logger.info(f"[RAG] loaded metadata (chunks={len(self.chunk_to_file)}, recipes={len(self.full_recipes)})")
             except Exception as e:
                 logger.warning(f"[RAG] failed to load metadata: {e}")
 
+    def _attach_shared(self) -> bool:
+        try:
+            meta = attach_shared(self.persist_dir, self.meta_file)
+        except Exception as e:
+            logger.warning(f"[RAG] shared index unusable: {e}")
+            return False
+        if meta is None:
+            return False
+        self.chunk_to_file = meta["chunk_to_file"]
+        self.full_recipes = meta["full_recipes"]
+        self.recipe_attrs = meta["recipe_attrs"]
+        self.recipe_sources = meta.get("recipe_sources", {})
+        self.shared_dir = meta["directory"]
+        logger.info(f"[RAG] attached shared index {self.shared_dir} "
+                    f"(chunks={len(self.chunk_to_file)}, recipes={len(self.full_recipes)})")
+        return True
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("read-only worker: index changes go through the leader or a versioned build")
+
+    def _apply_meta_delta(self, delta: Dict[str, Any]):
+        for cid in delta.get("removed_chunks", ()):
+            self.chunk_to_file.pop(cid, None)
+        for fname in delta.get("removed_recipes", ()):
+            self.full_recipes.pop(fname, None)
+            self.recipe_attrs.pop(fname, None)
+            self.recipe_sources.pop(fname, None)
+        for fname, (raw, attrs) in delta.get("recipes", {}).items():
+            self.full_recipes[fname] = raw
+            self.recipe_attrs[fname] = attrs
+        self.recipe_sources.update(delta.get("sources", {}))
+        self.chunk_to_file.update(delta.get("chunks", {}))
+
+    def _replay_journal(self):
+        if not os.path.exists(self.meta_journal):
+            return
+        applied = 0
+        with open(self.meta_journal, "rb") as fh:
+            while True:
+                try:
+                    delta = pickle.load(fh)
+                except EOFError:
+                    break
+                except Exception as e:
+                    # a crash mid-append leaves a partial last record; everything before it is intact
+                    logger.warning(f"[RAG] metadata journal ends in a partial record ({e}); ignoring it")
+                    break
+                self._apply_meta_delta(delta)
+                applied += 1
+        logger.info(f"[RAG] replayed {applied} metadata journal records")
+
+    def _save_meta_delta(self):
+        """
+        Append the metadata changes since the last save to chroma_meta.pkl.journal.
+        Costs what changed rather than the whole index; _save_meta() folds the journal back in.
+        """
+        if not self._pending_meta:
+            return
+        if not os.path.exists(self.meta_file):
+            self._save_meta()  # the journal needs a base to apply to
+            return
+        try:
+            with open(self.meta_journal, "ab") as fh:
+                for delta in self._pending_meta:
+                    pickle.dump(delta, fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            logger.info(f"[RAG] metadata journal: {len(self._pending_meta)} records appended")
+            self._pending_meta.clear()
+        except Exception as e:
+            logger.error(f"[RAG] metadata journal append failed: {e}")
+
     def _save_meta(self):
         try:
-            meta = {"chunk_to_file": self.chunk_to_file, "full_recipes": self.full_recipes}
-            os.makedirs(PERSIST_DIR, exist_ok=True)
-            with open(META_FILE, "wb") as fh:
+            meta = {
+                "chunk_to_file": self.chunk_to_file,
+                "full_recipes": self.full_recipes,
+                "recipe_attrs": self.recipe_attrs,
+                "recipe_sources": self.recipe_sources,
+                "chunker": getattr(self.chunker, "name", type(self.chunker).__name__),
+            }
+            os.makedirs(self.persist_dir, exist_ok=True)
+            # write-then-rename so an interrupted save never leaves a truncated pickle
+            tmp = self.meta_file + ".tmp"
+            with open(tmp, "wb") as fh:
                 pickle.dump(meta, fh)
+            os.replace(tmp, self.meta_file)
+            # the full pickle now holds everything the journal did (replaying it again would be harmless)
+            if os.path.exists(self.meta_journal):
+                os.remove(self.meta_journal)
+            self._pending_meta.clear()
             logger.info("[RAG] metadata saved")
         except Exception as e:
             logger.error(f"[RAG] metadata save failed: {e}")
@@ -83,10 +204,18 @@ class RecipeRAG:
 
         if count > 0 and self.chunk_to_file:
             logger.info("[RAG] existing vector DB + metadata found — skipping re-embedding")
+            if set(self.recipe_attrs) != set(self.full_recipes):
+                if self.read_only:
+                    logger.warning("[RAG] attributes missing for some recipes; the leader backfills them")
+                else:
+                    self.backfill_attributes()
             self._index_loaded = True
             return
 
         # else we must (re)create index
+        if self.read_only:
+            raise RuntimeError(f"no index in {self.persist_dir}; read-only workers need it built first "
+                               "(start_server.py --preload does that)")
         if not os.path.exists(self.recipe_dir):
             logger.warning(f"[RAG] recipe dir not found: {self.recipe_dir}")
             return
@@ -96,37 +225,314 @@ class RecipeRAG:
             logger.warning("[RAG] no .txt files found in recipe dir")
             return
 
-        ids, texts, embeddings = [], [], []
-
         logger.info(f"[RAG] Indexing {len(files)} recipe files...")
+        recipes = []
         for fname in files:
             path = os.path.join(self.recipe_dir, fname)
             with open(path, "r", encoding="utf-8") as fh:
-                raw = fh.read().strip()
-            self.full_recipes[fname] = raw
+                recipes.append((fname, fh.read().strip()))
+
+        n_chunks = self.add_recipes(recipes, source=RECIPE_DIR_SOURCE)
+        if n_chunks:
+            self.store.persist()
+            self._save_meta()
+            self._index_loaded = True
+            logger.info(f"[RAG] Indexed {n_chunks} chunks from {len(files)} files")
+
+    def add_recipes(self, recipes: Iterable[Tuple[str, str]], source: str = None) -> int:
+        """
+        Chunk, embed and upsert a batch of (recipe_id, text) pairs.
+        - Chunk ids are deterministic (recipe_id::chunk::i) so re-adding a recipe is idempotent.
+        - Re-added recipes lose any chunks the new text no longer produces (after the upsert,
+          so the recipe never disappears from search in between).
+        - All chunks of the batch go through a single embed() call.
+        - source is recorded in recipe_sources; None keeps each recipe's existing source.
+        - Metadata is updated in memory only; callers decide when to persist
+          (_save_meta for a full write, _save_meta_delta to append just these changes).
+        Returns the number of chunks written.
+        """
+        self._check_writable()
+        ids, texts, owners, metadatas = [], [], [], []
+        replaced = set()
+        for fname, raw in recipes:
+            raw = raw.strip()
             chunks = self._chunk_text(raw)
             if not chunks:
                 continue
-            logger.info(f"[RAG] {fname}: {len(chunks)} chunks")
-            # embed chunks
-            chunk_embs = self.embedder.embed(chunks)
+            if fname in self.full_recipes:
+                replaced.add(fname)
+            self.full_recipes[fname] = raw
+            self.recipe_attrs[fname] = extract_recipe_attributes(raw)
+            if source is not None:
+                self.recipe_sources[fname] = source
+            meta = chunk_metadata(fname, self.recipe_attrs[fname])
+            logger.debug(f"[RAG] {fname}: {len(chunks)} chunks")
             for i, chunk in enumerate(chunks):
-                _id = f"{fname}::chunk::{i}::{uuid.uuid4()}"
+                _id = f"{fname}::chunk::{i}"
                 ids.append(_id)
                 texts.append(chunk)
-                embeddings.append(chunk_embs[i])
-                self.chunk_to_file[_id] = fname
+                owners.append(fname)
+                metadatas.append(meta)
+
+        if not ids:
+            return 0
+        new_ids = set(ids)
+        stale = [cid for cid in self._chunk_ids_for(replaced) if cid not in new_ids] if replaced else []
+        # map new chunk ids only once their vectors exist
+        embeddings = self.embedder.embed(texts)
+        self.store.upsert_documents(ids=ids, texts=texts, embeddings=embeddings, metadatas=metadatas)
+        self._invalidate()
+        for _id, fname in zip(ids, owners):
+            self.chunk_to_file[_id] = fname
+        if stale:
+            self.store.delete(stale)
+            for cid in stale:
+                self.chunk_to_file.pop(cid, None)
+        added = dict.fromkeys(owners)
+        self._pending_meta.append({
+            "recipes": {f: (self.full_recipes[f], self.recipe_attrs[f]) for f in added},
+            "sources": {f: self.recipe_sources[f] for f in added if f in self.recipe_sources},
+            "chunks": dict(zip(ids, owners)),
+            "removed_chunks": stale,
+        })
+        return len(ids)
 
+    def remove_recipes(self, fnames: Iterable[str]) -> int:
+        """Drop recipes and all their chunks from the store and metadata. Returns chunks removed."""
+        self._check_writable()
+        fnames = set(fnames)
+        ids = self._chunk_ids_for(fnames)
         if ids:
-            self.store.add_documents(ids=ids, texts=texts, embeddings=embeddings)
-            self.store.persist()
-            self._save_meta()
-            self._index_loaded = True
-            logger.info(f"[RAG] Indexed {len(ids)} chunks from {len(files)} files")
+            self.store.delete(ids)
+        for cid in ids:
+            self.chunk_to_file.pop(cid, None)
+        for fname in fnames:
+            self.full_recipes.pop(fname, None)
+            self.recipe_attrs.pop(fname, None)
+            self.recipe_sources.pop(fname, None)
+        self._pending_meta.append({"removed_recipes": list(fnames), "removed_chunks": ids})
+        self._invalidate()
+        return len(ids)
+
+    def backfill_attributes(self):
+        """Attach attribute metadata to chunks of an index built before filters existed (no re-embedding)."""
+        self._check_writable()
+        missing = [f for f in self.full_recipes if f not in self.recipe_attrs]
+        for fname in missing:
+            self.recipe_attrs[fname] = extract_recipe_attributes(self.full_recipes[fname])
+        ids = [cid for cid, fname in self.chunk_to_file.items() if fname in self.recipe_attrs]
+        metas = [chunk_metadata(self.chunk_to_file[cid], self.recipe_attrs[self.chunk_to_file[cid]]) for cid in ids]
+        self.store.update_metadata(ids, metas)
+        self._invalidate()
+        self._save_meta()
+        logger.info(f"[RAG] backfilled attributes for {len(missing)} recipes / {len(ids)} chunks")
+
+    def _invalidate(self):
+        """Drop everything derived from the index contents (lazy indexes, cached results)."""
+        self._ingredient_index = None
+        self._shopping_list = None
+        self._pantry_index = None
+        self._generation += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def cached(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """
+        compute() through the result cache; key[0] names the kind ("search", "chain").
+        Cached values are shared between requests and must not be mutated. A result
+        computed while the index changed underneath, or ranked against placeholder vectors
+        because embedding failed (embed_failed), is returned but not cached.
+        """
+        if self.result_cache is None:
+            return compute()
+        value = self.result_cache.get(key)
+        if value is not None:
+            RESULT_CACHE.inc(key[0], "hit")
+            return value
+        RESULT_CACHE.inc(key[0], "miss")
+        generation = self._generation
+        token = embed_failed.set(False)
+        try:
+            value = compute()
+            failed = embed_failed.get()
+        finally:
+            embed_failed.reset(token)
+        if failed:
+            logger.warning(f"[RAG] embedding failed; '{key[0]}' result not cached")
+        elif generation == self._generation:
+            self.result_cache.put(key, value)
+        return value
+
+    def _lazy(self, attr: str, build: Callable[[Dict[str, Dict[str, Any]]], Any]) -> Any:
+        """
+        The index cached in `attr`, built from a snapshot of recipe_attrs on first use.
+        The live indexer changes recipe_attrs concurrently, so builds never iterate it
+        directly, and a build that overlapped an _invalidate() is returned but not kept.
+        """
+        value = getattr(self, attr)
+        if value is not None:
+            return value
+        with self._lazy_lock:
+            value = getattr(self, attr)
+            if value is not None:
+                return value
+            generation = self._generation
+            # dict() copies in one step under the GIL, unlike iterating the live dict
+            value = build(dict(self.recipe_attrs))
+            if generation == self._generation:
+                setattr(self, attr, value)
+        return value
 
-    def search(self, query: str, top_k: int = 5):
-        q_emb = self.embedder.embed([query])[0]
-        return self.store.query(q_emb, top_k=top_k)
+    @property
+    def ingredient_index(self) -> IngredientIndex:
+        return self._lazy("_ingredient_index", IngredientIndex)
+
+    @property
+    def shopping_list(self) -> ShoppingListEngine:
+        return self._lazy("_shopping_list", lambda attrs: ShoppingListEngine(self, attrs))
+
+    @property
+    def pantry_index(self) -> PantryIndex:
+        if self.shared_dir:
+            # attached workers map the leader's arrays instead of building their own
+            return self._lazy("_pantry_index", lambda attrs: PantryIndex.load(self.shared_dir))
+        return self._lazy("_pantry_index", PantryIndex)
+
+    def rebuild_shard(self, shard: int) -> int:
+        """Re-embed only the recipes routed to one shard of a ShardedChromaStore."""
+        self._check_writable()
+        if not hasattr(self.store, "reset_shard"):
+            raise ValueError("rebuild_shard requires CHROMA_SHARDS > 1")
+        fnames = {fname for cid, fname in self.chunk_to_file.items()
+                  if self.store.shard_for(cid, chunk_metadata(fname, self.recipe_attrs.get(fname, {}))) == shard}
+        recipes = [(f, self.full_recipes[f]) for f in fnames if f in self.full_recipes]
+        self.store.reset_shard(shard)
+        for cid in self._chunk_ids_for(fnames):
+            self.chunk_to_file.pop(cid, None)
+        for f, _ in recipes:
+            self.full_recipes.pop(f, None)
+        n = self.add_recipes(recipes)
+        self.store.persist()
+        self._save_meta()
+        logger.info(f"[RAG] rebuilt shard {shard}: {len(recipes)} recipes, {n} chunks")
+        return n
+
+    def _chunk_ids_for(self, fnames) -> List[str]:
+        return [cid for cid, fname in list(self.chunk_to_file.items()) if fname in fnames]
+
+    def _resolve_where(self, filters: Dict[str, Any] = None):
+        """
+        Returns (where, empty, allowed):
+        - empty=True when the filters cannot match any recipe;
+        - ingredient filters go into `where` as recipe_id $in (or $nin of the complement) when
+          that list has at most INGREDIENT_FILTER_MAX_IDS ids; otherwise `allowed` is the recipe
+          id set to keep, applied to the query results (search_by_embedding).
+        """
+        if not filters:
+            return None, False, None
+        if not (filters.get("include_ingredients") or filters.get("exclude_ingredients")):
+            return build_where(filters), False, None
+        index = self.ingredient_index
+        allowed = index.allowed(filters.get("include_ingredients") or [], filters.get("exclude_ingredients") or [])
+        if not allowed:
+            return None, True, None
+        if len(allowed) <= INGREDIENT_FILTER_MAX_IDS:
+            return build_where(filters, allowed_ids=allowed), False, None
+        excluded = index.all - allowed
+        if len(excluded) <= INGREDIENT_FILTER_MAX_IDS:
+            return build_where(filters, excluded_ids=excluded), False, None
+        return build_where(filters), False, allowed
+
+    def search(self, query: str, top_k: int = 5, filters: Dict[str, Any] = None, collapse: bool = False):
+        """
+        Semantic search over chunks. `filters` (vegetarian, vegan, cuisine, max_total_time,
+        max_ingredients, include_ingredients, exclude_ingredients) are pushed into the
+        vector query as a metadata `where` clause, so top-k is taken over matching chunks only.
+        Ingredient filters are resolved to a recipe id set via the inverted ingredient index.
+        With collapse=True, returns top_k distinct recipes (see search_by_embedding).
+        Repeated searches are served from the result cache.
+        """
+        key = ("search", query, top_k, filters_key(filters), collapse)
+        return self.cached(key, lambda: self._search(query, top_k, filters, collapse))
+
+    def _search(self, query: str, top_k: int, filters: Dict[str, Any], collapse: bool):
+        with span("rag.search", top_k=top_k, collapse=collapse, filters=sorted(filters or {})) as s:
+            where, empty, allowed = self._resolve_where(filters)
+            if empty:
+                s.set(results=0)
+                return []
+            q_emb = self.embedder.embed([query])[0]
+            results = self.search_by_embedding(q_emb, top_k=top_k, where=where, collapse=collapse, allowed=allowed)
+            s.set(results=len(results))
+            return results
+
+    def search_by_embedding(self, q_emb, top_k: int = 5, where: Dict[str, Any] = None, collapse: bool = False,
+                            allowed: Set[str] = None):
+        """allowed: recipe ids to keep, for ingredient filters too large for `where` (see _resolve_where)."""
+        if collapse:
+            return self._search_collapsed(q_emb, top_k, where, allowed)
+        if allowed is None:
+            return self.store.query(q_emb, top_k=top_k, where=where)
+        fetch = top_k * self._allowed_overfetch(allowed)
+        while True:
+            results, exhausted = self._query_allowed(q_emb, fetch, where, allowed)
+            if len(results) >= top_k or exhausted:
+                return results[:top_k]
+            fetch *= 2
+
+    def _allowed_overfetch(self, allowed: Set[str] = None) -> int:
+        return 1 if allowed is None else -(-max(1, len(self.full_recipes)) // max(1, len(allowed)))
+
+    def _query_allowed(self, q_emb, fetch: int, where: Dict[str, Any] = None, allowed: Set[str] = None):
+        """store.query without chunks of recipes outside `allowed`; also True once the store has nothing more."""
+        total = len(self.chunk_to_file)
+        fetch = min(fetch, max(total, 1))
+        results = self.store.query(q_emb, top_k=fetch, where=where)
+        exhausted = len(results) < fetch or fetch >= total
+        if allowed is not None:
+            results = [r for r in results if self.chunk_to_file.get(r[0], r[0].split("::")[0]) in allowed]
+        return results, exhausted
+
+    def _search_collapsed(self, q_emb, k: int, where: Dict[str, Any] = None, allowed: Set[str] = None,
+                          chunks: bool = False) -> List[Dict[str, Any]]:
+        """
+        Recipe-level results: chunks are grouped by recipe, each recipe is ranked by its
+        best chunk and also reports aggregate_score (sum of its retrieved chunk similarities).
+        Over-fetch starts at k x average chunks per recipe (scaled up when results are
+        post-filtered by `allowed`) and doubles only while fewer than k distinct recipes
+        came back and the store still has more chunks.
+        chunks=True adds each recipe's retrieved (chunk_id, distance, content) triples, best first.
+        """
+        total = len(self.chunk_to_file)
+        chunks_per_recipe = total / max(1, len(self.full_recipes))
+        fetch = max(k, int(k * chunks_per_recipe * self._allowed_overfetch(allowed) + 0.999))
+        while True:
+            results, exhausted = self._query_allowed(q_emb, max(fetch, k), where, allowed)
+            groups: Dict[str, Dict[str, Any]] = {}
+            for chunk_id, distance, content in results:
+                fname = self.chunk_to_file.get(chunk_id, chunk_id.split("::")[0])
+                g = groups.get(fname)
+                if g is None:
+                    # results arrive best-first, so the first chunk seen is the recipe's best
+                    groups[fname] = g = {
+                        "recipe_id": fname,
+                        "id": chunk_id,
+                        "content": content,
+                        "distance": distance,
+                        "score": 1.0 - distance,
+                        "aggregate_score": 0.0,
+                        "matched_chunks": 0,
+                    }
+                    if chunks:
+                        g["chunks"] = []
+                g["aggregate_score"] += 1.0 - distance
+                g["matched_chunks"] += 1
+                if chunks:
+                    g["chunks"].append((chunk_id, distance, content))
+            if len(groups) >= k or exhausted:
+                break
+            fetch *= 2
+        return list(groups.values())[:k]
 
 
 # Legacy class for backward compatibility
@@ -151,11 +557,14 @@ class RAGPipeline:
                 })
         return chunks
         
-    def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Retrieve relevant documents for a query"""
+    def retrieve(self, query: str, k: int = 5, collapse: bool = False) -> List[Dict[str, Any]]:
+        """Retrieve relevant documents for a query (k distinct recipes when collapse=True)"""
         if not self.recipe_rag._index_loaded:
             self.recipe_rag.build_index()
             
+        if collapse:
+            return [dict(r, filename=r["recipe_id"]) for r in self.recipe_rag.search(query, top_k=k, collapse=True)]
+
         results = self.recipe_rag.search(query, top_k=k)
         
         # Convert to expected format
@@ -0,0 +1,135 @@
+# Read-only index data shared by worker processes through memory-mapped files
+import os
+import json
+import mmap
+import time
+import pickle
+import shutil
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: run a single worker there
+    fcntl = None
+
+# set for the workers start_server.py spawns: attach to the leader's export, never write the index
+INDEX_READ_ONLY = os.getenv("INDEX_READ_ONLY", "false").lower() in ("1", "true", "yes")
+
+SHARED_DIR = "shared"
+LOCK_FILE = ".index.lock"
+
+
+@contextmanager
+def index_lock(persist_dir: str, exclusive: bool = True):
+    """flock on <persist_dir>/.index.lock: one builder at a time, readers wait for it to finish."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(persist_dir, exist_ok=True)
+    with open(os.path.join(persist_dir, LOCK_FILE), "a+") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class MappedTexts(Mapping):
+    """Read-only {recipe_id: text} over one memory-mapped UTF-8 blob plus an offsets array."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "recipe_ids.json"), encoding="utf-8") as fh:
+            self._ids = json.load(fh)
+        self._position = {rid: i for i, rid in enumerate(self._ids)}
+        self._offsets = np.load(os.path.join(directory, "recipe_offsets.npy"), mmap_mode="r")
+        path = os.path.join(directory, "recipe_texts.bin")
+        self._buf = b""
+        if os.path.getsize(path):  # mmap refuses empty files
+            with open(path, "rb") as fh:
+                self._buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, key: str) -> str:
+        i = self._position[key]
+        return self._buf[int(self._offsets[i]):int(self._offsets[i + 1])].decode("utf-8")
+
+    def __contains__(self, key) -> bool:
+        return key in self._position
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def export(rag) -> str:
+    """
+    Write rag's metadata (without recipe texts), its texts as one blob and its pantry
+    arrays to <persist_dir>/shared. The directory is swapped in whole; workers that
+    mapped the previous files keep valid mappings. Call under index_lock().
+    """
+    target = os.path.join(rag.persist_dir, SHARED_DIR)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    ids = list(rag.full_recipes)
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    with open(os.path.join(tmp, "recipe_texts.bin"), "wb") as fh:
+        for i, rid in enumerate(ids):
+            data = rag.full_recipes[rid].encode("utf-8")
+            fh.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(tmp, "recipe_offsets.npy"), offsets)
+    with open(os.path.join(tmp, "recipe_ids.json"), "w", encoding="utf-8") as fh:
+        json.dump(ids, fh)
+    with open(os.path.join(tmp, "meta.pkl"), "wb") as fh:
+        pickle.dump({
+            "chunk_to_file": rag.chunk_to_file,
+            "recipe_attrs": rag.recipe_attrs,
+            "recipe_sources": rag.recipe_sources,
+            "chunker": getattr(rag.chunker, "name", type(rag.chunker).__name__),
+        }, fh)
+    rag.pantry_index.save(tmp)
+    # written last: an export without a manifest is ignored
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as fh:
+        json.dump({"meta_mtime_ns": _mtime(rag.meta_file), "journal_mtime_ns": _mtime(rag.meta_file + ".journal"),
+                   "recipes": len(ids), "exported_at": time.time()}, fh)
+
+    old = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.rename(target, old)
+    os.rename(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    logger.info(f"[Shared] exported {len(ids)} recipes to {target} ({int(offsets[-1]) / 1e6:.1f} MB of text)")
+    return target
+
+
+def attach(persist_dir: str, meta_file: str) -> Optional[Dict[str, Any]]:
+    """Metadata of the shared export with full_recipes memory-mapped; None if missing or stale."""
+    directory = os.path.join(persist_dir, SHARED_DIR)
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except FileNotFoundError:
+        return None
+    if (manifest.get("meta_mtime_ns"), manifest.get("journal_mtime_ns")) != (_mtime(meta_file), _mtime(meta_file + ".journal")):
+        logger.warning(f"[Shared] {directory} is older than {meta_file}; loading the private copy instead")
+        return None
+    with open(os.path.join(directory, "meta.pkl"), "rb") as fh:
+        meta = pickle.load(fh)
+    meta["full_recipes"] = MappedTexts(directory)
+    meta["directory"] = directory
+    return meta
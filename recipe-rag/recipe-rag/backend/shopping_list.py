@@ -0,0 +1,271 @@
+# Aggregated shopping lists over many recipes (meal plans) with unit normalization
+import re
+import time
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from .chunkers import split_sections
+from .metrics import timed
+
+# unit -> (dimension, factor to the dimension's base unit: ml for volume, g for mass)
+UNITS = {
+    "teaspoon": ("volume", 4.92892), "tsp": ("volume", 4.92892),
+    "tablespoon": ("volume", 14.7868), "tbsp": ("volume", 14.7868), "tbs": ("volume", 14.7868),
+    "cup": ("volume", 236.588), "c": ("volume", 236.588),
+    "fluid ounce": ("volume", 29.5735), "fl oz": ("volume", 29.5735),
+    "pint": ("volume", 473.176), "quart": ("volume", 946.353), "gallon": ("volume", 3785.41),
+    "milliliter": ("volume", 1.0), "ml": ("volume", 1.0),
+    "liter": ("volume", 1000.0), "litre": ("volume", 1000.0), "l": ("volume", 1000.0),
+    "gram": ("mass", 1.0), "g": ("mass", 1.0), "milligram": ("mass", 0.001), "mg": ("mass", 0.001),
+    "kilogram": ("mass", 1000.0), "kg": ("mass", 1000.0),
+    "ounce": ("mass", 28.3495), "oz": ("mass", 28.3495),
+    "pound": ("mass", 453.592), "lb": ("mass", 453.592), "lbs": ("mass", 453.592),
+}
+# counted units are summed per unit ("3 cloves" + "4 cloves"), never converted
+COUNT_UNITS = ["clove", "can", "slice", "pinch", "sprig", "head", "bunch", "stick", "package",
+               "packet", "jar", "bottle", "bag", "dash", "handful", "sheet", "stalk", "fillet"]
+BASE_UNITS = {"volume": "ml", "mass": "g"}
+
+SIZE_AND_PREP = {"large", "medium", "small", "extra-large", "fresh", "freshly", "chopped", "minced",
+                 "diced", "sliced", "grated", "shredded", "softened", "melted", "finely", "roughly", "thinly", "optional", "about", "approximately",
+                 "boneless", "skinless", "bone-in", "skin-on"}
+
+# words that open a trailing prep clause ("chicken breast, cut into strips", "butter, at room temperature")
+PREP_CLAUSE_START = {"cut", "to", "at", "for", "plus", "or", "divided", "such", "if", "preferably", "into",
+                     "with", "without", "about", "room", "torn", "halved", "quartered", "trimmed", "beaten"}
+
+# modifiers that don't change what you buy: pantry "butter" covers "unsalted butter", "flour" covers "all-purpose flour"
+INTERCHANGEABLE_MODIFIERS = {"unsalted", "salted", "all-purpose", "plain", "kosher", "sea", "table", "granulated",
+                             "extra", "extra-virgin", "virgin", "whole", "low-sodium", "reduced-sodium", "organic"}
+
+UNICODE_FRACTIONS = {"½": ".5", "¼": ".25", "¾": ".75", "⅓": ".333", "⅔": ".667", "⅛": ".125"}
+
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+\.)\s+")
+_QTY = re.compile(r"^(?:(\d+(?:\.\d+)?)\s+)?(\d+(?:\.\d+)?)(?:/(\d+))?(?:\s*-\s*(\d+(?:\.\d+)?)(?:/(\d+))?)?\s*")
+_UNIT = re.compile(r"^(" + "|".join(sorted((re.escape(u) for u in list(UNITS) + COUNT_UNITS), key=len, reverse=True))
+                   + r")(?:e?s)?\.?(?=\s|$)\s*(?:of\s+)?", re.I)
+_TO_TASTE = re.compile(r"\b(to taste|as needed|for serving|for garnish)\b.*$", re.I)
+
+
+def _singular(word: str) -> str:
+    if word == "leaves":
+        return "leaf"
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _is_prep_clause(clause: str) -> bool:
+    words = re.findall(r"[a-z][a-z'\-]*", clause)
+    if not words or words[0] in PREP_CLAUSE_START:
+        return True
+    # "finely chopped", "peeled and diced", "softened"
+    return all(w in SIZE_AND_PREP or w in ("and", "or", "then") or (len(w) > 4 and w.endswith(("ed", "ly")))
+               for w in words)
+
+
+def _strip_prep_clauses(text: str) -> str:
+    """Drop trailing comma clauses that describe preparation; keep leading ones ("boneless, skinless chicken")."""
+    clauses = text.split(",")
+    while len(clauses) > 1 and _is_prep_clause(clauses[-1]):
+        clauses.pop()
+    return " ".join(clauses)
+
+
+def _number(whole: Optional[str], num: str, den: Optional[str]) -> float:
+    value = float(num) / float(den) if den else float(num)
+    return value + (float(whole) if whole else 0.0)
+
+
+def parse_ingredient_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    "1 1/2 cups all-purpose flour" -> {"name": "all-purpose flour", "qty": 354.9, "unit": "ml", "dimension": "volume"}
+    qty is None for unquantified items ("Salt, to taste"); ranges use the upper bound.
+    """
+    text = _BULLET.sub("", line.strip())
+    for uni, dec in UNICODE_FRACTIONS.items():
+        text = re.sub(rf"(\d)\s*{uni}", rf"\1{dec}", text).replace(uni, "0" + dec)
+    text = re.sub(r"\(.*?\)", " ", text).strip()
+    if not text or text.endswith(":"):
+        return None
+
+    qty = None
+    m = _QTY.match(text)
+    if m and m.group(0).strip():
+        whole, num, den, hi, hi_den = m.groups()
+        qty = _number(None, hi, hi_den) if hi else _number(whole, num, den)
+        text = text[m.end():]
+    elif re.match(r"^an?\s+", text, re.I):
+        qty = 1.0
+        text = re.sub(r"^an?\s+", "", text, flags=re.I)
+
+    text = re.sub(r"^(?:(?:extra-large|large|medium|small)\s+)+", "", text, flags=re.I)
+    unit, dimension = None, "count"
+    u = _UNIT.match(text)
+    if u and (qty is not None or u.group(1).lower() in COUNT_UNITS):
+        unit = u.group(1).lower()
+        text = text[u.end():]
+        if unit in UNITS:
+            dimension, factor = UNITS[unit]
+            qty = qty * factor if qty is not None else None
+            unit = BASE_UNITS[dimension]
+        else:
+            dimension = f"count:{unit}"
+            qty = qty if qty is not None else 1.0
+
+    text = _strip_prep_clauses(_TO_TASTE.sub("", text.lower()))
+    words = [w for w in re.findall(r"[a-z][a-z'\-]*", text) if w not in SIZE_AND_PREP]
+    if words and words[0] == "of":
+        words = words[1:]
+    if not words:
+        return None
+    words[-1] = _singular(words[-1])
+    return {"name": " ".join(words), "qty": qty, "unit": unit, "dimension": dimension}
+
+
+def structured_ingredients(text: str) -> List[Dict[str, Any]]:
+    """Parse the Ingredients section once (stored in recipe_attrs at index time)."""
+    block = next((body for name, body in split_sections(text) if name == "ingredients"), "")
+    out = []
+    for line in block.splitlines():
+        if line.strip().lower().startswith("ingredients"):
+            continue
+        item = parse_ingredient_line(line)
+        if item:
+            out.append(item)
+    return out
+
+
+def _format_qty(qty: Optional[float], unit: Optional[str], dimension: str) -> Tuple[Optional[float], Optional[str]]:
+    if qty is None:
+        return None, None
+    if dimension == "volume" and qty >= 1000:
+        return round(qty / 1000, 2), "l"
+    if dimension == "mass" and qty >= 1000:
+        return round(qty / 1000, 2), "kg"
+    if dimension.startswith("count:"):
+        plural = "es" if unit.endswith(("ch", "sh")) else "s"
+        return round(qty, 2), unit + (plural if qty > 1 else "")
+    return round(qty, 1), unit
+
+
+def _covers(pantry_name: str, name: str) -> bool:
+    """
+    Whole-token match on the head noun (the last word): "salt" never covers "unsalted butter",
+    nor "egg" "egg yolk". Other words must agree except INTERCHANGEABLE_MODIFIERS, so
+    "potato" does not cover "yukon gold potato".
+    """
+    p, n = pantry_name.split(), name.split()
+    if not p or not n or p[-1] != n[-1]:
+        return False
+    return set(p[:-1]) ^ set(n[:-1]) <= INTERCHANGEABLE_MODIFIERS
+
+
+def aggregate_shopping_list(recipes: Iterable[Tuple[str, List[Dict[str, Any]], float]],
+                            pantry: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Merge the structured ingredients of many recipes into one list.
+    recipes: (recipe_id, structured_ingredients, servings multiplier)
+    pantry:  free text ("flour", "500 g rice"); an item without a quantity covers every
+             ingredient it matches (_covers), one with a quantity is used up across the
+             matching ingredients of the same dimension, never counted twice.
+    """
+    totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for recipe_id, items, multiplier in recipes:
+        for item in items:
+            key = (item["name"], item["dimension"])
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = {"name": item["name"], "dimension": item["dimension"], "unit": item["unit"],
+                                       "qty": None, "recipes": []}
+            if item["qty"] is not None:
+                entry["qty"] = (entry["qty"] or 0.0) + item["qty"] * multiplier
+            if recipe_id not in entry["recipes"]:
+                entry["recipes"].append(recipe_id)
+
+    # "salt, to taste" folds into a quantified "1 tsp salt" from another recipe
+    quantified = {name for (name, _), e in totals.items() if e["qty"] is not None}
+    for key in [k for k, e in totals.items() if e["qty"] is None and k[0] in quantified]:
+        loose = totals.pop(key)
+        target = next(e for (name, _), e in totals.items() if name == key[0] and e["qty"] is not None)
+        target["recipes"].extend(r for r in loose["recipes"] if r not in target["recipes"])
+
+    stock = [p for p in (parse_ingredient_line(x) for x in pantry) if p]
+    # what is left of each quantified pantry item as it is used up
+    left = [p["qty"] for p in stock]
+    to_buy, have = [], []
+    for (name, dimension), entry in sorted(totals.items()):
+        qty = entry["qty"]
+        for i, p in enumerate(stock):
+            if not _covers(p["name"], name):
+                continue
+            if p["qty"] is None or qty is None:
+                qty = 0.0
+            elif p["dimension"] == dimension:
+                used = min(left[i], qty)
+                left[i] -= used
+                qty -= used
+        quantity, unit = _format_qty(entry["qty"], entry["unit"], dimension)
+        row = {"name": name, "quantity": quantity, "unit": unit, "recipes": entry["recipes"]}
+        if qty is not None and qty <= 1e-9:
+            have.append(row)
+        else:
+            if qty is not None and qty < entry["qty"]:
+                row["quantity"], row["unit"] = _format_qty(qty, entry["unit"], dimension)
+            to_buy.append(row)
+    return {"items": to_buy, "in_pantry": have}
+
+
+class ShoppingListEngine:
+    """Shopping lists for meal plans over a loaded RecipeRAG (recipe ids or titles)."""
+
+    def __init__(self, rag, recipe_attrs: Dict[str, Dict[str, Any]] = None):
+        self.rag = rag
+        attrs = rag.recipe_attrs if recipe_attrs is None else recipe_attrs
+        self._titles = {a.get("title", "").lower(): rid for rid, a in attrs.items() if a.get("title")}
+
+    def resolve(self, ref: str) -> Optional[str]:
+        if ref in self.rag.full_recipes:
+            return ref
+        if f"{ref}.txt" in self.rag.full_recipes:
+            return f"{ref}.txt"
+        return self._titles.get(ref.lower().strip())
+
+    def ingredients_for(self, recipe_id: str) -> List[Dict[str, Any]]:
+        attrs = self.rag.recipe_attrs.get(recipe_id)
+        if attrs is not None and "structured_ingredients" in attrs:
+            return attrs["structured_ingredients"]
+        # indexes built before structured parsing: parse once and keep it in memory
+        items = structured_ingredients(self.rag.full_recipes.get(recipe_id, ""))
+        if attrs is not None:
+            attrs["structured_ingredients"] = items
+        return items
+
+    def build(self, recipes: Iterable[str], pantry: Iterable[str] = (), servings: float = 1.0) -> Dict[str, Any]:
+        started = time.perf_counter()
+        counts: Dict[str, int] = {}
+        unknown = []
+        for ref in recipes:
+            rid = self.resolve(ref)
+            if rid is None:
+                unknown.append(ref)
+            else:
+                counts[rid] = counts.get(rid, 0) + 1
+        # a recipe planned twice needs twice the ingredients
+        batch = [(rid, self.ingredients_for(rid), n * servings) for rid, n in counts.items()]
+        with timed("shopping_list"):
+            out = aggregate_shopping_list(batch, pantry)
+        out.update({
+            "recipes": counts,
+            "unknown_recipes": unknown,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        })
+        return out
+
+
+def meal_plan_recipes(meal_plan: Dict[str, Dict[str, Optional[str]]]) -> List[str]:
+    """Flatten the Streamlit meal_plan ({day: {meal: recipe}}) into recipe references."""
+    return [recipe for day in meal_plan.values() for recipe in day.values() if recipe]
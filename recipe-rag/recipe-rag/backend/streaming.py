@@ -0,0 +1,64 @@
+# Streaming responses: NDJSON or server-sent events from (event, payload) iterators
+import json
+import time
+from typing import Iterable, Iterator, Tuple, Dict, Any, List, Optional
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+
+
+def select_fields(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the requested keys (all keys when fields is empty)."""
+    if not fields:
+        return item
+    return {k: v for k, v in item.items() if k in fields}
+
+
+def negotiate(fmt: Optional[str], accept: Optional[str]) -> str:
+    """?format=sse|ndjson wins, otherwise the Accept header; NDJSON by default."""
+    if fmt:
+        return SSE if fmt.lower() == "sse" else NDJSON
+    return SSE if SSE in (accept or "") else NDJSON
+
+
+def _frame(event: str, payload: Dict[str, Any], media_type: str) -> str:
+    data = json.dumps(payload, default=str)
+    if media_type == SSE:
+        return f"event: {event}\ndata: {data}\n\n"
+    return f'{{"event": "{event}", "data": {data}}}\n'
+
+
+def encode_events(events: Iterable[Tuple[str, Dict[str, Any]]], media_type: str,
+                  fields: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    One frame per event, a final "done" frame with count and elapsed_ms.
+    Field selection applies to "result" events; a failure mid-stream becomes an "error" frame
+    since the status line has already been sent. An "error" frame, raised or yielded, ends the stream.
+    """
+    started = time.perf_counter()
+    count = 0
+    try:
+        for event, payload in events:
+            if event == "result":
+                payload = select_fields(payload, fields)
+                count += 1
+            yield _frame(event, payload, media_type)
+            if event == "error":
+                return
+    except Exception as e:
+        logger.error(f"[Stream] failed after {count} results: {e}")
+        yield _frame("error", {"error": str(e)}, media_type)
+        return
+    yield _frame("done", {"count": count, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}, media_type)
+
+
+def stream_events(events: Iterable[Tuple[str, Dict[str, Any]]], media_type: str,
+                  fields: Optional[List[str]] = None) -> StreamingResponse:
+    # a sync generator is iterated in the threadpool, so blocking retrieval does not stall the loop
+    return StreamingResponse(
+        encode_events(events, media_type, fields),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,300 @@
+# Request tracing: nested spans per request, tail-sampled and handed to a pluggable exporter
+import os
+import json
+import time
+import uuid
+import random
+import queue
+import threading
+import contextvars
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+# tail sampling: only traces at least this slow (or failed) are exported; 0 keeps everything
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 500))
+# jsonl | log | none
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl")
+TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+# spans kept per trace (a long stream or a big reindex stays bounded)
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 512))
+TRACE_HEADER = "X-Trace-Id"
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("recipe_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attrs", "events", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+        self.events: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def event(self, name: str, **attrs):
+        self.events.append({"name": name, "at_ms": self.trace.offset_ms(time.perf_counter()), **attrs})
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        out = {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": self.trace.offset_ms(self.start),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if self.events:
+            out["events"] = self.events
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class _NullSpan:
+    """Returned outside a trace, so instrumented code never has to check."""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def event(self, name: str, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, name: str, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.wall_start = time.time()
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.failed = False
+        self._lock = threading.Lock()
+        self.root = self._add(name, None, {})
+
+    def offset_ms(self, t: float) -> float:
+        return round((t - self.root.start) * 1000, 3) if self.spans else 0.0
+
+    def _add(self, name: str, parent_id: Optional[str], attrs: Dict[str, Any]) -> Optional[Span]:
+        # spans may come from threadpool workers (sync endpoints, streamed generators)
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return None
+            s = Span(self, name, parent_id, attrs)
+            self.spans.append(s)
+            return s
+
+    def duration_ms(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return (end - self.root.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "timestamp": self.wall_start,
+            "duration_ms": round(self.duration_ms(), 3),
+            "error": self.failed,
+            "attrs": self.root.attrs,
+            "dropped_spans": self.dropped,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+class span:
+    """
+    with span("chroma.query", top_k=5) as s:
+        s.event("retry", attempt=2)
+    A child of the current span; a no-op (NULL_SPAN) when no trace is active.
+    """
+    __slots__ = ("name", "attrs", "span", "parent")
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        if self.parent is None:
+            return NULL_SPAN
+        self.span = self.parent.trace._add(self.name, self.parent.span_id, self.attrs)
+        if self.span is None:
+            return NULL_SPAN
+        _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.span.end = time.perf_counter()
+            if exc_type is not None:
+                self.span.error = f"{exc_type.__name__}: {exc}"
+                self.span.trace.failed = True
+            # set, not reset(token): a generator span may close in a different threadpool context
+            _current.set(self.parent)
+        return False
+
+
+def current_span():
+    return _current.get() or NULL_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    s = _current.get()
+    return s.trace.trace_id if s is not None else None
+
+
+def add_event(name: str, **attrs):
+    """Event on the current span (e.g. an embedding retry)."""
+    s = _current.get()
+    if s is not None:
+        s.event(name, **attrs)
+
+
+class Exporter:
+    def export(self, trace: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonlExporter(Exporter):
+    """One trace per line; writes happen on a background thread, off the request path."""
+
+    def __init__(self, path: str = None):
+        self.path = path or TRACE_FILE
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        self._thread = threading.Thread(target=self._writer, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning(f"[Trace] exporter queue full, dropping trace {trace['trace_id']}")
+
+    def _writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    break
+                f.write(json.dumps(trace, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class LogExporter(Exporter):
+    """Through loguru, so the trace lands wherever the log sinks point."""
+
+    def export(self, trace: Dict[str, Any]):
+        logger.bind(trace=trace).info(f"[Trace] {trace['name']} trace_id={trace['trace_id']} "
+                                      f"time_ms={trace['duration_ms']:.1f} spans={len(trace['spans'])}")
+
+
+_exporter: Optional[Exporter] = None
+_exporter_lock = threading.Lock()
+
+
+def set_exporter(exporter: Optional[Exporter]):
+    """Install a custom exporter (anything with export(trace_dict)); None disables export."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            _exporter.close()
+        _exporter = exporter
+
+
+def get_exporter() -> Optional[Exporter]:
+    global _exporter
+    if _exporter is None and TRACE_EXPORTER != "none":
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = LogExporter() if TRACE_EXPORTER == "log" else JsonlExporter()
+    return _exporter
+
+
+def finish_trace(trace: Trace, slow_ms: float = None):
+    """Tail sampling: export only slow or failed traces."""
+    trace.root.end = time.perf_counter()
+    slow_ms = TRACE_SLOW_MS if slow_ms is None else slow_ms
+    if not (trace.failed or trace.duration_ms() >= slow_ms):
+        return
+    exporter = get_exporter()
+    if exporter is not None:
+        exporter.export(trace.to_dict())
+
+
+def _valid_id(value: str) -> bool:
+    return 8 <= len(value) <= 64 and all(c in "0123456789abcdefABCDEF-" for c in value)
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI: one trace per HTTP request, root span named after the route template.
+    An incoming X-Trace-Id is reused (so callers can correlate), and the id is always
+    returned in the X-Trace-Id response header.
+    """
+
+    def __init__(self, app, slow_ms: float = None, enabled: bool = None):
+        self.app = app
+        self.slow_ms = TRACE_SLOW_MS if slow_ms is None else slow_ms
+        self.enabled = TRACE_ENABLED if enabled is None else enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-trace-id":
+                incoming = value.decode("latin-1")
+                break
+        trace = Trace(f"{scope.get('method', '')} {scope.get('path', '')}",
+                      incoming if incoming and _valid_id(incoming) else None)
+        header = (TRACE_HEADER.lower().encode(), trace.trace_id.encode())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [header]
+                trace.root.set(status=message["status"])
+                if message["status"] >= 500:
+                    trace.failed = True
+            await send(message)
+
+        _current.set(trace.root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            trace.failed = True
+            trace.root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                trace.root.name = f"{scope.get('method', '')} {route}"
+            trace.root.set(path=scope.get("path", ""))
+            _current.set(None)
+            finish_trace(trace, self.slow_ms)
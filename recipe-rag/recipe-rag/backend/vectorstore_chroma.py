@@ -1,6 +1,6 @@
 # New Chroma (2025) persistent client
 import os
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 from loguru import logger
 
 # Disable ChromaDB telemetry
@@ -9,6 +9,9 @@ os.environ["ANONYMIZED_TELEMETRY"] = "False"
 import chromadb
 from chromadb.config import Settings
 
+from .metrics import timed
+from .tracing import span
+
 PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./vectordata")
 COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "recipes")
 
@@ -41,38 +44,65 @@ class ChromaStore:
             logger.error(f"[ChromaStore] init error: {e}")
             raise
 
-    def add_documents(self, ids: List[str], texts: List[str], embeddings: List[List[float]]):
+    def add_documents(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                      metadatas: Optional[List[Dict[str, Any]]] = None):
         if not ids:
             return
         # Chroma expects list shape align; pass embeddings directly
-        self.col.add(ids=ids, documents=texts, embeddings=embeddings)
+        self.col.add(ids=ids, documents=texts, embeddings=embeddings, metadatas=metadatas)
         logger.info(f"[ChromaStore] added {len(ids)} documents to collection '{self.collection_name}'")
 
-    def query(self, query_embedding: List[float], top_k: int = 5):
+    def upsert_documents(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                         metadatas: Optional[List[Dict[str, Any]]] = None):
+        if not ids:
+            return
+        # upsert keeps re-ingestion idempotent (resumed bulk loads, re-indexed recipes)
+        self.col.upsert(ids=ids, documents=texts, embeddings=embeddings, metadatas=metadatas)
+        logger.info(f"[ChromaStore] upserted {len(ids)} documents to collection '{self.collection_name}'")
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        self.col.delete(ids=ids)
+        logger.info(f"[ChromaStore] deleted {len(ids)} documents from collection '{self.collection_name}'")
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        if not ids:
+            return
+        self.col.update(ids=ids, metadatas=metadatas)
+
+    def query(self, query_embedding: List[float], top_k: int = 5, where: Optional[Dict[str, Any]] = None):
         if query_embedding is None:
             return []
         
-        # Query for results  
-        res = self.col.query(query_embeddings=[query_embedding], n_results=top_k, include=["distances", "documents"])
-        
-        # Get all IDs to map back to results
-        all_data = self.col.get(include=["documents"])
-        all_ids = all_data.get("ids", [])
-        all_docs = all_data.get("documents", [])
-        
-        # Create document to ID mapping
-        doc_to_id = {}
-        for doc_id, doc in zip(all_ids, all_docs):
-            doc_to_id[doc] = doc_id
-        
-        # Map query results back to IDs
+        # Query for results; ids are always returned, so no collection-wide get() is needed.
+        # `where` filters on chunk metadata inside the index, before top-k is taken.
+        kwargs = {"where": where} if where else {}
+        with timed("store_query"), span("chroma.query", collection=self.collection_name, top_k=top_k,
+                                        filtered=bool(where)) as s:
+            res = self.col.query(query_embeddings=[query_embedding], n_results=top_k, include=["distances", "documents"], **kwargs)
+            s.set(results=len(res.get("ids", [[]])[0]))
+        ids = res.get("ids", [[]])[0]
         distances = res.get("distances", [[]])[0]
         docs = res.get("documents", [[]])[0]
-        out = []
-        for dist, doc in zip(distances, docs):
-            doc_id = doc_to_id.get(doc, f"unknown_doc")
-            out.append((doc_id, float(dist), doc))
-        return out
+        return [(doc_id, float(dist), doc) for doc_id, dist, doc in zip(ids, distances, docs)]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors for the given chunk ids (avoids re-embedding chunk text at rerank time)."""
+        if not ids:
+            return {}
+        with timed("store_get"), span("chroma.get", collection=self.collection_name, ids=len(ids)):
+            res = self.col.get(ids=ids, include=["embeddings"])
+        return dict(zip(res.get("ids", []), res.get("embeddings", [])))
+
+    def reset(self):
+        """Drop and recreate the collection (used to rebuild a single shard)."""
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+        self.col = self.client.create_collection(name=self.collection_name)
+        logger.info(f"[ChromaStore] reset collection '{self.collection_name}'")
 
     def count(self):
         try:
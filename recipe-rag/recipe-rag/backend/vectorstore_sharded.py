@@ -0,0 +1,176 @@
+# Sharded Chroma store: N collections, parallel fan-out query, heap merge
+import os
+import heapq
+import zlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+from loguru import logger
+
+from .vectorstore_chroma import ChromaStore, COLLECTION_NAME
+from .metrics import timed, SHARD_QUERY_ERRORS
+from .tracing import span
+
+CHROMA_SHARDS = int(os.getenv("CHROMA_SHARDS", 1))
+# "recipe" hashes the recipe id; any other value names a chunk metadata field (e.g. cuisine)
+CHROMA_SHARD_KEY = os.getenv("CHROMA_SHARD_KEY", "recipe")
+
+
+def recipe_of(chunk_id: str) -> str:
+    return chunk_id.split("::")[0]
+
+
+def stable_shard(value: str, n_shards: int) -> int:
+    # crc32 is stable across processes (unlike hash() with PYTHONHASHSEED)
+    return zlib.crc32(value.encode("utf-8")) % n_shards
+
+
+class ShardedChromaStore:
+    """
+    Same interface as ChromaStore, spread over n_shards collections
+    ("<collection>__shard<i>") in one persist dir.
+    - Writes are routed by recipe id hash, or by a metadata field (shard_key).
+    - query() fans out to every shard on a thread pool (hnswlib releases the GIL)
+      and merges the per-shard top-k lists with a heap. A failing shard is left out
+      (counted in recipe_shard_query_errors_total); the query fails only if every shard does.
+    - Each shard can be reset and rebuilt on its own (RecipeRAG.rebuild_shard).
+    """
+
+    def __init__(self, persist_dir: str = None, collection_name: str = None,
+                 n_shards: int = None, shard_key: str = None):
+        self.collection_name = collection_name or COLLECTION_NAME
+        self.n_shards = n_shards or CHROMA_SHARDS
+        self.shard_key = shard_key or CHROMA_SHARD_KEY
+        self.shards = [
+            ChromaStore(persist_dir=persist_dir, collection_name=f"{self.collection_name}__shard{i}")
+            for i in range(self.n_shards)
+        ]
+        self.persist_dir = self.shards[0].persist_dir
+        self._pool = ThreadPoolExecutor(max_workers=self.n_shards, thread_name_prefix="shard-query")
+        logger.info(f"[ShardedStore] {self.n_shards} shards keyed by '{self.shard_key}' at {self.persist_dir}")
+
+    # -- routing -------------------------------------------------------------------
+
+    def shard_for(self, chunk_id: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        if self.shard_key == "recipe":
+            return stable_shard(recipe_of(chunk_id), self.n_shards)
+        value = (metadata or {}).get(self.shard_key)
+        return stable_shard(str(value if value is not None else recipe_of(chunk_id)), self.n_shards)
+
+    def _route(self, write: Callable, ids, texts, embeddings, metadatas):
+        buckets: Dict[int, Dict[str, list]] = {}
+        for n, _id in enumerate(ids):
+            meta = metadatas[n] if metadatas else None
+            b = buckets.setdefault(self.shard_for(_id, meta), {"ids": [], "texts": [], "embeddings": [], "metadatas": []})
+            b["ids"].append(_id)
+            b["texts"].append(texts[n])
+            b["embeddings"].append(embeddings[n])
+            b["metadatas"].append(meta)
+        for i, b in buckets.items():
+            write(self.shards[i], b["ids"], b["texts"], b["embeddings"], b["metadatas"] if metadatas else None)
+
+    # -- ChromaStore interface -----------------------------------------------------------
+
+    def add_documents(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                      metadatas: Optional[List[Dict[str, Any]]] = None):
+        self._route(lambda s, *a: s.add_documents(*a), ids, texts, embeddings, metadatas)
+
+    def upsert_documents(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                         metadatas: Optional[List[Dict[str, Any]]] = None):
+        self._route(lambda s, *a: s.upsert_documents(*a), ids, texts, embeddings, metadatas)
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        if self.shard_key == "recipe":
+            buckets: Dict[int, List[str]] = {}
+            for _id in ids:
+                buckets.setdefault(self.shard_for(_id), []).append(_id)
+            for i, shard_ids in buckets.items():
+                self.shards[i].delete(shard_ids)
+        else:
+            # placement depends on metadata we no longer have; deleting missing ids is a no-op
+            for shard in self.shards:
+                shard.delete(ids)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        if not ids:
+            return
+        # metadata updates never move a chunk, so route by where it was written
+        buckets: Dict[int, Dict[str, list]] = {}
+        for _id, meta in zip(ids, metadatas):
+            b = buckets.setdefault(self.shard_for(_id, meta), {"ids": [], "metadatas": []})
+            b["ids"].append(_id)
+            b["metadatas"].append(meta)
+        for i, b in buckets.items():
+            self.shards[i].update_metadata(b["ids"], b["metadatas"])
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        out: Dict[str, List[float]] = {}
+        if self.shard_key == "recipe":
+            buckets: Dict[int, List[str]] = {}
+            for _id in ids:
+                buckets.setdefault(self.shard_for(_id), []).append(_id)
+            for i, shard_ids in buckets.items():
+                out.update(self.shards[i].get_embeddings(shard_ids))
+        else:
+            for shard in self.shards:
+                out.update(shard.get_embeddings(ids))
+        return out
+
+    def _query_shard(self, shard: ChromaStore, query_embedding, top_k: int, **kwargs):
+        try:
+            return shard.query(query_embedding, top_k=top_k, **kwargs)
+        except Exception:
+            try:
+                empty = shard.count() == 0
+            except Exception:
+                empty = False
+            if empty:
+                # an empty shard raises on query; it simply contributes nothing
+                return []
+            raise
+
+    def query(self, query_embedding: List[float], top_k: int = 5, **kwargs):
+        if query_embedding is None:
+            return []
+        if self.n_shards == 1:
+            return self._query_shard(self.shards[0], query_embedding, top_k, **kwargs)
+        # per-shard time is recorded as store_query; this covers fan-out + merge
+        with timed("store_fanout"), span("sharded.query", shards=self.n_shards, top_k=top_k) as s:
+            # a context copy per shard carries the trace into the pool threads
+            futures = [self._pool.submit(contextvars.copy_context().run, self._query_shard, shard, query_embedding, top_k, **kwargs)
+                       for shard in self.shards]
+            results, errors = [], []
+            for shard, f in zip(self.shards, futures):
+                try:
+                    results.append(f.result())
+                except Exception as e:
+                    errors.append(e)
+                    SHARD_QUERY_ERRORS.inc(shard.collection_name)
+                    s.event("shard_failed", shard=shard.collection_name, error=str(e))
+                    logger.warning(f"[ShardedStore] shard '{shard.collection_name}' query failed, leaving it out: {e}")
+            if errors:
+                s.set(failed_shards=len(errors))
+                if not results:
+                    raise RuntimeError(f"all {self.n_shards} shards failed to answer the query") from errors[0]
+            # each shard list is already sorted by distance -> k-way heap merge
+            merged = heapq.merge(*results, key=lambda r: r[1])
+            return [r for _, r in zip(range(top_k), merged)]
+
+    def count(self):
+        return sum(s.count() for s in self.shards)
+
+    def persist(self):
+        for s in self.shards:
+            s.persist()
+
+    def reset_shard(self, i: int):
+        self.shards[i].reset()
+
+
+def get_store(persist_dir: str = None):
+    """ChromaStore for a single shard (default), ShardedChromaStore when CHROMA_SHARDS > 1."""
+    if CHROMA_SHARDS > 1:
+        return ShardedChromaStore(persist_dir=persist_dir)
+    return ChromaStore(persist_dir=persist_dir)
@@ -0,0 +1,180 @@
+# Cache warmup: run the most popular queries against an index before it serves traffic
+import os
+import json
+import glob
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from loguru import logger
+
+from .capture import CAPTURE_FILE, parse_line
+from .rag import filters_key
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# configured list, always warmed first: /search or /find-recipe JSON bodies, or one plain query per line
+WARMUP_QUERIES_FILE = os.getenv("WARMUP_QUERIES_FILE", "")
+# request logs mined for popular queries (globs, newest file first); rotated backend logs included
+WARMUP_LOG_FILES = [p for p in os.getenv(
+    "WARMUP_LOG_FILES", ",".join(p for p in (CAPTURE_FILE, "logs/backend*.log") if p)).split(",") if p]
+# bytes read from the end of the logs, across all files
+WARMUP_LOG_MAX_BYTES = int(os.getenv("WARMUP_LOG_MAX_BYTES", 20 * 1024 * 1024))
+# budget: at most this many distinct queries, and stop starting new ones after this many seconds
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", 200))
+WARMUP_MAX_SECONDS = float(os.getenv("WARMUP_MAX_SECONDS", 30))
+
+SEARCH_PATHS = ("/search", "/search/stream")
+CHAIN_PATHS = ("/find-recipe", "/find-recipe/stream")
+
+
+def query_from_body(path: str, body: Any) -> Optional[Dict[str, Any]]:
+    """A warmup query from a request body (dict or JSON text), as the endpoint would run it."""
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return None
+    if not isinstance(body, dict):
+        return None
+    k = body.get("k", 5)
+    if path in SEARCH_PATHS and isinstance(body.get("query"), str) and body["query"] and isinstance(k, int):
+        return {"kind": "search", "query": body["query"], "k": k,
+                "filters": body.get("filters") or None, "collapse": bool(body.get("collapse", False))}
+    ingredients, top_n = body.get("ingredients"), body.get("top_n")
+    if (path in CHAIN_PATHS and isinstance(ingredients, list) and ingredients
+            and all(isinstance(i, str) for i in ingredients) and (top_n is None or isinstance(top_n, int))):
+        return {"kind": "chain", "ingredients": ingredients, "top_n": top_n}
+    return None
+
+
+def query_key(q: Dict[str, Any], default_top_n: int = None) -> tuple:
+    """
+    Identity of a query: the RecipeRAG.search result cache key, or the RecipeChain.run key
+    without the re-rank settings it appends.
+    """
+    if q["kind"] == "search":
+        return ("search", q["query"], q["k"], filters_key(q["filters"]), q["collapse"])
+    return ("chain", tuple(q["ingredients"]), q["top_n"] or default_top_n)
+
+
+def query_from_key(key: tuple) -> Dict[str, Any]:
+    """Inverse of query_key, also for full keys found in a RecipeRAG.result_cache."""
+    if key[0] == "search":
+        return {"kind": "search", "query": key[1], "k": key[2],
+                "filters": json.loads(key[3]) if key[3] else None, "collapse": key[4]}
+    return {"kind": "chain", "ingredients": list(key[1]), "top_n": key[2]}
+
+
+def configured_queries(path: str = None) -> List[Dict[str, Any]]:
+    path = WARMUP_QUERIES_FILE if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                data = json.loads(line)
+                q = query_from_body(CHAIN_PATHS[0] if "ingredients" in data else SEARCH_PATHS[0], data)
+            else:
+                q = query_from_body(SEARCH_PATHS[0], {"query": line})
+            if q:
+                out.append(q)
+    return out
+
+
+def _log_lines(patterns: Iterable[str], max_bytes: int) -> Iterator[str]:
+    """Lines from the newest max_bytes of the matching files."""
+    paths = {p for pattern in patterns for p in glob.glob(pattern)}
+    budget = max_bytes
+    for path in sorted(paths, key=os.path.getmtime, reverse=True):
+        if budget <= 0:
+            break
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            if size > budget:
+                f.seek(size - budget)
+                f.readline()  # partial line
+            data = f.read(budget)
+        budget -= size
+        yield from data.decode("utf-8", errors="replace").splitlines()
+
+
+def logged_queries(patterns: Iterable[str] = None, max_bytes: int = None, default_top_n: int = None) -> Counter:
+    """Successful /search and /find-recipe requests in the logs, counted by query key."""
+    counts: Counter = Counter()
+    for line in _log_lines(WARMUP_LOG_FILES if patterns is None else patterns,
+                           WARMUP_LOG_MAX_BYTES if max_bytes is None else max_bytes):
+        rec = parse_line(line)
+        if rec is None or rec.get("truncated") or (rec.get("status") or 0) >= 400:
+            continue
+        q = query_from_body(rec["path"], rec.get("body"))
+        if q:
+            counts[query_key(q, default_top_n)] += 1
+    return counts
+
+
+def popular_queries(top_n: int = None, recent: Iterable[tuple] = (), default_top_n: int = None) -> List[Dict[str, Any]]:
+    """
+    Up to top_n distinct queries: the configured list first, then keys still hot in the
+    previous index's result cache (recent), then the most frequent queries in the logs.
+    default_top_n (RecipeChain.top_n) lets "top_n omitted" and the explicit default dedupe.
+    """
+    top_n = WARMUP_TOP_N if top_n is None else top_n
+    keys = [query_key(q, default_top_n) for q in configured_queries()]
+    keys += [query_key(query_from_key(k), default_top_n) for k in recent]
+    keys += [k for k, _ in logged_queries(default_top_n=default_top_n).most_common()]
+    return [query_from_key(k) for k in dict.fromkeys(keys)][:top_n]
+
+
+def warm(rag, chain, queries: List[Dict[str, Any]] = None, max_seconds: float = None) -> Dict[str, Any]:
+    """
+    Fill a freshly loaded index's caches before it serves:
+    - builds the lazy ingredient, pantry and shopping-list indexes;
+    - embeds every query text in one bulk embed() call (embedding cache);
+    - runs each query in popularity order (result cache) until max_seconds is spent.
+    Failures are counted and logged, never raised.
+    """
+    start = time.perf_counter()
+    max_seconds = WARMUP_MAX_SECONDS if max_seconds is None else max_seconds
+    queries = popular_queries() if queries is None else queries
+    stats = {"queries": len(queries), "embedded": 0, "searches": 0, "chains": 0, "errors": 0, "complete": False}
+
+    try:
+        for name in ("ingredient_index", "pantry_index", "shopping_list"):
+            getattr(rag, name)
+    except Exception as e:
+        stats["errors"] += 1
+        logger.warning(f"[Warmup] index structures failed: {e}")
+
+    texts = list(dict.fromkeys(q["query"] if q["kind"] == "search" else " ".join(q["ingredients"]) for q in queries))
+    if texts:
+        try:
+            rag.embedder.embed(texts)
+            stats["embedded"] = len(texts)
+        except Exception as e:
+            stats["errors"] += 1
+            logger.warning(f"[Warmup] bulk embedding failed: {e}")
+
+    for q in queries:
+        if time.perf_counter() - start >= max_seconds:
+            break
+        try:
+            if q["kind"] == "search":
+                rag.search(q["query"], top_k=q["k"], filters=q["filters"], collapse=q["collapse"])
+                stats["searches"] += 1
+            else:
+                chain.run(q["ingredients"], top_n=q["top_n"])
+                stats["chains"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            logger.warning(f"[Warmup] query failed ({q}): {e}")
+    else:
+        stats["complete"] = True
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"[Warmup] {stats['searches']} searches, {stats['chains']} find-recipe queries, "
+                f"{stats['embedded']} texts embedded in {stats['seconds']}s"
+                + ("" if stats["complete"] else " (budget exhausted)"))
+    return stats
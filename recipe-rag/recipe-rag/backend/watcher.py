@@ -0,0 +1,232 @@
+# Live indexing: watch the recipe directory and push changed recipes into the running index
+import os
+import time
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+from loguru import logger
+
+from .rag import RecipeRAG, RECIPE_DIR_SOURCE
+
+WATCH_MODE = os.getenv("WATCH_MODE", "auto")  # auto | inotify | poll
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", 1.0))
+WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", 2.0))
+# batches only append to the metadata journal; it is folded into chroma_meta.pkl this often and on stop()
+WATCH_COMPACT_SECONDS = float(os.getenv("WATCH_COMPACT_SECONDS", 300))
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # optional dependency; polling works everywhere
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def _is_recipe(path: str) -> bool:
+    return path.lower().endswith(".txt") and not os.path.basename(path).startswith(".")
+
+
+class _InotifyHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "RecipeWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path and _is_recipe(path):
+                self.watcher.notify(os.path.basename(path))
+
+
+class RecipeWatcher:
+    """
+    Debounced incremental indexer for RECIPE_DIR.
+    - inotify (via watchdog) when available, otherwise mtime/size polling.
+    - A file is processed once it has been quiet for WATCH_DEBOUNCE_SECONDS;
+      each batch goes through RecipeRAG.add_recipes / remove_recipes, so only the
+      touched recipes are chunked and embedded.
+    - Only recipes that came from the directory are ever deleted; recipes loaded by
+      tools/ingest_corpus.py (other recipe_sources) are left alone.
+    - get_rag is called per batch so updates follow hot index swaps.
+    - Each batch appends only its changes to the metadata journal (_save_meta_delta);
+      the full metadata is rewritten every WATCH_COMPACT_SECONDS and on stop().
+    """
+
+    def __init__(self, get_rag: Callable[[], RecipeRAG], recipe_dir: str, mode: str = None,
+                 debounce: float = None, poll_interval: float = None, compact_interval: float = None):
+        self.get_rag = get_rag
+        self.recipe_dir = recipe_dir
+        self.mode = mode or WATCH_MODE
+        self.debounce = WATCH_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.poll_interval = poll_interval or WATCH_POLL_SECONDS
+        self.compact_interval = WATCH_COMPACT_SECONDS if compact_interval is None else compact_interval
+        # index with journaled changes not yet compacted, and when it was last compacted
+        self._uncompacted: Optional[RecipeRAG] = None
+        self._compacted_at = time.monotonic()
+        # fname -> (first_event_at, last_event_at)
+        self._pending: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+        self.stats_counters = {
+            "events": 0,
+            "upserted": 0,
+            "deleted": 0,
+            "unchanged": 0,
+            "errors": 0,
+            "batches": 0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0,
+            "last_batch_at": None,
+        }
+
+    # -- event intake ------------------------------------------------------------
+
+    def notify(self, fname: str):
+        now = time.monotonic()
+        with self._lock:
+            first, _ = self._pending.get(fname, (now, now))
+            self._pending[fname] = (first, now)
+            self.stats_counters["events"] += 1
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snap = {}
+        try:
+            with os.scandir(self.recipe_dir) as it:
+                for entry in it:
+                    if entry.is_file() and _is_recipe(entry.name):
+                        st = entry.stat()
+                        snap[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return snap
+
+    def _poll_once(self):
+        snap = self._scan()
+        for fname in set(snap) | set(self._snapshot):
+            if snap.get(fname) != self._snapshot.get(fname):
+                self.notify(fname)
+        self._snapshot = snap
+
+    @staticmethod
+    def _from_dir(rag: RecipeRAG, fname: str) -> bool:
+        return rag.recipe_sources.get(fname) == RECIPE_DIR_SOURCE
+
+    def _reconcile(self):
+        """Queue anything that changed while nobody was watching (index vs. directory)."""
+        rag = self.get_rag()
+        self._snapshot = self._scan()
+        indexed = {f for f, src in rag.recipe_sources.items() if src == RECIPE_DIR_SOURCE}
+        for fname in set(self._snapshot) | indexed:
+            self.notify(fname)
+
+    # -- processing ----------------------------------------------------------------
+
+    def _due(self):
+        now = time.monotonic()
+        with self._lock:
+            due = {f: t for f, t in self._pending.items() if now - t[1] >= self.debounce}
+            for f in due:
+                del self._pending[f]
+        return due
+
+    def _process(self, due: Dict[str, Tuple[float, float]]):
+        rag = self.get_rag()
+        upserts, deletes = [], []
+        for fname in due:
+            path = os.path.join(self.recipe_dir, fname)
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    raw = fh.read().strip()
+            except FileNotFoundError:
+                if fname in rag.full_recipes and self._from_dir(rag, fname):
+                    deletes.append(fname)
+                continue
+            if rag.full_recipes.get(fname) == raw:
+                self.stats_counters["unchanged"] += 1
+                continue
+            upserts.append((fname, raw))
+
+        if upserts or deletes:
+            if upserts:
+                rag.add_recipes(upserts, source=RECIPE_DIR_SOURCE)
+            if deletes:
+                rag.remove_recipes(deletes)
+            rag.store.persist()
+            rag._save_meta_delta()
+            self._uncompacted = rag
+            logger.info(f"[Watcher] upserted={len(upserts)} deleted={len(deletes)}")
+
+        done = time.monotonic()
+        lag = max(done - first for first, _ in due.values())
+        c = self.stats_counters
+        c["upserted"] += len(upserts)
+        c["deleted"] += len(deletes)
+        c["batches"] += 1
+        c["last_lag_seconds"] = lag
+        c["max_lag_seconds"] = max(c["max_lag_seconds"], lag)
+        c["last_batch_at"] = time.time()
+
+    def _compact(self):
+        rag, self._uncompacted = self._uncompacted, None
+        self._compacted_at = time.monotonic()
+        if rag is not None:
+            rag._save_meta()
+
+    def _loop(self):
+        last_poll = 0.0
+        tick = min(0.25, self.debounce or 0.25)
+        while not self._stop.wait(tick):
+            if self._observer is None and time.monotonic() - last_poll >= self.poll_interval:
+                self._poll_once()
+                last_poll = time.monotonic()
+            if self._uncompacted is not None and time.monotonic() - self._compacted_at >= self.compact_interval:
+                self._compact()
+            due = self._due()
+            if not due:
+                continue
+            try:
+                self._process(due)
+            except Exception as e:
+                self.stats_counters["errors"] += 1
+                logger.error(f"[Watcher] indexing batch failed, requeueing {len(due)} files: {e}")
+                with self._lock:
+                    for fname, t in due.items():
+                        self._pending.setdefault(fname, t)
+        self._compact()
+
+    # -- lifecycle -----------------------------------------------------------------
+
+    def start(self):
+        self._reconcile()
+        if self.mode in ("auto", "inotify") and Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_InotifyHandler(self), self.recipe_dir, recursive=False)
+            self._observer.start()
+        elif self.mode == "inotify":
+            logger.warning("[Watcher] watchdog not installed — falling back to polling")
+        self._thread = threading.Thread(target=self._loop, name="recipe-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"[Watcher] watching {self.recipe_dir} ({'inotify' if self._observer else 'poll'}, "
+                    f"debounce={self.debounce}s)")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop watching; waits for the loop to compact the metadata journal."""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            depth = len(self._pending)
+            oldest: Optional[float] = min((t[0] for t in self._pending.values()), default=None)
+        out = dict(self.stats_counters)
+        out.update({
+            "mode": "inotify" if self._observer else "poll",
+            "queue_depth": depth,
+            "oldest_pending_seconds": (time.monotonic() - oldest) if oldest is not None else 0.0,
+        })
+        return out
@@ -0,0 +1,124 @@
+# Microbenchmark: per-request overhead of the request-logging middleware (in-process ASGI calls, no network)
+import time
+import asyncio
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from loguru import logger
+
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.logging_middleware import LoggingMiddleware
+
+
+class BaseHTTPLoggingMiddleware(BaseHTTPMiddleware):
+    """The previous LoggingMiddleware, kept here as the baseline."""
+
+    async def dispatch(self, request: Request, call_next):
+        start = time.time()
+        body = await request.body()
+        try:
+            req_text = body.decode("utf-8") if body else ""
+        except Exception:
+            req_text = str(body)
+        logger.info(f"[API-IN] {request.method} {request.url} body={req_text}")
+        response = await call_next(request)
+        elapsed = (time.time() - start) * 1000
+        logger.info(f"[API-OUT] {request.method} {request.url} status={response.status_code} time_ms={elapsed:.1f}")
+        return response
+
+
+def make_app(variant: str, sample_rate: float, body_max_bytes: int):
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        payload = await request.json()
+        return {"n": len(payload.get("ingredients", []))}
+
+    if variant == "basehttp":
+        app.add_middleware(BaseHTTPLoggingMiddleware)
+    elif variant == "asgi":
+        app.add_middleware(LoggingMiddleware, sample_rate=sample_rate, body_max_bytes=body_max_bytes)
+    return app
+
+
+async def call(app, body: bytes):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/echo", "raw_path": b"/echo", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 5000), "server": ("127.0.0.1", 8000),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)  # client never disconnects during the request
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app, body: bytes, requests: int) -> float:
+    for _ in range(200):  # warm up routing / pydantic caches
+        await call(app, body)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, body)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark request logging middleware overhead')
+    parser.add_argument('--requests', type=int, default=5000,
+                       help='Requests per variant and round')
+    parser.add_argument('--rounds', type=int, default=3,
+                       help='Rounds per variant (median reported)')
+    parser.add_argument('--body-bytes', type=int, default=4096,
+                       help='Approximate request body size')
+    parser.add_argument('--sample-rate', type=float, default=0.1,
+                       help='Sample rate for the sampled ASGI variant')
+    parser.add_argument('--sink', choices=['null', 'file'], default='null',
+                       help='null measures middleware cost only; file writes to an enqueued log file')
+    args = parser.parse_args()
+
+    logger.remove()
+    if args.sink == 'null':
+        logger.add(lambda message: None, level="INFO")
+    else:
+        logger.add("logs/bench_logging.log", level="INFO", enqueue=True)
+
+    n = max(1, args.body_bytes // 9)
+    body = ('{"ingredients": [' + ",".join(['"tomato"'] * n) + ']}').encode()
+    variants = [
+        ("none", "none", 1.0),
+        ("basehttp (previous)", "basehttp", 1.0),
+        ("asgi, sample=1.0", "asgi", 1.0),
+        (f"asgi, sample={args.sample_rate}", "asgi", args.sample_rate),
+    ]
+    results = {}
+    for label, variant, rate in variants:
+        app = make_app(variant, rate, 512)
+        results[label] = statistics.median(asyncio.run(run(app, body, args.requests)) for _ in range(args.rounds))
+    logger.complete()
+
+    base = results["none"]
+    print(f"| middleware | us/request | overhead us | ({len(body)} byte body, sink={args.sink}) |")
+    print("|---|---|---|---|")
+    for label, us in results.items():
+        print(f"| {label} | {us:.1f} | {us - base:+.1f} | |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Local OpenAI-compatible embeddings server for load tests (no network, no API cost)
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add repo root to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+# the same vectors EMBED_BACKEND=hash computes in-process (at equal dimension)
+from backend.hash_embeddings import hash_embed, tokenize
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    """POST /v1/embeddings (and /embeddings) in the OpenAI response shape."""
+    protocol_version = "HTTP/1.1"
+    config = {}
+    stats = {"requests": 0, "texts": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # one line per request would dominate a load test
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/health"):
+            with self.lock:
+                self._send(200, dict(self.stats, **self.config))
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") not in ("/v1/embeddings", "/embeddings"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+        texts = payload.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        cfg = self.config
+
+        # latency = base + per-text cost + uniform jitter, like a real batch endpoint
+        delay = cfg["latency_ms"] + cfg["per_text_ms"] * len(texts) + random.uniform(0, cfg["jitter_ms"])
+        time.sleep(delay / 1000)
+        with self.lock:
+            self.stats["requests"] += 1
+            failed = random.random() < cfg["error_rate"]
+            if failed:
+                self.stats["errors"] += 1
+            else:
+                self.stats["texts"] += len(texts)
+        if failed:
+            status = random.choice([429, 500, 503])
+            self._send(status, {"error": {"message": "injected failure", "type": "server_error", "code": status}})
+            return
+
+        dim = cfg["dim"]
+        tokens = sum(len(tokenize(t)) for t in texts)
+        self._send(200, {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": v}
+                     for i, v in enumerate(hash_embed(texts, dim).tolist())],
+            "model": payload.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+def serve(host: str, port: int, **config) -> ThreadingHTTPServer:
+    """Start the server on a background thread (used by run_suite.py)."""
+    FakeEmbeddingHandler.config = config
+    server = ThreadingHTTPServer((host, port), FakeEmbeddingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake OpenAI embeddings endpoint with configurable latency/errors')
+    parser.add_argument('--host', default='127.0.0.1',
+                       help='Bind address')
+    parser.add_argument('--port', type=int, default=8100,
+                       help='Port (point the app at it with OPENAI_BASE_URL=http://host:port/v1)')
+    parser.add_argument('--dim', type=int, default=1536,
+                       help='Embedding dimension')
+    parser.add_argument('--latency-ms', type=float, default=40.0,
+                       help='Base latency per request')
+    parser.add_argument('--per-text-ms', type=float, default=0.2,
+                       help='Additional latency per input text')
+    parser.add_argument('--jitter-ms', type=float, default=20.0,
+                       help='Uniform random extra latency')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='Fraction of requests answered with 429/500/503')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, dim=args.dim, latency_ms=args.latency_ms, per_text_ms=args.per_text_ms,
+                   jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    print(f"Fake OpenAI embeddings on http://{args.host}:{args.port}/v1 (dim={args.dim}, "
+          f"latency={args.latency_ms}+{args.per_text_ms}/text+U(0,{args.jitter_ms}) ms, errors={args.error_rate})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
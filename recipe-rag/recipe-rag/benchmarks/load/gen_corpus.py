@@ -0,0 +1,226 @@
+# Synthetic recipe corpus in the data/recipes format (Title / Ingredients / Instructions), any size,
+# with a controllable ingredient vocabulary and matching labeled queries (ragas ground-truth format)
+import os
+import json
+import random
+import argparse
+from typing import Dict, List, Any, Optional
+
+CUISINES = {
+    "italian": {
+        "dishes": ["Pasta", "Risotto", "Lasagna", "Frittata", "Gnocchi", "Pizza"],
+        "ingredients": ["spaghetti", "penne", "arborio rice", "parmesan cheese", "mozzarella", "fresh basil",
+                        "dried oregano", "crushed tomatoes", "olive oil", "ricotta", "pancetta", "pesto"],
+    },
+    "mexican": {
+        "dishes": ["Tacos", "Enchiladas", "Quesadillas", "Burrito Bowl", "Chili", "Fajitas"],
+        "ingredients": ["corn tortillas", "black beans", "salsa", "jalapeno", "cilantro", "chili powder",
+                        "lime", "avocado", "cheddar cheese", "ground beef", "sweet corn", "cumin"],
+    },
+    "indian": {
+        "dishes": ["Curry", "Dal", "Biryani", "Tikka Masala", "Korma", "Chana Masala"],
+        "ingredients": ["garam masala", "turmeric", "cumin seeds", "ginger", "coconut milk", "red lentils",
+                        "basmati rice", "paneer", "chickpeas", "ghee", "yogurt", "curry leaves"],
+    },
+    "asian": {
+        "dishes": ["Stir Fry", "Fried Rice", "Noodle Bowl", "Ramen", "Dumplings", "Teriyaki"],
+        "ingredients": ["soy sauce", "sesame oil", "ginger", "rice vinegar", "tofu", "noodles", "bok choy",
+                        "scallions", "hoisin sauce", "jasmine rice", "sriracha", "chicken thighs"],
+    },
+    "mediterranean": {
+        "dishes": ["Salad", "Bowl", "Wraps", "Shakshuka", "Couscous", "Flatbread"],
+        "ingredients": ["feta cheese", "chickpeas", "tahini", "kalamata olives", "couscous", "quinoa",
+                        "cucumber", "cherry tomatoes", "red onion", "lemon", "hummus", "fresh parsley"],
+    },
+}
+PANTRY = ["salt", "black pepper", "garlic", "onion", "butter", "eggs", "all-purpose flour", "sugar",
+          "vegetable oil", "milk", "carrots", "bell pepper", "spinach", "mushrooms", "potatoes", "honey"]
+ADJECTIVES = ["Quick", "Easy", "Weeknight", "Creamy", "Spicy", "Smoky", "Classic", "Healthy", "Hearty",
+              "One-Pan", "Lemony", "Garlicky", "Vegetarian", "Crispy", "Herby", "Family"]
+UNITS = ["cup", "cups", "tablespoons", "teaspoon", "g", "oz", "lb", "cloves", "pinch", ""]
+MODIFIERS = ["fresh", "dried", "smoked", "roasted", "ground", "toasted", "pickled", "baby", "wild", "red",
+             "green", "sweet", "hot", "frozen", "grated", "sliced", "charred", "whole", "aged", "spiced"]
+STEPS = [
+    "Heat the {a} in a large pan over medium heat.",
+    "Add the {a} and cook for {m} minutes, stirring occasionally.",
+    "Stir in the {a} and {b} and simmer for {m} minutes.",
+    "Season with {a} and taste for balance.",
+    "Bring a pot of salted water to a boil and cook the {a} for {m} minutes.",
+    "Whisk the {a} with the {b} in a bowl until smooth.",
+    "Transfer to a baking dish and bake for {m} minutes until golden.",
+    "Fold in the {a} and let rest for {m} minutes before serving.",
+    "Garnish with {a} and serve warm.",
+]
+
+
+def build_vocabulary(size: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Ingredient names per cuisine, `size` in total: the base names first, then "modifier base"
+    and "modifier modifier base" variants. A larger vocabulary means fewer recipes share any
+    given ingredient, so labeled queries stay selective as the corpus grows.
+    """
+    if not size:
+        return {c: list(spec["ingredients"]) for c, spec in CUISINES.items()}
+    per_cuisine = -(-size // len(CUISINES))
+    vocab = {}
+    for c, spec in CUISINES.items():
+        base = spec["ingredients"]
+        names = list(base)
+        names += [f"{m} {b}" for m in MODIFIERS for b in base]
+        names += [f"{m1} {m2} {b}" for m1 in MODIFIERS for m2 in MODIFIERS if m1 != m2 for b in base]
+        if per_cuisine > len(names):
+            raise ValueError(f"vocab size {size} exceeds the {len(names) * len(CUISINES)} names available")
+        vocab[c] = names[:per_cuisine]
+    return vocab
+
+
+def make_record(rng: random.Random, index: int, vocab: Dict[str, List[str]] = None) -> Dict[str, Any]:
+    """One recipe as text plus the fields labeled queries are built from."""
+    vocab = vocab or BASE_VOCABULARY
+    cuisine = rng.choice(list(CUISINES))
+    spec = CUISINES[cuisine]
+    names = vocab[cuisine]
+    adjective, title_ing, dish = rng.choice(ADJECTIVES), rng.choice(names), rng.choice(spec["dishes"])
+    title = f"{adjective} {title_ing.title()} {dish}"
+    core = rng.sample(names, min(rng.randint(4, 8), len(names)))
+    ingredients = core + rng.sample(PANTRY, rng.randint(2, 6))
+    lines = [f"Title: {title}", "", "Ingredients:"]
+    for ing in ingredients:
+        unit = rng.choice(UNITS)
+        qty = rng.choice(["1", "2", "3", "1/2", "1/4", "4", "200", "400"])
+        lines.append(f"- {qty} {unit} {ing}".replace("  ", " "))
+    if rng.random() < 0.5:
+        lines += ["", f"Prep Time: {rng.randint(5, 30)} minutes", f"Cook Time: {rng.randint(10, 90)} minutes"]
+    lines += ["", "Instructions:"]
+    for step in range(rng.randint(4, 9)):
+        a, b = rng.sample(ingredients, 2)
+        lines.append(f"{step + 1}. " + rng.choice(STEPS).format(a=a, b=b, m=rng.randint(2, 25)))
+    return {"title": title, "cuisine": cuisine, "dish": dish, "core": core,
+            "ingredients": ingredients, "text": "\n".join(lines) + "\n"}
+
+
+def make_recipe(rng: random.Random, index: int, vocab: Dict[str, List[str]] = None) -> str:
+    return make_record(rng, index, vocab)["text"]
+
+
+BASE_VOCABULARY = build_vocabulary()
+
+
+def recipe_id(index: int, count: int) -> str:
+    return f"recipe_{index:0{max(2, len(str(count)))}d}.txt"
+
+
+def _make_query(rng: random.Random, record: Dict[str, Any]) -> Dict[str, Any]:
+    """A title lookup or a "dish with a and b" ingredient query, built from one target recipe."""
+    if rng.random() < 0.5 or len(record["core"]) < 2:
+        return {"query": record["title"].lower(), "type": "title", "title": record["title"]}
+    a, b = rng.sample(record["core"], 2)
+    return {"query": f"{record['dish'].lower()} with {a} and {b}", "type": "ingredients",
+            "dish": record["dish"], "needs": [a, b]}
+
+
+def label_queries(count: int, seed: int, targets: Dict[int, Dict[str, Any]],
+                  vocab: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """
+    Second pass over the same seeded corpus: a query's relevant docs are every recipe with
+    the target's title (title queries) or with its dish and both ingredients (ingredient queries).
+    """
+    queries = [targets[i] for i in sorted(targets)]
+    by_title: Dict[str, List[Dict[str, Any]]] = {}
+    by_dish: Dict[str, List[Dict[str, Any]]] = {}
+    for q in queries:
+        q["relevant_docs"] = []
+        if q["type"] == "title":
+            by_title.setdefault(q["title"], []).append(q)
+        else:
+            by_dish.setdefault(q["dish"], []).append(q)
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        record = make_record(rng, i, vocab)
+        rid = None
+        for q in by_title.get(record["title"], ()):
+            rid = rid or recipe_id(i, count)
+            q["relevant_docs"].append(rid)
+        candidates = by_dish.get(record["dish"])
+        if candidates:
+            ings = set(record["ingredients"])
+            for q in candidates:
+                if q["needs"][0] in ings and q["needs"][1] in ings:
+                    q["relevant_docs"].append(rid or recipe_id(i, count))
+    return [{"query": q["query"], "relevant_docs": q["relevant_docs"], "description": f"synthetic {q['type']} query"}
+            for q in queries]
+
+
+def generate(out: str, count: int, seed: int = 0, vocab_size: int = None, fmt: str = "txt",
+             queries: int = 0, queries_out: str = None) -> Dict[str, Any]:
+    """
+    Write `count` recipes: recipe_*.txt files into the directory `out`, or one JSONL file
+    ({"id", "text"} per line, as backend.ingest reads it) when fmt == "jsonl".
+    With queries > 0, also writes that many labeled queries to queries_out.
+    """
+    vocab = build_vocabulary(vocab_size)
+    rng = random.Random(seed)
+    query_rng = random.Random(seed + 1)
+    target_ids = set(query_rng.sample(range(1, count + 1), min(queries, count))) if queries else set()
+    targets: Dict[int, Dict[str, Any]] = {}
+
+    if fmt == "jsonl":
+        directory = os.path.dirname(out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sink = open(out, "w", encoding="utf-8")
+    else:
+        os.makedirs(out, exist_ok=True)
+        sink = None
+    try:
+        for i in range(1, count + 1):
+            record = make_record(rng, i, vocab)
+            rid = recipe_id(i, count)
+            if sink is not None:
+                sink.write(json.dumps({"id": rid, "text": record["text"]}) + "\n")
+            else:
+                with open(os.path.join(out, rid), "w", encoding="utf-8") as fh:
+                    fh.write(record["text"])
+            if i in target_ids:
+                targets[i] = _make_query(query_rng, record)
+    finally:
+        if sink is not None:
+            sink.close()
+
+    stats = {"recipes": count, "vocab_size": sum(len(v) for v in vocab.values()), "queries": 0}
+    if targets:
+        labeled = label_queries(count, seed, targets, vocab)
+        with open(queries_out, "w", encoding="utf-8") as fh:
+            for q in labeled:
+                fh.write(json.dumps(q) + "\n")
+        sizes = sorted(len(q["relevant_docs"]) for q in labeled)
+        stats.update(queries=len(labeled), relevant_median=sizes[len(sizes) // 2], relevant_max=sizes[-1])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic recipe corpus')
+    parser.add_argument('--out', required=True,
+                       help='Output directory for recipe_*.txt files (or a .jsonl file with --format jsonl)')
+    parser.add_argument('--count', type=int, default=1000,
+                       help='Number of recipes')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed (same seed -> same corpus)')
+    parser.add_argument('--vocab-size', type=int,
+                       help='Distinct cuisine ingredients (default: the 60 base names); larger -> more selective queries')
+    parser.add_argument('--format', choices=['txt', 'jsonl'], default='txt',
+                       help='One file per recipe, or a single JSONL dump for tools/ingest_corpus.py')
+    parser.add_argument('--queries', type=int, default=0,
+                       help='Labeled queries to generate')
+    parser.add_argument('--queries-out', default='ground_truth.jsonl',
+                       help='Where to write the labeled queries')
+    args = parser.parse_args()
+    stats = generate(args.out, args.count, args.seed, args.vocab_size, args.format, args.queries, args.queries_out)
+    print(f"Wrote {args.count} recipes to {args.out}")
+    if stats["queries"]:
+        print(f"Wrote {stats['queries']} labeled queries to {args.queries_out} "
+              f"(relevant docs per query: median {stats['relevant_median']}, max {stats['relevant_max']})")
+
+
+if __name__ == "__main__":
+    main()
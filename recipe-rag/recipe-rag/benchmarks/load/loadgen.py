@@ -0,0 +1,331 @@
+# HTTP load generator for the API: closed-loop (N concurrent users) or open-loop (Poisson arrivals)
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import httpx
+
+sys.path.append(str(Path(__file__).parent))
+
+from gen_corpus import CUISINES, PANTRY, ADJECTIVES
+
+DEFAULT_MIX = "search=5,find-recipe=3,health=2"
+# baseline comparison: a metric may get this much worse before it counts as a regression
+DEFAULT_TOLERANCE = 0.15
+# ...and must also be at least this much slower in absolute terms (sub-millisecond noise is not a regression)
+MIN_DELTA_MS = 1.0
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {sorted(unknown)} (known: {sorted(ENDPOINTS)})")
+    return mix
+
+
+class QueryPool:
+    """
+    A fixed pool of distinct queries drawn with Zipf-like popularity, so some queries repeat
+    (as real traffic does, and as the embedding cache sees it) while the tail stays cold.
+    """
+
+    def __init__(self, size: int = 500, zipf_s: float = 1.1, seed: int = 0):
+        self.rng = random.Random(seed)
+        cuisines = list(CUISINES)
+        self.searches, self.ingredient_lists = [], []
+        for _ in range(size):
+            spec = CUISINES[self.rng.choice(cuisines)]
+            dish = self.rng.choice(spec["dishes"]).lower()
+            ing = self.rng.choice(spec["ingredients"])
+            self.searches.append(self.rng.choice([
+                f"{dish} with {ing}",
+                f"{self.rng.choice(ADJECTIVES).lower()} {dish}",
+                f"something with {ing} and {self.rng.choice(PANTRY)}",
+                f"{self.rng.choice(cuisines)} dinner",
+            ]))
+            self.ingredient_lists.append(self.rng.sample(spec["ingredients"], self.rng.randint(1, 3))
+                                         + self.rng.sample(PANTRY, self.rng.randint(0, 3)))
+        weights = 1.0 / np.arange(1, size + 1) ** zipf_s
+        self.cum_weights = list(np.cumsum(weights / weights.sum()))
+        self.indices = list(range(size))
+
+    def pick(self) -> int:
+        return self.rng.choices(self.indices, cum_weights=self.cum_weights)[0]
+
+
+def _search(pool: QueryPool):
+    q = pool.searches[pool.pick()]
+    return "POST", "/search", {"query": q, "k": 5, "collapse": pool.rng.random() < 0.5}
+
+
+def _find_recipe(pool: QueryPool):
+    return "POST", "/find-recipe", {"ingredients": pool.ingredient_lists[pool.pick()]}
+
+
+def _health(pool: QueryPool):
+    return "GET", "/health", None
+
+
+ENDPOINTS = {"search": _search, "find-recipe": _find_recipe, "health": _health}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status: Dict[str, Dict[int, int]] = {}
+        self.recording = False
+
+    def record(self, name: str, latency_ms: float, status: Optional[int]):
+        if not self.recording:
+            return
+        self.latencies.setdefault(name, []).append(latency_ms)
+        codes = self.status.setdefault(name, {})
+        codes[status or 0] = codes.get(status or 0, 0) + 1
+        if status is None or status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, seconds: float) -> Dict[str, Dict]:
+        out = {}
+        names = list(self.latencies) + (["all"] if len(self.latencies) > 1 else [])
+        for name in names:
+            if name == "all":
+                arr = np.concatenate([np.asarray(v) for v in self.latencies.values()])
+                errors = sum(self.errors.values())
+            else:
+                arr = np.asarray(self.latencies[name])
+                errors = self.errors.get(name, 0)
+            out[name] = {
+                "requests": int(arr.size),
+                "errors": errors,
+                "error_rate": round(errors / arr.size, 4) if arr.size else 0.0,
+                "rps": round(arr.size / seconds, 2) if seconds else 0.0,
+                "mean_ms": round(float(arr.mean()), 2),
+                "p50_ms": round(float(np.percentile(arr, 50)), 2),
+                "p95_ms": round(float(np.percentile(arr, 95)), 2),
+                "p99_ms": round(float(np.percentile(arr, 99)), 2),
+                "max_ms": round(float(arr.max()), 2),
+            }
+            if name != "all":
+                out[name]["status"] = {str(k): v for k, v in sorted(self.status[name].items())}
+        return out
+
+
+async def _send(client: httpx.AsyncClient, pool: QueryPool, names: List[str], weights: List[float],
+                recorder: Recorder, scheduled: float = None):
+    name = pool.rng.choices(names, weights=weights)[0]
+    method, path, body = ENDPOINTS[name](pool)
+    start = time.perf_counter()
+    status = None
+    try:
+        resp = await client.request(method, path, json=body)
+        status = resp.status_code
+    except httpx.HTTPError:
+        pass
+    # open loop measures from the scheduled send time, so a stalled server is not hidden
+    # by the generator sending less (coordinated omission)
+    recorder.record(name, (time.perf_counter() - (scheduled or start)) * 1000, status)
+
+
+async def run_closed(client, pool, mix, recorder, concurrency: int, deadline: float):
+    names, weights = list(mix), list(mix.values())
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await _send(client, pool, names, weights, recorder)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+
+
+async def run_open(client, pool, mix, recorder, rate: float, deadline: float, max_in_flight: int):
+    names, weights = list(mix), list(mix.values())
+    in_flight = set()
+    next_at = time.perf_counter()
+    dropped = 0
+    while next_at < deadline:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1  # the client would be the bottleneck; count instead of queueing silently
+        else:
+            task = asyncio.create_task(_send(client, pool, names, weights, recorder, scheduled=next_at))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        next_at += pool.rng.expovariate(rate)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return dropped
+
+
+async def run_load(base_url: str, mix: Dict[str, float], duration: float, warmup: float = 0.0,
+                   concurrency: int = 16, rate: float = None, timeout: float = 30.0, seed: int = 0,
+                   query_pool: int = 500, max_in_flight: int = 1000) -> Dict:
+    """Run one load test; closed-loop with `concurrency` users, or open-loop at `rate` req/s when given."""
+    pool = QueryPool(size=query_pool, seed=seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=max(concurrency, 100 if rate else concurrency),
+                          max_keepalive_connections=max(concurrency, 100 if rate else concurrency))
+    dropped = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for phase, seconds in (("warmup", warmup), ("measure", duration)):
+            if seconds <= 0:
+                continue
+            recorder.recording = phase == "measure"
+            start = time.perf_counter()
+            deadline = start + seconds
+            if rate:
+                dropped += await run_open(client, pool, mix, recorder, rate, deadline, max_in_flight)
+            else:
+                await run_closed(client, pool, mix, recorder, concurrency, deadline)
+            elapsed = time.perf_counter() - start
+
+    return {
+        "config": {
+            "base_url": base_url,
+            "mode": "open" if rate else "closed",
+            "rate": rate,
+            "concurrency": None if rate else concurrency,
+            "mix": mix,
+            "duration": duration,
+            "warmup": warmup,
+            "seed": seed,
+            "query_pool": query_pool,
+        },
+        "environment": {"python": platform.python_version(), "machine": platform.machine(),
+                        "cpus": os.cpu_count(), "host": platform.node()},
+        "timestamp": time.time(),
+        "elapsed_seconds": round(elapsed, 3),
+        "dropped": dropped,
+        "endpoints": recorder.summary(elapsed),
+    }
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Regressions of `result` vs `baseline`: higher tail latency, lower throughput or more errors."""
+    regressions = []
+    for key in ("mode", "rate", "concurrency", "mix"):
+        if baseline.get("config", {}).get(key) != result["config"][key]:
+            regressions.append(f"config {key} differs from baseline ({baseline.get('config', {}).get(key)} "
+                               f"vs {result['config'][key]}); numbers are not comparable")
+    for name, base in baseline.get("endpoints", {}).items():
+        cur = result["endpoints"].get(name)
+        if cur is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if cur[metric] > base[metric] * (1 + tolerance) and cur[metric] - base[metric] >= MIN_DELTA_MS:
+                regressions.append(f"{name} {metric}: {base[metric]:.1f} -> {cur[metric]:.1f}")
+        # throughput only means something in closed loop; open loop fixes the arrival rate
+        if result["config"]["mode"] == "closed" and cur["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name} rps: {base['rps']:.1f} -> {cur['rps']:.1f}")
+        if cur["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name} error_rate: {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+    return regressions
+
+
+def print_report(result: Dict, baseline: Optional[Dict] = None):
+    cfg = result["config"]
+    load = f"rate={cfg['rate']}/s" if cfg["mode"] == "open" else f"concurrency={cfg['concurrency']}"
+    print(f"\n{cfg['mode']}-loop, {load}, {result['elapsed_seconds']:.1f}s against {cfg['base_url']}")
+    header = f"{'endpoint':<14}{'requests':>9}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, s in result["endpoints"].items():
+        print(f"{name:<14}{s['requests']:>9}{s['errors']:>8}{s['rps']:>9.1f}{s['p50_ms']:>9.1f}"
+              f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+        if baseline and name in baseline.get("endpoints", {}):
+            b = baseline["endpoints"][name]
+            print(f"{'  baseline':<14}{b['requests']:>9}{b['errors']:>8}{b['rps']:>9.1f}{b['p50_ms']:>9.1f}"
+                  f"{b['p95_ms']:>9.1f}{b['p99_ms']:>9.1f}{b['max_ms']:>9.1f}")
+    if result["dropped"]:
+        print(f"WARNING: {result['dropped']} arrivals dropped at the in-flight limit (generator saturated)")
+
+
+def finish(result: Dict, output: str = None, baseline_path: str = None, save_baseline: str = None,
+           tolerance: float = DEFAULT_TOLERANCE) -> int:
+    """Print, write JSON, compare/save baselines; returns the process exit code."""
+    baseline = None
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    elif baseline_path:
+        print(f"No baseline at {baseline_path} yet (use --save-baseline to record one)")
+
+    regressions = compare(result, baseline, tolerance) if baseline else []
+    result["baseline"] = baseline_path if baseline else None
+    result["regressions"] = regressions
+    print_report(result, baseline)
+
+    for path in (output, save_baseline):
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"Wrote {path}")
+
+    if regressions:
+        print(f"\nREGRESSIONS vs {baseline_path} (tolerance {tolerance:.0%}):")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    if baseline:
+        print(f"\nNo regressions vs {baseline_path} (tolerance {tolerance:.0%})")
+    return 0
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                       help='Endpoint weights, e.g. "search=5,find-recipe=3,health=2"')
+    parser.add_argument('--duration', type=float, default=30.0,
+                       help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0,
+                       help='Unmeasured seconds before the measurement (fills caches, opens connections)')
+    parser.add_argument('--concurrency', type=int, default=16,
+                       help='Closed loop: concurrent users, each sending its next request when the last returns')
+    parser.add_argument('--rate', type=float,
+                       help='Open loop: Poisson arrivals per second (overrides --concurrency)')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                       help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed for the query mix')
+    parser.add_argument('--query-pool', type=int, default=500,
+                       help='Distinct queries (drawn Zipf-like, so popular ones repeat)')
+    parser.add_argument('--output', '-o',
+                       help='Write results JSON here')
+    parser.add_argument('--baseline',
+                       help='Compare against this results JSON; exit 1 on regression')
+    parser.add_argument('--save-baseline',
+                       help='Also write results to this path as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                       help='Allowed relative slowdown before a metric counts as a regression')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a running Recipe RAG API')
+    parser.add_argument('--url', default='http://localhost:8000',
+                       help='Base URL of the API')
+    add_load_arguments(parser)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.url, parse_mix(args.mix), args.duration, args.warmup,
+                                  args.concurrency, args.rate, args.timeout, args.seed, args.query_pool))
+    sys.exit(finish(result, args.output, args.baseline, args.save_baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
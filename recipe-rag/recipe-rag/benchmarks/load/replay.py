@@ -0,0 +1,298 @@
+# Replay captured production traffic (CAPTURE_FILE or logs/backend.log) with its original timing,
+# optionally against two builds with a per-request diff of the results
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent))
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from loadgen import Recorder
+from backend.capture import parse_line
+
+DEFAULT_INCLUDE = "/search,/find-recipe,/pantry,/shopping-list,/health"
+# keys whose values legitimately differ between runs and builds
+VOLATILE_KEYS = {"elapsed_ms", "index_version", "trace_id", "time_ms", "duration_ms"}
+
+def load_workload(paths: List[str], include: List[str], limit: int = None, max_gap: float = None) -> Dict[str, Any]:
+    """Requests from all sources, sorted by arrival, as offsets from the first one."""
+    records, skipped = [], {"unparsed": 0, "truncated": 0, "excluded": 0}
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                rec = parse_line(line)
+                if rec is None:
+                    skipped["unparsed"] += 1
+                elif rec.get("truncated"):
+                    skipped["truncated"] += 1  # the body was cut at LOG_BODY_MAX_BYTES; cannot resend it
+                elif not any(rec["path"] == p or rec["path"].startswith(p + "/") for p in include):
+                    skipped["excluded"] += 1
+                else:
+                    records.append(rec)
+    records.sort(key=lambda r: r["ts"])
+    if limit:
+        records = records[:limit]
+
+    requests, offset, previous = [], 0.0, None
+    for rec in records:
+        if previous is not None:
+            gap = rec["ts"] - previous
+            # idle stretches (nights, restarts) are compressed so a day of logs stays replayable
+            offset += min(gap, max_gap) if max_gap else gap
+        previous = rec["ts"]
+        requests.append({
+            "offset": round(offset, 6),
+            "method": rec["method"], "path": rec["path"], "query_string": rec.get("query_string") or "",
+            "body": rec.get("body") or "", "accept": rec.get("accept"),
+            "orig_status": rec.get("status"), "orig_ms": rec.get("duration_ms"),
+        })
+    return {"requests": requests, "skipped": skipped,
+            "span_seconds": round(requests[-1]["offset"], 3) if requests else 0.0}
+
+
+def _stream_results(text: str) -> List[Dict[str, Any]]:
+    """Result payloads from an NDJSON or SSE stream."""
+    out, event = [], None
+    for line in text.splitlines():
+        if line.startswith("{"):
+            frame = json.loads(line)
+            if frame.get("event") == "result":
+                out.append(frame["data"])
+        elif line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: ") and event == "result":
+            out.append(json.loads(line[6:]))
+    return out
+
+
+def result_keys(response_text: str, streamed: bool) -> Optional[List[Any]]:
+    """The ranked identity of a response (recipe ids / item names), or None when it has no ranking."""
+    try:
+        if streamed:
+            items = _stream_results(response_text)
+        else:
+            payload = json.loads(response_text)
+            if not isinstance(payload, dict):
+                return None
+            items = payload.get("results", payload.get("items"))
+        if not isinstance(items, list):
+            return None
+        return [it.get("recipe_id") or it.get("filename") or it.get("id") or it.get("name")
+                if isinstance(it, dict) else it for it in items]
+    except ValueError:
+        return None
+
+
+def _canonical(response_text: str) -> str:
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+    try:
+        return json.dumps(strip(json.loads(response_text)), sort_keys=True)
+    except ValueError:
+        return response_text
+
+
+async def replay(base_url: str, workload: Dict[str, Any], speed: float = 1.0, concurrency: int = 64,
+                 timeout: float = 30.0, keep_responses: bool = False) -> Dict[str, Any]:
+    """
+    Send every request at offset / speed seconds after the start (speed 0: as fast as the
+    concurrency limit allows). Latency is measured from the scheduled time, so a server
+    falling behind shows up as latency rather than as a slower replay.
+    """
+    requests = workload["requests"]
+    recorder = Recorder()
+    recorder.recording = True
+    responses: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+    gate = asyncio.Semaphore(concurrency)
+    late = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+
+        async def send(i: int, req: Dict[str, Any]):
+            nonlocal late
+            scheduled = start + (req["offset"] / speed if speed else 0.0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with gate:
+                if speed and time.perf_counter() - scheduled > 0.05:
+                    late += 1  # the concurrency limit, not the server, held this one back
+                if not speed:
+                    scheduled = time.perf_counter()
+                headers = {"content-type": "application/json"} if req["body"] else {}
+                if req.get("accept"):
+                    headers["accept"] = req["accept"]
+                url = req["path"] + (f"?{req['query_string']}" if req["query_string"] else "")
+                status, text = None, ""
+                try:
+                    resp = await client.request(req["method"], url, content=req["body"] or None, headers=headers)
+                    status, text = resp.status_code, resp.text
+                except httpx.HTTPError:
+                    pass
+                recorder.record(req["path"], (time.perf_counter() - scheduled) * 1000, status)
+                if keep_responses:
+                    streamed = req["path"].endswith("/stream")
+                    responses[i] = {"status": status, "keys": result_keys(text, streamed),
+                                    "canonical": None if streamed else _canonical(text)}
+
+        await asyncio.gather(*(send(i, r) for i, r in enumerate(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {"base_url": base_url, "elapsed_seconds": round(elapsed, 3), "late": late,
+            "endpoints": recorder.summary(elapsed), "responses": responses}
+
+
+def diff_runs(workload: Dict[str, Any], a: Dict[str, Any], b: Dict[str, Any], examples: int = 5) -> Dict[str, Any]:
+    """Per endpoint: identical responses, same top result, mean Jaccard overlap of result ids."""
+    per_path: Dict[str, Dict[str, Any]] = {}
+    shown = []
+    for req, ra, rb in zip(workload["requests"], a["responses"], b["responses"]):
+        s = per_path.setdefault(req["path"], {"compared": 0, "identical": 0, "status_mismatch": 0,
+                                              "top1_agree": 0, "ranked": 0, "jaccard_sum": 0.0})
+        s["compared"] += 1
+        if ra["status"] != rb["status"]:
+            s["status_mismatch"] += 1
+            same = False
+        elif ra["keys"] is not None and rb["keys"] is not None:
+            s["ranked"] += 1
+            ka, kb = ra["keys"], rb["keys"]
+            s["top1_agree"] += ka[:1] == kb[:1]
+            union = set(ka) | set(kb)
+            s["jaccard_sum"] += len(set(ka) & set(kb)) / len(union) if union else 1.0
+            same = ka == kb
+        else:
+            same = ra["canonical"] == rb["canonical"]
+        s["identical"] += same
+        if not same and len(shown) < examples:
+            shown.append({"path": req["path"], "body": req["body"][:200],
+                          "a": {"status": ra["status"], "keys": (ra["keys"] or [])[:5]},
+                          "b": {"status": rb["status"], "keys": (rb["keys"] or [])[:5]}})
+    summary = {}
+    for path, s in per_path.items():
+        summary[path] = {
+            "compared": s["compared"],
+            "identical_rate": round(s["identical"] / s["compared"], 4),
+            "status_mismatch": s["status_mismatch"],
+            "top1_agreement": round(s["top1_agree"] / s["ranked"], 4) if s["ranked"] else None,
+            "mean_jaccard": round(s["jaccard_sum"] / s["ranked"], 4) if s["ranked"] else None,
+        }
+    return {"endpoints": summary, "examples": shown}
+
+
+def print_latency(runs: List[Dict[str, Any]]):
+    header = f"{'endpoint':<18}{'build':<7}{'requests':>9}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    names = list(dict.fromkeys(n for run in runs for n in run["endpoints"]))
+    for name in names:
+        for label, run in zip("AB", runs):
+            s = run["endpoints"].get(name)
+            if s:
+                print(f"{name:<18}{label:<7}{s['requests']:>9}{s['errors']:>8}{s['p50_ms']:>9.1f}"
+                      f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+        if len(runs) == 2 and name in runs[0]["endpoints"] and name in runs[1]["endpoints"]:
+            a, b = runs[0]["endpoints"][name], runs[1]["endpoints"][name]
+            deltas = [f"{m[:-3]} {(b[m] / a[m] - 1):+.0%}" if a[m] else f"{m[:-3]} n/a"
+                      for m in ("p50_ms", "p95_ms", "p99_ms")]
+            print(f"{'':<18}{'B vs A':<7}  " + ", ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay captured traffic against one or two builds')
+    parser.add_argument('sources', nargs='+',
+                       help='CAPTURE_FILE JSONL, logs/backend.log (text or LOG_JSON), or a saved workload')
+    parser.add_argument('--url',
+                       help='Build A (e.g. http://localhost:8000); omit to only parse/--save')
+    parser.add_argument('--compare-url',
+                       help='Build B: replay the same workload there too and diff results')
+    parser.add_argument('--speed', type=float, default=1.0,
+                       help='Time compression: 1 = original pacing, 10 = ten times faster, 0 = as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=64,
+                       help='Maximum requests in flight')
+    parser.add_argument('--include', default=DEFAULT_INCLUDE,
+                       help='Comma-separated endpoint paths to replay (sub-paths such as /search/stream included)')
+    parser.add_argument('--limit', type=int,
+                       help='Replay only the first N requests')
+    parser.add_argument('--max-gap', type=float, default=60.0,
+                       help='Compress idle gaps longer than this many seconds (0 keeps them)')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                       help='Per-request timeout in seconds')
+    parser.add_argument('--save',
+                       help='Write the normalized workload (JSONL, replayable with this tool)')
+    parser.add_argument('--output', '-o',
+                       help='Write latency and diff results as JSON')
+    parser.add_argument('--examples', type=int, default=5,
+                       help='Differing requests to show')
+    args = parser.parse_args()
+
+    include = [p.strip().rstrip("/") for p in args.include.split(",") if p.strip()]
+    workload = load_workload(args.sources, include, args.limit, args.max_gap or None)
+    requests = workload["requests"]
+    mix = {}
+    for r in requests:
+        mix[r["path"]] = mix.get(r["path"], 0) + 1
+    print(f"Workload: {len(requests)} requests over {workload['span_seconds']:.1f}s, skipped {workload['skipped']}")
+    for path, n in sorted(mix.items(), key=lambda kv: -kv[1]):
+        print(f"  {path:<22}{n:>8}  ({n / max(1, len(requests)):.1%})")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            first = time.time()
+            for r in requests:
+                # re-anchored at "now" so the saved file parses as a capture file
+                f.write(json.dumps({"ts": first + r["offset"], "method": r["method"], "path": r["path"],
+                                    "query_string": r["query_string"], "body": r["body"], "accept": r["accept"],
+                                    "status": r["orig_status"], "duration_ms": r["orig_ms"]}) + "\n")
+        print(f"Wrote {args.save}")
+    if not args.url or not requests:
+        return
+
+    pace = f"{args.speed:g}x" if args.speed else "max speed"
+    runs = []
+    for url in [args.url] + ([args.compare_url] if args.compare_url else []):
+        print(f"\nReplaying at {pace} against {url} ...", flush=True)
+        run = asyncio.run(replay(url, workload, args.speed, args.concurrency, args.timeout,
+                                 keep_responses=bool(args.compare_url)))
+        print(f"  done in {run['elapsed_seconds']:.1f}s" + (f", {run['late']} requests delayed by the concurrency limit"
+                                                            if run["late"] else ""))
+        runs.append(run)
+
+    print()
+    print_latency(runs)
+    result = {"workload": {"requests": len(requests), "span_seconds": workload["span_seconds"],
+                           "skipped": workload["skipped"], "mix": mix},
+              "settings": {"speed": args.speed, "concurrency": args.concurrency, "max_gap": args.max_gap},
+              "runs": [{k: v for k, v in run.items() if k != "responses"} for run in runs]}
+    if len(runs) == 2:
+        diff = diff_runs(workload, runs[0], runs[1], args.examples)
+        result["diff"] = diff
+        print(f"\nResult diff ({args.url} vs {args.compare_url}):")
+        for path, s in diff["endpoints"].items():
+            extra = "" if s["top1_agreement"] is None else \
+                f", top-1 agreement {s['top1_agreement']:.1%}, mean Jaccard {s['mean_jaccard']:.3f}"
+            print(f"  {path:<22} identical {s['identical_rate']:.1%} of {s['compared']}"
+                  f"{extra}, status mismatches {s['status_mismatch']}")
+        for ex in diff["examples"]:
+            print(f"  - {ex['path']} {ex['body']}\n      A {ex['a']}\n      B {ex['b']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
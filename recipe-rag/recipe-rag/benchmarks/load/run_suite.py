@@ -0,0 +1,139 @@
+# End-to-end load test: fake embeddings server + synthetic corpus + a real uvicorn server + loadgen
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent))
+
+import fake_openai
+import gen_corpus
+import loadgen
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float) -> float:
+    """Poll /health until the index is built; returns seconds waited."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode} during startup")
+        try:
+            if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"Server not ready after {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the end-to-end load-test suite')
+    parser.add_argument('--recipes', type=int, default=1000,
+                       help='Synthetic corpus size')
+    parser.add_argument('--corpus-dir',
+                       help='Use an existing recipe directory instead of generating one')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='uvicorn worker processes')
+    parser.add_argument('--dim', type=int, default=1536,
+                       help='Fake embedding dimension')
+    parser.add_argument('--embed-latency-ms', type=float, default=40.0,
+                       help='Fake embedding base latency')
+    parser.add_argument('--embed-jitter-ms', type=float, default=20.0,
+                       help='Fake embedding uniform jitter')
+    parser.add_argument('--embed-error-rate', type=float, default=0.0,
+                       help='Fraction of embedding calls failing with 429/500/503')
+    parser.add_argument('--startup-timeout', type=float, default=600.0,
+                       help='Seconds to wait for the index build')
+    parser.add_argument('--keep', action='store_true',
+                       help='Keep the temporary directory (corpus, index, server log)')
+    loadgen.add_load_arguments(parser)
+    args = parser.parse_args()
+    if args.baseline is None and args.save_baseline is None:
+        # one baseline per machine and scenario, so numbers from different hardware never mix
+        default = BASELINE_DIR / f"{socket.gethostname()}-{args.recipes}r-{args.workers}w.json"
+        args.baseline = str(default) if default.exists() else None
+
+    workdir = tempfile.mkdtemp(prefix="recipe-load-")
+    corpus = args.corpus_dir or os.path.join(workdir, "recipes")
+    if not args.corpus_dir:
+        gen_corpus.generate(corpus, args.recipes, args.seed)
+        print(f"Generated {args.recipes} recipes in {corpus}")
+
+    embed_port = free_port()
+    embed_server = fake_openai.serve("127.0.0.1", embed_port, dim=args.dim, latency_ms=args.embed_latency_ms,
+                                     per_text_ms=0.2, jitter_ms=args.embed_jitter_ms,
+                                     error_rate=args.embed_error_rate)
+
+    api_port = free_port()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="fake-key",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{embed_port}/v1",
+        RECIPE_DIR=os.path.abspath(corpus),
+        CHROMA_PERSIST_DIR=os.path.join(workdir, "vectordata"),
+        INDEX_POLL_SECONDS="0",
+        WATCH_RECIPES="false",
+        LOG_SAMPLE_RATE=os.getenv("LOG_SAMPLE_RATE", "0.01"),
+        TRACE_EXPORTER=os.getenv("TRACE_EXPORTER", "none"),
+    )
+    # start_server.py: with --workers > 1 the index is built once and shared read-only
+    cmd = [sys.executable, str(REPO_ROOT / "start_server.py"),
+           "--host", "127.0.0.1", "--port", str(api_port), "--workers", str(args.workers),
+           "--log-level", "warning"]
+    log_path = os.path.join(workdir, "server.log")
+    url = f"http://127.0.0.1:{api_port}"
+    # cwd=workdir keeps logs/ and any other relative paths out of the repo
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        startup = wait_ready(url, proc, args.startup_timeout)
+        print(f"Server ready in {startup:.1f}s ({args.workers} worker(s)) at {url}")
+        result = asyncio.run(loadgen.run_load(url, loadgen.parse_mix(args.mix), args.duration, args.warmup,
+                                              args.concurrency, args.rate, args.timeout, args.seed,
+                                              args.query_pool))
+        result["suite"] = {
+            "recipes": args.recipes if not args.corpus_dir else None,
+            "corpus_dir": args.corpus_dir,
+            "workers": args.workers,
+            "startup_seconds": round(startup, 2),
+            "fake_embeddings": dict(fake_openai.FakeEmbeddingHandler.config,
+                                    **fake_openai.FakeEmbeddingHandler.stats),
+        }
+        code = loadgen.finish(result, args.output, args.baseline, args.save_baseline, args.tolerance)
+    except Exception as e:
+        print(f"Load test failed: {e}\nServer log: {log_path}")
+        args.keep = True
+        code = 2
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        embed_server.shutdown()
+        if args.keep:
+            print(f"Kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# Microbenchmark suite for the CPU-bound hot paths: calibrated timings + tracemalloc memory, JSON output
+import gc
+import os
+import sys
+import json
+import time
+import random
+import fnmatch
+import argparse
+import platform
+import statistics
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Any
+
+import numpy as np
+
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent / "load"))
+
+from gen_corpus import make_recipe, CUISINES, PANTRY
+
+BENCHMARKS: Dict[str, Dict[str, Any]] = {}
+# a timed round runs the function this long at least (iterations are calibrated to reach it)
+MIN_ROUND_SECONDS = 0.002
+# median may get this much slower before --compare reports a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def bench(name: str, sizes: List[int], group: str = None):
+    """
+    Register a benchmark. The decorated function is the setup: it gets a size and returns
+    the zero-argument callable to time, so input construction is never measured.
+    """
+    def decorator(setup: Callable[[int], Callable[[], Any]]):
+        BENCHMARKS[name] = {"setup": setup, "sizes": sizes, "group": group or name.split(".")[0]}
+        return setup
+    return decorator
+
+
+# ---------------------------------------------------------------- fixed synthetic inputs
+
+def recipes(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [make_recipe(rng, i) for i in range(n)]
+
+
+def user_ingredients(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    vocab = sorted({ing for spec in CUISINES.values() for ing in spec["ingredients"]} | set(PANTRY))
+    return rng.sample(vocab, min(n, len(vocab)))
+
+
+def retrieved_chunks(n: int, chunks_per_recipe: int = 3, seed: int = 2):
+    """(chunk_id, distance, text) as the vector store returns them."""
+    rng = random.Random(seed)
+    out = []
+    for r, text in enumerate(recipes(max(1, n // chunks_per_recipe), seed)):
+        lines = text.splitlines()
+        step = max(1, len(lines) // chunks_per_recipe)
+        for c in range(chunks_per_recipe):
+            out.append((f"recipe_{r}.txt::chunk_{c}", rng.random(), "\n".join(lines[c * step:(c + 1) * step])))
+    return out[:n]
+
+
+def ranking_data(n: int, k: int = 10, seed: int = 3) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    docs = [f"recipe_{i}.txt" for i in range(2000)]
+    return [{"query": f"q{i}", "retrieved_docs": rng.sample(docs, k), "ground_truth": rng.sample(docs[:200], 3)}
+            for i in range(n)]
+
+
+# ---------------------------------------------------------------- benchmarks
+
+@bench("chunk_text.fixed", sizes=[10, 100, 1000])
+def _chunk_fixed(n):
+    from backend.chunkers import get_chunker
+    chunk, texts = get_chunker("fixed"), recipes(n)
+    return lambda: [chunk(t) for t in texts]
+
+
+@bench("chunk_text.section", sizes=[10, 100, 1000])
+def _chunk_section(n):
+    from backend.chunkers import get_chunker
+    chunk, texts = get_chunker("section"), recipes(n)
+    return lambda: [chunk(t) for t in texts]
+
+
+@bench("tools.extract_ingredients_from_text", sizes=[10, 100, 1000])
+def _extract(n):
+    from backend.tools import extract_ingredients_from_text
+    texts = recipes(n)
+    return lambda: [extract_ingredients_from_text(t) for t in texts]
+
+
+@bench("tools.ingredient_matcher_tool", sizes=[3, 10, 30])
+def _matcher(n):
+    from backend.tools import ingredient_matcher_tool
+    users, texts = user_ingredients(n), recipes(100)
+    return lambda: [ingredient_matcher_tool(users, t) for t in texts]
+
+
+@bench("tools.shopping_list_tool", sizes=[3, 10, 30])
+def _shopping(n):
+    from backend.tools import shopping_list_tool
+    users, texts = user_ingredients(n), recipes(100)
+    return lambda: [shopping_list_tool(users, t) for t in texts]
+
+
+@bench("tools.recipe_search_tool", sizes=[10, 100, 1000])
+def _recipe_search(n):
+    from backend.tools import recipe_search_tool
+    users, chunks = user_ingredients(6), retrieved_chunks(n)
+    return lambda: recipe_search_tool(users, chunks)
+
+
+@bench("chain.rerank_candidates", sizes=[10, 100, 1000])
+def _rerank_candidates(n):
+    from backend.chains import rerank_candidates
+    rng = np.random.default_rng(4)
+    embs = rng.standard_normal((n, 1536)).astype(np.float32)
+    query = embs[0] / np.linalg.norm(embs[0])
+    ings = [list(dict.fromkeys(user_ingredients(random.Random(i).randint(5, 15), seed=i))) for i in range(n)]
+    users, weights = user_ingredients(6), np.array([0.75, 0.25, 0.0], dtype=np.float32)
+    return lambda: rerank_candidates(query, embs, ings, users, weights)
+
+
+@bench("chain.rerank", sizes=[5, 20, 100])
+def _chain_rerank(n):
+    """RecipeChain.rerank end to end (ingredient parsing, stored-vector means, scoring, result dicts)."""
+    from backend.chains import RecipeChain
+    rng = np.random.default_rng(5)
+    chunks = retrieved_chunks(n * 3)
+    groups, stored = {}, {}
+    for cid, dist, text in chunks:
+        g = groups.setdefault(cid.split("::")[0], {"ids": [], "texts": [], "distance": dist})
+        g["ids"].append(cid)
+        g["texts"].append(text)
+        stored[cid] = rng.standard_normal(1536).astype(np.float32).tolist()
+    # only the attributes rerank() reads; no index or API client behind it
+    chain = RecipeChain.__new__(RecipeChain)
+    chain.alpha, chain.beta, chain.gamma, chain.top_n = 0.75, 0.25, 0.0, 3
+    chain.rag = SimpleNamespace(recipe_attrs={}, store=SimpleNamespace(get_embeddings=lambda ids: stored))
+    query = rng.standard_normal(1536).astype(np.float32)
+    users = user_ingredients(6)
+    return lambda: list(chain.rerank(users, query, groups, top_n=n))
+
+
+@bench("evaluator.evaluate_dataset", sizes=[100, 1000, 10000])
+def _evaluate_dataset(n):
+    from ragas.evaluator import RAGEvaluator
+    evaluator, data = RAGEvaluator(), ranking_data(n)
+    return lambda: evaluator.evaluate_dataset(data)
+
+
+@bench("evaluator.evaluate_batch", sizes=[100, 1000, 10000])
+def _evaluate_batch(n):
+    from ragas.evaluator import RAGEvaluator
+    evaluator, data = RAGEvaluator(), ranking_data(n)
+    return lambda: evaluator.evaluate_batch(data, bootstrap=0)
+
+
+@bench("evaluator.evaluate_batch_bootstrap", sizes=[100, 1000, 10000])
+def _evaluate_bootstrap(n):
+    from ragas.evaluator import RAGEvaluator
+    evaluator, data = RAGEvaluator(), ranking_data(n)
+    return lambda: evaluator.evaluate_batch(data, bootstrap=1000)
+
+
+# ---------------------------------------------------------------- runner
+
+def calibrate(fn: Callable[[], Any]) -> int:
+    """Iterations per round so that one round takes at least MIN_ROUND_SECONDS."""
+    iterations = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= MIN_ROUND_SECONDS or iterations >= 1 << 20:
+            return iterations
+        iterations = max(iterations * 2, int(iterations * MIN_ROUND_SECONDS / max(elapsed, 1e-9)))
+
+
+def measure_memory(fn: Callable[[], Any]) -> Dict[str, int]:
+    """
+    One call under tracemalloc (separately from timing, which tracing would distort).
+    peak: high-water mark during the call; retained: still allocated on return (the result plus caches).
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak_bytes": peak - before, "retained_bytes": current - before}
+
+
+def run_one(name: str, size: int, max_time: float, min_rounds: int) -> Dict[str, Any]:
+    fn = BENCHMARKS[name]["setup"](size)
+    fn()  # warmup: imports, lazy compiles, caches
+    iterations = calibrate(fn)
+    samples = []
+    gc.collect()
+    deadline = time.perf_counter() + max_time
+    while len(samples) < min_rounds or time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - t0) / iterations)
+    q1, _, q3 = statistics.quantiles(samples, n=4) if len(samples) > 1 else (samples[0],) * 3
+    median = statistics.median(samples)
+    return {
+        "name": name,
+        "group": BENCHMARKS[name]["group"],
+        "size": size,
+        "rounds": len(samples),
+        "iterations": iterations,
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "mean_s": statistics.fmean(samples),
+        "stddev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "median_s": median,
+        "iqr_s": q3 - q1,
+        "ops": 1.0 / median if median else None,
+        **measure_memory(fn),
+    }
+
+
+def _fmt_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def compare(results: List[Dict[str, Any]], previous: Dict[str, Any], tolerance: float) -> List[str]:
+    before = {(r["name"], r["size"]): r for r in previous.get("benchmarks", [])}
+    regressions = []
+    for r in results:
+        old = before.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        r["change"] = r["median_s"] / old["median_s"] - 1 if old["median_s"] else None
+        # a median only counts as slower when it is also beyond the old run's noise (IQR)
+        if r["median_s"] > old["median_s"] * (1 + tolerance) and r["median_s"] - old["median_s"] > old["iqr_s"]:
+            regressions.append(f"{r['name']}[{r['size']}]: {_fmt_time(old['median_s'])} -> "
+                               f"{_fmt_time(r['median_s'])} ({r['change']:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the CPU hot-path microbenchmarks')
+    parser.add_argument('--filter', '-k', default='*',
+                       help='Glob over benchmark names, e.g. "tools.*" or "*rerank*"')
+    parser.add_argument('--sizes',
+                       help='Comma-separated input sizes overriding every benchmark\'s defaults')
+    parser.add_argument('--max-time', type=float, default=1.0,
+                       help='Seconds of timed rounds per benchmark and size')
+    parser.add_argument('--min-rounds', type=int, default=5,
+                       help='Timed rounds at least, however long they take')
+    parser.add_argument('--json', dest='json_path',
+                       help='Write results to this JSON file')
+    parser.add_argument('--compare',
+                       help='Previous --json output; exit 1 when a median regressed')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                       help='Relative slowdown allowed by --compare')
+    parser.add_argument('--list', action='store_true',
+                       help='List benchmarks and exit')
+    args = parser.parse_args()
+
+    names = [n for n in BENCHMARKS if fnmatch.fnmatch(n, args.filter)]
+    if args.list:
+        for n in names:
+            print(f"{n}  sizes={BENCHMARKS[n]['sizes']}")
+        return
+    sizes_override = [int(s) for s in args.sizes.split(",")] if args.sizes else None
+
+    results = []
+    print("| benchmark | size | median | iqr | ops/s | rounds x iter | peak mem | retained |")
+    print("|---|---|---|---|---|---|---|---|")
+    for name in names:
+        for size in sizes_override or BENCHMARKS[name]["sizes"]:
+            r = run_one(name, size, args.max_time, args.min_rounds)
+            results.append(r)
+            print(f"| {name} | {size} | {_fmt_time(r['median_s'])} | {_fmt_time(r['iqr_s'])} | {r['ops']:,.1f} | "
+                  f"{r['rounds']} x {r['iterations']} | {_fmt_bytes(r['peak_bytes'])} | "
+                  f"{_fmt_bytes(r['retained_bytes'])} |", flush=True)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.json_path:
+        directory = os.path.dirname(args.json_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": time.time(),
+                "environment": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                                "machine": platform.machine(), "cpus": os.cpu_count(), "numpy": np.__version__},
+                "settings": {"max_time": args.max_time, "min_rounds": args.min_rounds,
+                             "min_round_seconds": MIN_ROUND_SECONDS},
+                "benchmarks": results,
+                "regressions": regressions,
+            }, f, indent=2)
+        print(f"\nWrote {args.json_path}")
+
+    if args.compare:
+        if regressions:
+            print(f"\nREGRESSIONS vs {args.compare} (tolerance {args.tolerance:.0%}):")
+            for r in regressions:
+                print(f"  - {r}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# Scaling report: ingest + query synthetic corpora of growing size with the offline embedder, chart the trends
+import os
+import sys
+import json
+import time
+import math
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Any
+
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent / "load"))
+
+import gen_corpus
+
+# metric -> scaling exponent (d log metric / d log recipes) above which a step is flagged:
+# build, size and memory should grow about linearly, query latency far slower
+CLIFF_EXPONENTS = {"build_seconds": 1.25, "index_mb": 1.25, "peak_rss_mb": 1.25, "load_seconds": 1.25,
+                   "query_p95_ms": 0.5}
+
+
+def default_vocab(recipes: int) -> int:
+    """Grow the vocabulary with the corpus so labeled queries keep a handful of relevant docs."""
+    return max(60, min(24000, recipes // 40))
+
+
+def _status_kb(field: str) -> float:
+    """VmRSS / VmHWM from /proc (Linux); falls back to ru_maxrss for the peak elsewhere."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    if field == "VmHWM":
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform == "darwin" else peak
+    return float("nan")
+
+
+def dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] if ordered else float("nan")
+
+
+def run_scale(recipes: int, workdir: str, queries: int, vocab: int, k: int, seed: int) -> Dict[str, Any]:
+    """One scale, in this (fresh) process: generate, ingest, reload, query."""
+    from backend.rag import RecipeRAG
+    from backend.ingest import ingest
+    from ragas.evaluator import RAGEvaluator
+
+    corpus = os.path.join(workdir, f"corpus-{recipes}-v{vocab}-s{seed}.jsonl")
+    labels = corpus.replace(".jsonl", ".queries.jsonl")
+    gen_seconds = None
+    if not (os.path.exists(corpus) and os.path.exists(labels)):
+        t0 = time.perf_counter()
+        gen_corpus.generate(corpus + ".tmp", recipes, seed, vocab, "jsonl", queries, labels)
+        os.replace(corpus + ".tmp", corpus)
+        gen_seconds = time.perf_counter() - t0
+
+    index_dir = os.environ["CHROMA_PERSIST_DIR"]
+    shutil.rmtree(index_dir, ignore_errors=True)
+    rss_start = _status_kb("VmRSS")
+
+    t0 = time.perf_counter()
+    rag = RecipeRAG(persist_dir=index_dir)
+    stats = ingest(corpus, rag=rag, checkpoint_path=os.path.join(index_dir, "ingest.checkpoint.json"))
+    build_seconds = time.perf_counter() - t0
+    rss_built = _status_kb("VmRSS")
+
+    # a worker starting against the finished index
+    del rag
+    t0 = time.perf_counter()
+    rag = RecipeRAG(persist_dir=index_dir)
+    load_seconds = time.perf_counter() - t0
+
+    with open(labels, encoding="utf-8") as f:
+        ground_truth = [json.loads(line) for line in f if line.strip()]
+    latencies, evaluation_data = [], []
+    for item in ground_truth:
+        t0 = time.perf_counter()
+        results = rag.search(item["query"], top_k=k, collapse=True)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        evaluation_data.append({"query": item["query"], "retrieved_docs": [r["recipe_id"] for r in results],
+                                "ground_truth": item["relevant_docs"]})
+    quality = RAGEvaluator().evaluate_batch(evaluation_data, ks=(1, k), bootstrap=0)["metrics"] if evaluation_data else {}
+
+    meta_file = os.path.join(index_dir, "chroma_meta.pkl")
+    return {
+        "recipes": recipes,
+        "chunks": stats["chunks"],
+        "vocab_size": vocab,
+        "generate_seconds": round(gen_seconds, 2) if gen_seconds is not None else None,
+        "build_seconds": round(build_seconds, 2),
+        "records_per_sec": round(stats["records_per_sec"], 1),
+        "index_mb": round(dir_bytes(index_dir) / 2 ** 20, 2),
+        "meta_mb": round(os.path.getsize(meta_file) / 2 ** 20, 2) if os.path.exists(meta_file) else None,
+        "rss_start_mb": round(rss_start / 1024, 1),
+        "rss_built_mb": round(rss_built / 1024, 1),
+        "peak_rss_mb": round(_status_kb("VmHWM") / 1024, 1),
+        "load_seconds": round(load_seconds, 3),
+        "queries": len(latencies),
+        "query_p50_ms": round(percentile(latencies, 50), 3),
+        "query_p95_ms": round(percentile(latencies, 95), 3),
+        "query_p99_ms": round(percentile(latencies, 99), 3),
+        "query_qps": round(len(latencies) / (sum(latencies) / 1000), 1) if latencies else None,
+        f"recall_at_{k}": round(quality.get(f"recall_at_{k}", float("nan")), 4),
+        "mrr": round(quality.get("mrr", float("nan")), 4),
+    }
+
+
+def scaling_exponents(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per consecutive pair of scales: growth exponent of each watched metric, flagged past CLIFF_EXPONENTS."""
+    ok = [r for r in rows if "error" not in r]
+    steps = []
+    for a, b in zip(ok, ok[1:]):
+        step = {"from": a["recipes"], "to": b["recipes"], "exponents": {}, "flags": []}
+        for metric, limit in CLIFF_EXPONENTS.items():
+            if a.get(metric) and b.get(metric) and a[metric] > 0 and b[metric] > 0:
+                e = math.log(b[metric] / a[metric]) / math.log(b["recipes"] / a["recipes"])
+                step["exponents"][metric] = round(e, 2)
+                if e > limit:
+                    step["flags"].append(metric)
+        steps.append(step)
+    return steps
+
+
+def render_markdown(report: Dict[str, Any]) -> str:
+    rows, k = report["results"], report["settings"]["k"]
+    cols = ["recipes", "chunks", "build_seconds", "records_per_sec", "index_mb", "meta_mb", "peak_rss_mb",
+            "load_seconds", "query_p50_ms", "query_p95_ms", "query_p99_ms", f"recall_at_{k}", "mrr"]
+    lines = ["| " + " | ".join(cols) + " |", "|" + "---|" * len(cols)]
+    for r in rows:
+        if "error" in r:
+            lines.append(f"| {r['recipes']} | FAILED: {r['error']} |" + " |" * (len(cols) - 2))
+        else:
+            lines.append("| " + " | ".join(str(r.get(c)) for c in cols) + " |")
+    lines += ["", "| step | " + " | ".join(CLIFF_EXPONENTS) + " |", "|---|" + "---|" * len(CLIFF_EXPONENTS)]
+    for s in report["steps"]:
+        cells = [f"**{s['exponents'][m]}**" if m in s["flags"] else str(s["exponents"].get(m, "")) for m in CLIFF_EXPONENTS]
+        lines.append(f"| {s['from']} -> {s['to']} | " + " | ".join(cells) + " |")
+    lines += ["", "Exponent = growth of the metric per growth of the corpus on a log-log scale (1 = linear). "
+              "Bold marks a step growing faster than expected: the next cliff."]
+    return "\n".join(lines) + "\n"
+
+
+def render_chart(report: Dict[str, Any], path: str) -> bool:
+    """2x2 log-log chart; returns False when matplotlib is not installed."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    rows = [r for r in report["results"] if "error" not in r]
+    if not rows:
+        return False
+    x = [r["recipes"] for r in rows]
+    fig, axes = plt.subplots(2, 2, figsize=(11, 8))
+    panels = [
+        ("Build time (s)", ["build_seconds", "load_seconds"]),
+        ("Index size (MB)", ["index_mb", "meta_mb"]),
+        ("Peak RSS (MB)", ["peak_rss_mb", "rss_built_mb"]),
+        ("Query latency (ms)", ["query_p50_ms", "query_p95_ms", "query_p99_ms"]),
+    ]
+    for ax, (title, metrics) in zip(axes.flat, panels):
+        for metric in metrics:
+            ax.plot(x, [r.get(metric) or float("nan") for r in rows], marker="o", label=metric)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_title(title)
+        ax.set_xlabel("recipes")
+        ax.grid(True, which="both", alpha=0.3)
+        ax.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest and query synthetic corpora of growing size with the offline embedder')
+    parser.add_argument('--scales', default='1000,10000,100000,1000000',
+                       help='Comma-separated corpus sizes')
+    parser.add_argument('--queries', type=int, default=500,
+                       help='Labeled queries per scale')
+    parser.add_argument('--vocab-size', type=int,
+                       help='Ingredient vocabulary (default grows with the corpus: recipes/40, 60..24000)')
+    parser.add_argument('--k', type=int, default=10,
+                       help='Results per query (collapsed to distinct recipes)')
+    parser.add_argument('--dim', type=int, default=384,
+                       help='Hash embedding dimension (EMBED_HASH_DIM)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Corpus seed')
+    parser.add_argument('--workdir', default='logs/scaling',
+                       help='Corpora (reused across runs), indexes and worker logs')
+    parser.add_argument('--timeout', type=float, default=4 * 3600,
+                       help='Seconds allowed per scale before it counts as failed')
+    parser.add_argument('--keep-index', action='store_true',
+                       help='Keep each scale\'s index instead of deleting it after measuring')
+    parser.add_argument('--output', default='logs/scaling_report',
+                       help='Output prefix for .json, .md and .png')
+    parser.add_argument('--run-scale', type=int,
+                       help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+
+    if args.run_scale:
+        # worker mode: one scale per process, so RSS peaks and caches never carry over
+        row = run_scale(args.run_scale, args.workdir, args.queries,
+                        args.vocab_size or default_vocab(args.run_scale), args.k, args.seed)
+        print("RESULT " + json.dumps(row))
+        return
+
+    rows = []
+    for recipes in (int(s) for s in args.scales.split(",")):
+        index_dir = os.path.abspath(os.path.join(args.workdir, f"index-{recipes}"))
+        env = dict(os.environ, EMBED_BACKEND="hash", EMBED_HASH_DIM=str(args.dim), CHROMA_PERSIST_DIR=index_dir,
+                   TRACE_EXPORTER="none", INDEX_POLL_SECONDS="0", SEARCH_CACHE_SIZE="0")
+        cmd = [sys.executable, __file__, "--run-scale", str(recipes), "--workdir", args.workdir,
+               "--queries", str(args.queries), "--k", str(args.k), "--seed", str(args.seed)]
+        if args.vocab_size:
+            cmd += ["--vocab-size", str(args.vocab_size)]
+        log_path = os.path.join(args.workdir, f"scale-{recipes}.log")
+        print(f"[{recipes} recipes] running (log: {log_path})", flush=True)
+        started = time.perf_counter()
+        try:
+            with open(log_path, "w") as log:
+                proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=log, text=True, timeout=args.timeout)
+            result = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+            if proc.returncode != 0 or not result:
+                # e.g. killed by the OOM killer (-9): that is the cliff this report is looking for
+                row = {"recipes": recipes, "error": f"exit code {proc.returncode}"}
+            else:
+                row = json.loads(result[-1][len("RESULT "):])
+        except subprocess.TimeoutExpired:
+            row = {"recipes": recipes, "error": f"timeout after {args.timeout:.0f}s"}
+        row["wall_seconds"] = round(time.perf_counter() - started, 1)
+        rows.append(row)
+        print(f"[{recipes} recipes] " + (row.get("error") or
+              f"build {row['build_seconds']}s, index {row['index_mb']} MB, peak RSS {row['peak_rss_mb']} MB, "
+              f"p95 {row['query_p95_ms']} ms"), flush=True)
+        if not args.keep_index:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": time.time(),
+        "settings": {"scales": args.scales, "queries": args.queries, "vocab_size": args.vocab_size, "k": args.k,
+                     "dim": args.dim, "seed": args.seed, "cpus": os.cpu_count()},
+        "results": rows,
+        "steps": scaling_exponents(rows),
+    }
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    markdown = render_markdown(report)
+    with open(args.output + ".md", "w", encoding="utf-8") as f:
+        f.write(markdown)
+    print("\n" + markdown)
+    charted = render_chart(report, args.output + ".png")
+    print(f"Wrote {args.output}.json, {args.output}.md" + (f", {args.output}.png" if charted else
+                                                           " (install matplotlib for the chart)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 # RAG evaluation module - recall@k, mrr, ndcg, eval logic
 import json
 import logging
-from typing import List, Dict, Any, Tuple
+from itertools import chain
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Union, Callable
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_KS = (1, 5, 10)
+# the keys evaluate_query reports (and evaluate_dataset averages)
+QUERY_METRICS = ('recall_at_1', 'recall_at_5', 'recall_at_10', 'mrr', 'ndcg_at_5', 'ndcg_at_10')
+# bootstrap via multinomial counts over distinct metric values while there are at most this many
+BOOTSTRAP_MAX_DISTINCT = 4096
+
 class RAGEvaluator:
     def __init__(self):
         self.use_semantic_matching = True  # Enable improved evaluation
@@ -53,21 +60,136 @@ class RAGEvaluator:
         return metrics
     
     def evaluate_dataset(self, evaluation_data: List[Dict[str, Any]]) -> Dict[str, float]:
-        """Evaluate the entire dataset and return averaged metrics"""
-        all_metrics = []
-        
-        for item in evaluation_data:
-            query = item['query']
-            retrieved = item['retrieved_docs']
-            ground_truth = item['ground_truth']
-            
-            metrics = self.evaluate_query(query, retrieved, ground_truth)
-            all_metrics.append(metrics)
-        
-        # Average all metrics
-        avg_metrics = {}
-        if all_metrics:
-            for key in all_metrics[0].keys():
-                avg_metrics[key] = np.mean([m[key] for m in all_metrics])
-        
-        return avg_metrics
\ No newline at end of file
+        """Evaluate the entire dataset and return averaged metrics (same values as averaging evaluate_query)"""
+        if not evaluation_data:
+            return {}
+        metrics = self.evaluate_batch(evaluation_data, bootstrap=0)["metrics"]
+        return {k: metrics[k] for k in QUERY_METRICS}
+
+    @staticmethod
+    def encode(evaluation_data: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Doc ids -> integers. Returns (R, rel_rows, rel_codes):
+        R[i, j] is the j-th retrieved doc of query i (-1 padding); (rel_rows, rel_codes) list
+        every relevant doc of every query, duplicates included.
+        """
+        n = len(evaluation_data)
+        retrieved = [item['retrieved_docs'] for item in evaluation_data]
+        relevant = [item['ground_truth'] for item in evaluation_data]
+        ret_lens = np.fromiter(map(len, retrieved), dtype=np.int64, count=n)
+        rel_lens = np.fromiter(map(len, relevant), dtype=np.int64, count=n)
+        # vocabulary first, then one C-level map per list (no Python loop per doc)
+        vocab = dict.fromkeys(chain.from_iterable(retrieved))
+        vocab.update(dict.fromkeys(chain.from_iterable(relevant)))
+        codes = {d: i for i, d in enumerate(vocab)}
+        ret_flat = np.fromiter(map(codes.__getitem__, chain.from_iterable(retrieved)),
+                               dtype=np.int64, count=int(ret_lens.sum()))
+        rel_flat = np.fromiter(map(codes.__getitem__, chain.from_iterable(relevant)),
+                               dtype=np.int64, count=int(rel_lens.sum()))
+
+        width = max(1, int(ret_lens.max())) if n else 1
+        R = np.full((n, width), -1, dtype=np.int64)
+        rows = np.repeat(np.arange(n), ret_lens)
+        cols = np.arange(len(ret_flat)) - np.repeat(np.cumsum(ret_lens) - ret_lens, ret_lens)
+        R[rows, cols] = ret_flat
+        return R, np.repeat(np.arange(n), rel_lens), rel_flat
+
+    @staticmethod
+    def score_matrix(R: np.ndarray, rel_rows: np.ndarray, rel_codes: np.ndarray,
+                     ks: Sequence[int] = DEFAULT_KS) -> Dict[str, np.ndarray]:
+        """
+        Per-query recall@k, ndcg@k and mrr for all queries at once, with the semantics of
+        recall_at_k / ndcg_at_k / mean_reciprocal_rank (recall over distinct docs, NDCG counts
+        repeated hits and uses the raw relevant list length for the ideal DCG).
+        """
+        n, width = R.shape
+        span = int(max(R.max(initial=-1), rel_codes.max(initial=-1))) + 1
+        # (query, doc) pairs as one sorted int64 key set; hits are a searchsorted probe
+        rel_keys = np.sort(rel_rows * span + rel_codes)
+        rel_keys = rel_keys[np.concatenate([[True], rel_keys[1:] != rel_keys[:-1]])] if len(rel_keys) else rel_keys
+        rel_distinct = np.bincount(rel_keys // span, minlength=n) if span else np.zeros(n, dtype=np.int64)
+        rel_raw = np.bincount(rel_rows, minlength=n)
+
+        valid = R >= 0
+        probe = np.arange(n)[:, None] * span + R
+        pos = np.minimum(np.searchsorted(rel_keys, probe), max(len(rel_keys) - 1, 0))
+        hit = valid & (rel_keys[pos] == probe) if len(rel_keys) else np.zeros_like(valid)
+
+        # a doc retrieved twice only counts once towards recall
+        first = np.ones_like(valid)
+        for j in range(1, width):
+            first[:, j] = ~(R[:, :j] == R[:, j:j + 1]).any(axis=1)
+        distinct_hits = np.cumsum(hit & first, axis=1)
+
+        max_k = max(max(ks), width)
+        discount = 1.0 / np.log2(np.arange(max_k) + 2)
+        ideal = np.concatenate([[0.0], np.cumsum(discount)])
+        out: Dict[str, np.ndarray] = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for k in ks:
+                found = distinct_hits[:, min(k, width) - 1]
+                out[f'recall_at_{k}'] = np.where(rel_distinct > 0, found / rel_distinct, 0.0)
+            first_hit = np.argmax(hit, axis=1)
+            out['mrr'] = np.where(hit.any(axis=1), 1.0 / (first_hit + 1), 0.0)
+            for k in ks:
+                dcg = hit[:, :k] @ discount[:min(k, width)]
+                idcg = ideal[np.minimum(rel_raw, k)]
+                out[f'ndcg_at_{k}'] = np.where(idcg > 0, dcg / idcg, 0.0)
+        return out
+
+    @staticmethod
+    def bootstrap_ci(values: np.ndarray, n_boot: int = 1000, confidence: float = 0.95,
+                     rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+        """
+        Percentile bootstrap interval of the mean. Metrics take few distinct values, so a
+        resample is drawn as multinomial counts over those values instead of n indices.
+        """
+        rng = rng or np.random.default_rng(0)
+        n = len(values)
+        if n == 0:
+            return (0.0, 0.0)
+        uniq, counts = np.unique(values, return_counts=True)
+        if len(uniq) <= BOOTSTRAP_MAX_DISTINCT:
+            means = rng.multinomial(n, counts / n, size=n_boot) @ uniq / n
+        else:
+            means = np.array([values[rng.integers(0, n, n)].mean() for _ in range(n_boot)])
+        alpha = (1.0 - confidence) / 2
+        lo, hi = np.quantile(means, [alpha, 1.0 - alpha])
+        return (float(lo), float(hi))
+
+    def _summarize(self, per_query: Dict[str, np.ndarray], idx: Optional[np.ndarray], n_boot: int,
+                   confidence: float, rng: np.random.Generator) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"n": int(len(idx)) if idx is not None else int(len(next(iter(per_query.values()))))}
+        values = {m: (v[idx] if idx is not None else v) for m, v in per_query.items()}
+        out["metrics"] = {m: float(v.mean()) if len(v) else 0.0 for m, v in values.items()}
+        if n_boot:
+            out["ci"] = {m: self.bootstrap_ci(v, n_boot, confidence, rng) for m, v in values.items()}
+        return out
+
+    def evaluate_batch(self, evaluation_data: List[Dict[str, Any]], ks: Sequence[int] = DEFAULT_KS,
+                       bootstrap: int = 1000, confidence: float = 0.95,
+                       slice_by: Optional[Union[str, Callable[[Dict[str, Any]], Any]]] = None,
+                       seed: int = 0, per_query: bool = False) -> Dict[str, Any]:
+        """
+        Vectorized evaluation of a whole labeled set.
+        - metrics: mean recall@k / ndcg@k for every k in ks, and mrr
+        - ci: bootstrap confidence interval per metric (bootstrap=0 skips it)
+        - slices: the same per value of slice_by (an item key such as "category", or a callable)
+        - per_query: the per-query metric arrays, when requested
+        """
+        rng = np.random.default_rng(seed)
+        scores = self.score_matrix(*self.encode(evaluation_data), ks=ks)
+        result = self._summarize(scores, None, bootstrap, confidence, rng)
+        if slice_by is not None:
+            key = slice_by if callable(slice_by) else (lambda item: item.get(slice_by))
+            labels: Dict[str, int] = {}
+            inverse = np.fromiter((labels.setdefault(str(key(item)), len(labels)) for item in evaluation_data),
+                                  dtype=np.int64, count=len(evaluation_data))
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.cumsum(np.bincount(inverse, minlength=len(labels)))[:-1]
+            groups = dict(zip(labels, np.split(order, bounds)))
+            result["slices"] = {name: self._summarize(scores, groups[name], bootstrap, confidence, rng)
+                                for name in sorted(labels)}
+        if per_query:
+            result["per_query"] = scores
+        return result
\ No newline at end of file
@@ -0,0 +1,190 @@
+# Concurrent evaluation runner - bulk query embedding, persistent embedding cache, parallel retrieval
+import os
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+from .evaluator import RAGEvaluator, QUERY_METRICS
+
+logger = logging.getLogger(__name__)
+
+# query vectors survive across runs here; re-running an evaluation only embeds new queries
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "vectordata/query_embeddings.npz")
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", 8))
+# texts per embed() call handed to a worker (Embedder splits further into OPENAI_BATCH_SIZE requests)
+EVAL_EMBED_CHUNK = int(os.getenv("EVAL_EMBED_CHUNK", 256))
+
+
+class PersistentEmbeddingCache:
+    """
+    (model, text) -> vector, stored as one .npz (sha1 keys + float32 matrix).
+    Loaded once, saved once at the end of a run with an atomic replace.
+    """
+
+    def __init__(self, path: str = None):
+        # "" disables persistence (e.g. --embed-cache "")
+        self.path = EMBED_CACHE_PATH if path is None else path
+        self._rows: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        if self.path and os.path.exists(self.path):
+            try:
+                data = np.load(self.path)
+                self._rows = dict(zip(data["keys"].tolist(), data["vectors"]))
+                logger.info(f"Loaded {len(self._rows)} cached embeddings from {self.path}")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable embedding cache {self.path}: {e}")
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha1(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self._rows.get(self.key(model, text))
+
+    def put(self, model: str, text: str, vector):
+        self._rows[self.key(model, text)] = np.asarray(vector, dtype=np.float32)
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._rows)
+
+    def save(self):
+        if not self.path or not self._dirty or not self._rows:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        keys = list(self._rows)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, keys=np.array(keys), vectors=np.stack([self._rows[k] for k in keys]))
+        os.replace(tmp, self.path)
+        self._dirty = False
+        logger.info(f"Saved {len(keys)} embeddings to {self.path}")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values)
+    return {
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+class EvaluationRunner:
+    """
+    Evaluates a RecipeRAG against ground truth:
+    1. embeds every distinct query once, cached ones from the persistent cache, the rest in
+       concurrent bulk embed() calls;
+    2. runs collapsed retrieval for all queries on a thread pool (the HNSW search itself is
+       native code, so queries overlap);
+    3. scores with RAGEvaluator.evaluate_batch and reports per-query metrics, bootstrap
+       confidence intervals and retrieval latency.
+    """
+
+    def __init__(self, rag, k: int = 10, workers: int = None, cache: Optional[PersistentEmbeddingCache] = None,
+                 evaluator: Optional[RAGEvaluator] = None):
+        self.rag = rag
+        self.k = k
+        self.workers = max(1, workers or EVAL_WORKERS)
+        self.cache = cache if cache is not None else PersistentEmbeddingCache()
+        self.evaluator = evaluator or RAGEvaluator()
+
+    def embed_queries(self, queries: List[str]) -> Dict[str, Any]:
+        embedder = self.rag.embedder
+        model = embedder.model
+        vectors: Dict[str, np.ndarray] = {}
+        missing = []
+        for q in dict.fromkeys(queries):
+            v = self.cache.get(model, q)
+            if v is None:
+                missing.append(q)
+            else:
+                vectors[q] = v
+
+        start = time.perf_counter()
+        if missing:
+            chunks = [missing[i:i + EVAL_EMBED_CHUNK] for i in range(0, len(missing), EVAL_EMBED_CHUNK)]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for chunk, embs in zip(chunks, pool.map(embedder.embed, chunks)):
+                    for q, emb in zip(chunk, embs):
+                        v = np.asarray(emb, dtype=np.float32)
+                        vectors[q] = v
+                        # Embedder returns zero vectors when the API is unavailable; never persist those
+                        if v.any():
+                            self.cache.put(model, q, v)
+        self.cache.save()
+        return {
+            "vectors": vectors,
+            "stats": {
+                "distinct_queries": len(vectors),
+                "cache_hits": len(vectors) - len(missing),
+                "embedded": len(missing),
+                "embed_seconds": round(time.perf_counter() - start, 3),
+            },
+        }
+
+    def _retrieve(self, item: Dict[str, Any], q_emb: np.ndarray) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            results = self.rag.search_by_embedding(q_emb.tolist(), top_k=self.k, collapse=True)
+            retrieved = [r["recipe_id"] for r in results]
+            error = None
+        except Exception as e:
+            retrieved, error = [], str(e)
+        latency_ms = (time.perf_counter() - start) * 1000
+        out = {
+            "query": item["query"],
+            "retrieved_docs": retrieved,
+            "ground_truth": item["relevant_docs"],
+            "latency_ms": round(latency_ms, 3),
+        }
+        if error:
+            out["error"] = error
+        return out
+
+    def run(self, ground_truth: List[Dict[str, Any]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        embedded = self.embed_queries([item["query"] for item in ground_truth])
+        vectors = embedded["vectors"]
+
+        retrieval_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            rows = list(pool.map(lambda item: self._retrieve(item, vectors[item["query"]]), ground_truth))
+        retrieval_seconds = time.perf_counter() - retrieval_start
+
+        evaluation_data = [r for r in rows if "error" not in r]
+        scored = self.evaluator.evaluate_batch(evaluation_data, per_query=True) if evaluation_data else {}
+        per_query = scored.get("per_query", {})
+        for i, r in enumerate(evaluation_data):
+            r["metrics"] = {m: float(per_query[m][i]) for m in QUERY_METRICS}
+        metrics = {m: scored["metrics"][m] for m in QUERY_METRICS} if scored else {}
+        failed = [r for r in rows if "error" in r]
+        for r in failed:
+            logger.warning(f"Retrieval failed for '{r['query']}': {r['error']}")
+
+        return {
+            "metrics": metrics,
+            "ci": {m: scored["ci"][m] for m in QUERY_METRICS} if scored else {},
+            "latency_ms": _percentiles([r["latency_ms"] for r in evaluation_data]),
+            "evaluation_data": evaluation_data,
+            "failed": failed,
+            "summary": {
+                "total_queries": len(ground_truth),
+                "successful_queries": len(evaluation_data),
+                "success_rate": len(evaluation_data) / len(ground_truth) if ground_truth else 0.0,
+                "workers": self.workers,
+                "k": self.k,
+                **embedded["stats"],
+                "retrieval_seconds": round(retrieval_seconds, 3),
+                "queries_per_second": round(len(rows) / retrieval_seconds, 1) if retrieval_seconds else None,
+                "wall_seconds": round(time.perf_counter() - started, 3),
+            },
+        }
@@ -13,9 +13,12 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
-from ragas.evaluator import RAGEvaluator
+from ragas.runner import EvaluationRunner
 from backend.rag import RecipeRAG
 
+# per-query details are printed for small ground-truth sets only
+VERBOSE_MAX_QUERIES = 50
+
 def load_ground_truth(file_path):
     """Load ground truth data"""
     ground_truth = []
@@ -47,35 +50,16 @@ def run_evaluation():
         print(f" Failed to initialize RAG: {e}")
         return
     
-    # Initialize evaluator
-    evaluator = RAGEvaluator()
-    
-    # Run evaluation
+    # Run evaluation: queries embedded in bulk (cached across runs), retrieval on EVAL_WORKERS threads
     print(" Running evaluation...")
-    evaluation_data = []
-    
-    for i, item in enumerate(ground_truth, 1):
-        query = item['query']
-        relevant_docs = item['relevant_docs']
-        
-        print(f"  Query {i}/{len(ground_truth)}: {query}")
-        
-        try:
-            # Search using RAG
-            results = rag.search(query, top_k=10)
-            # Extract unique filenames from search results
-            retrieved_filenames = []
-            for chunk_id, distance, content in results:
-                # Map chunk_id to filename using RAG's mapping
-                filename = rag.chunk_to_file.get(chunk_id, "unknown")
-                if filename != "unknown" and filename not in retrieved_filenames:
-                    retrieved_filenames.append(filename)
-            
-            evaluation_data.append({
-                'query': query,
-                'retrieved_docs': retrieved_filenames,
-                'ground_truth': relevant_docs
-            })
+    report = EvaluationRunner(rag, k=10).run(ground_truth)
+    evaluation_data = report["evaluation_data"]
+    
+    if len(ground_truth) <= VERBOSE_MAX_QUERIES:
+        for i, item in enumerate(evaluation_data, 1):
+            retrieved_filenames = item['retrieved_docs']
+            relevant_docs = item['ground_truth']
+            print(f"  Query {i}/{len(ground_truth)}: {item['query']}")
             
             # Show detailed comparison
             retrieved_set = set(retrieved_filenames[:5])
@@ -89,17 +73,16 @@ def run_evaluation():
             else:
                 print(f"    ❌ No matches in top 5")
             print()
-            
-        except Exception as e:
-            print(f" Error processing query: {e}")
-            continue
+    for item in report["failed"]:
+        print(f" Error processing query '{item['query']}': {item['error']}")
     
     # Calculate metrics
     if not evaluation_data:
         print(" No evaluation data available")
         return
     
-    results = evaluator.evaluate_dataset(evaluation_data)
+    results = report["metrics"]
+    summary = report["summary"]
     
     # Display results
     print("\n" + "="*50)
@@ -116,6 +99,13 @@ def run_evaluation():
     print(f"  NDCG@5:    {results.get('ndcg_at_5', 0):.3f}  (Ranking quality in top 5)")
     print(f"  NDCG@10:   {results.get('ndcg_at_10', 0):.3f} (Ranking quality in top 10)")
     
+    latency = report["latency_ms"]
+    print(f"\n PERFORMANCE:")
+    print(f"  Retrieval: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, p99 {latency['p99']:.1f} ms "
+          f"({summary['queries_per_second']} queries/s on {summary['workers']} workers)")
+    print(f"  Embedding: {summary['embedded']} embedded in {summary['embed_seconds']:.1f}s, "
+          f"{summary['cache_hits']} from cache")
+    
     # Interpretation
     print(f"\n INTERPRETATION:")
     recall_1 = results.get('recall_at_1', 0)
@@ -154,12 +144,9 @@ def run_evaluation():
     with open("logs/evaluation_results.json", "w") as f:
         json.dump({
             "metrics": results,
+            "latency_ms": report["latency_ms"],
             "evaluation_data": evaluation_data,
-            "summary": {
-                "total_queries": len(ground_truth),
-                "successful_queries": len(evaluation_data),
-                "success_rate": len(evaluation_data) / len(ground_truth)
-            }
+            "summary": summary
         }, f, indent=2)
     
     print(f"\n Detailed results saved to: logs/evaluation_results.json")
@@ -1,16 +1,62 @@
 #!/usr/bin/env python3
 """
 Startup script for Recipe RAG server
+
+With --workers N > 1 the index is built or validated once by a leader process and the
+workers attach to it read-only (see backend/shared_index.py); --no-preload lets every
+worker load its own copy instead (builds are still serialized by the index lock).
 """
 import sys
 import os
+import argparse
+import multiprocessing
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Import and run the main application
-from backend.main import app
 
-if __name__ == "__main__":
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def prepare(recipe_dir: str):
+    from backend.index_manager import prepare_index
+    prepare_index(recipe_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Recipe RAG API')
+    parser.add_argument('--host', default=os.getenv("API_HOST", "0.0.0.0"),
+                       help='Bind address')
+    parser.add_argument('--port', type=int, default=int(os.getenv("API_PORT", 8000)),
+                       help='Port')
+    parser.add_argument('--workers', type=int, default=int(os.getenv("API_WORKERS", 1)),
+                       help='Worker processes (e.g. one per core)')
+    parser.add_argument('--preload', action=argparse.BooleanOptionalAction, default=_env_flag("API_PRELOAD", "true"),
+                       help='With several workers: prepare the index once, then start the workers read-only on it')
+    parser.add_argument('--log-level', default="info",
+                       help='uvicorn log level')
+    args = parser.parse_args()
+
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+
+    if args.workers <= 1:
+        from backend.main import app
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    if args.preload:
+        # in a child process, so the supervisor itself never holds an index in memory
+        leader = multiprocessing.get_context("spawn").Process(
+            target=prepare, args=(os.getenv("RECIPE_DIR", "../data/recipes"),), name="index-leader")
+        leader.start()
+        leader.join()
+        if leader.exitcode != 0:
+            sys.exit(f"Index preparation failed (exit code {leader.exitcode})")
+        # inherited by the spawned workers
+        os.environ["INDEX_READ_ONLY"] = "true"
+    uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 import streamlit as st
 import requests
 import os
-from typing import List
+from typing import Dict, Optional, Tuple
+from requests.adapters import HTTPAdapter
+
+# Backend base URL; the UI may run on another host
+API_URL = os.getenv("API_URL", "http://localhost:8000").rstrip("/")
+# seconds a health check result is reused across reruns
+HEALTH_CHECK_TTL = float(os.getenv("HEALTH_CHECK_TTL", 15))
+# seconds identical searches are served from st.cache_data
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 300))
+# full recipes kept for ETag revalidation
+RECIPE_CACHE_SIZE = int(os.getenv("RECIPE_CACHE_SIZE", 256))
 
 # Page configuration
 st.set_page_config(
@@ -9,31 +19,75 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive connection pool shared by every rerun and browser session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def recipe_cache() -> Dict[str, Tuple[str, str]]:
+    """recipe_id -> (etag, content), revalidated with If-None-Match"""
+    return {}
+
+@st.cache_data(ttl=HEALTH_CHECK_TTL, show_spinner=False)
 def check_backend():
-    """Check if backend is running"""
+    """Check if backend is running (at most once per HEALTH_CHECK_TTL)"""
     try:
-        response = requests.get("http://localhost:8000/health", timeout=2)
+        response = get_session().get(f"{API_URL}/health", timeout=2)
         return response.status_code == 200
-    except:
+    except requests.RequestException:
         return False
 
-def get_full_recipe(recipe_id: str):
-    """Get full recipe content by reading the original file"""
+@st.cache_data(ttl=SEARCH_CACHE_TTL, show_spinner=False)
+def search(query: str, k: int) -> dict:
+    """POST /search; errors raise and are not cached"""
+    response = get_session().post(f"{API_URL}/search", json={"query": query, "k": k, "collapse": True}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, show_spinner=False)
+def find_recipe(ingredients: Tuple[str, ...]) -> dict:
+    """POST /find-recipe; errors raise and are not cached"""
+    response = get_session().post(f"{API_URL}/find-recipe", json={"ingredients": list(ingredients)}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+def get_full_recipe(recipe_id: str) -> Optional[str]:
+    """Full recipe from GET /recipes/{id}; an unchanged recipe costs a 304 with no body"""
+    cache = recipe_cache()
+    cached = cache.get(recipe_id)
+    headers = {"If-None-Match": cached[0]} if cached else {}
     try:
-        recipe_path = f"../data/recipes/{recipe_id}.txt"
-        if os.path.exists(recipe_path):
-            with open(recipe_path, 'r', encoding='utf-8') as f:
-                return f.read()
-    except:
-        pass
-    return None
+        response = get_session().get(f"{API_URL}/recipes/{recipe_id}", headers=headers, timeout=5)
+    except requests.RequestException:
+        return cached[1] if cached else None
+    if response.status_code == 304 and cached:
+        return cached[1]
+    if response.status_code != 200:
+        cache.pop(recipe_id, None)
+        return None
+    content = response.json().get("content")
+    cache[recipe_id] = (response.headers.get("ETag", ""), content)
+    while len(cache) > RECIPE_CACHE_SIZE:
+        cache.pop(next(iter(cache)))
+    return content
+
+def show_error(e: Exception):
+    if isinstance(e, requests.HTTPError):
+        st.error(f"Search failed: {e.response.status_code}")
+    else:
+        st.error(f"Error: {str(e)}")
 
 def main():
     st.title("Recipe Search")
     
     # Check backend
     if not check_backend():
-        st.error("Backend server is not running!")
+        st.error(f"Backend server is not running at {API_URL}!")
         st.code("python start_server.py")
         return
     
@@ -49,35 +103,26 @@ def main():
         
         if st.button("Search") and query:
             try:
-                response = requests.post(
-                    "http://localhost:8000/search",
-                    json={"query": query, "k": num_results},
-                    timeout=10
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    results = data.get("results", [])
+                data = search(query, num_results)
+                results = data.get("results", [])
+                
+                for i, recipe in enumerate(results):
+                    filename = recipe.get('filename', '')
+                    score = recipe.get('score', 0)
+                    content = recipe.get('content', '')
                     
-                    for i, recipe in enumerate(results):
-                        filename = recipe.get('filename', '')
-                        score = recipe.get('score', 0)
-                        content = recipe.get('content', '')
+                    with st.expander(f"{filename} (Score: {score:.2f})"):
+                        # Try to get full recipe
+                        full_recipe = get_full_recipe(filename)
                         
-                        with st.expander(f"{filename} (Score: {score:.2f})"):
-                            # Try to get full recipe
-                            recipe_name = filename.replace('.txt', '') if filename.endswith('.txt') else filename
-                            full_recipe = get_full_recipe(recipe_name)
-                            
-                            if full_recipe:
-                                st.markdown("**Full Recipe:**")
-                                st.text(full_recipe)
-                            else:
-                                st.markdown("**Recipe Content:**")
-                                st.text(content)
-                else:
-                    st.error(f"Search failed: {response.status_code}")
+                        if full_recipe:
+                            st.markdown("**Full Recipe:**")
+                            st.text(full_recipe)
+                        else:
+                            st.markdown("**Recipe Content:**")
+                            st.text(content)
             except Exception as e:
-                st.error(f"Error: {str(e)}")
+                show_error(e)
     
     with tab2:
         st.header("Search by Ingredients")
@@ -88,50 +133,42 @@ def main():
             
             if ingredients:
                 try:
-                    response = requests.post(
-                        "http://localhost:8000/find-recipe",
-                        json={"ingredients": ingredients},
-                        timeout=10
-                    )
-                    if response.status_code == 200:
-                        result = response.json()
+                    result = find_recipe(tuple(ingredients))
+                    
+                    if "error" not in result:
+                        recipe_id = result.get('recipe_id', '')
+                        score = result.get('score', 0)
+                        matched = result.get('matched_ingredients', [])
+                        missing = result.get('missing_ingredients', [])
+                        
+                        st.success(f"Found: {recipe_id} (Score: {score:.2f})")
+                        
+                        # Show ingredient info
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            if matched:
+                                st.success(f"**Matched ({len(matched)}):**")
+                                for ing in matched:
+                                    st.write(f"• {ing}")
+                        
+                        with col2:
+                            if missing:
+                                st.warning(f"**Missing ({len(missing)}):**")
+                                for ing in missing:
+                                    st.write(f"• {ing}")
                         
-                        if "error" not in result:
-                            recipe_id = result.get('recipe_id', '')
-                            score = result.get('score', 0)
-                            matched = result.get('matched_ingredients', [])
-                            missing = result.get('missing_ingredients', [])
-                            
-                            st.success(f"Found: {recipe_id} (Score: {score:.2f})")
-                            
-                            # Show ingredient info
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                if matched:
-                                    st.success(f"**Matched ({len(matched)}):**")
-                                    for ing in matched:
-                                        st.write(f"• {ing}")
-                            
-                            with col2:
-                                if missing:
-                                    st.warning(f"**Missing ({len(missing)}):**")
-                                    for ing in missing:
-                                        st.write(f"• {ing}")
-                            
-                            # Show full recipe
-                            full_recipe = get_full_recipe(recipe_id)
-                            if full_recipe:
-                                st.markdown("**Complete Recipe:**")
-                                st.text(full_recipe)
-                            else:
-                                st.markdown("**Recipe Content:**")
-                                st.text(result.get('recipe', ''))
+                        # Show full recipe
+                        full_recipe = get_full_recipe(recipe_id)
+                        if full_recipe:
+                            st.markdown("**Complete Recipe:**")
+                            st.text(full_recipe)
                         else:
-                            st.warning("No recipes found with these ingredients")
+                            st.markdown("**Recipe Content:**")
+                            st.text(result.get('recipe', ''))
                     else:
-                        st.error(f"Search failed: {response.status_code}")
+                        st.warning("No recipes found with these ingredients")
                 except Exception as e:
-                    st.error(f"Error: {str(e)}")
+                    show_error(e)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
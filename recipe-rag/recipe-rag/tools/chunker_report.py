@@ -0,0 +1,124 @@
+# CLI script comparing chunkers: chunk count, embedding tokens, index size, recall@k
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.chunkers import CHUNKERS, get_chunker, count_tokens
+
+
+def load_recipes(recipe_dir: str):
+    recipes = []
+    for fname in sorted(os.listdir(recipe_dir)):
+        if fname.lower().endswith(".txt"):
+            with open(os.path.join(recipe_dir, fname), "r", encoding="utf-8") as fh:
+                recipes.append((fname, fh.read().strip()))
+    return recipes
+
+
+def load_ground_truth(file_path: str):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def dir_size(path: str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def static_stats(chunker, recipes):
+    """Stats that need no embedding calls."""
+    chunks = [c for _, text in recipes for c in chunker(text)]
+    tokens = sum(count_tokens(c) for c in chunks)
+    return {
+        "recipes": len(recipes),
+        "chunks": len(chunks),
+        "chunks_per_recipe": len(chunks) / max(1, len(recipes)),
+        "embedding_tokens": tokens,
+        "embedded_chars": sum(len(c) for c in chunks),
+        "source_chars": sum(len(t) for _, t in recipes),
+    }
+
+
+def retrieval_stats(chunker, recipe_dir, ground_truth, k_values):
+    """Build a throwaway index with this chunker and score it on the ground-truth set."""
+    from backend.rag import RecipeRAG
+    from ragas.evaluator import RAGEvaluator
+
+    tmp = tempfile.mkdtemp(prefix=f"chunker_{chunker.name}_")
+    try:
+        rag = RecipeRAG(recipe_dir=os.path.abspath(recipe_dir), persist_dir=tmp, chunker=chunker)
+        rag.build_index()
+        index_bytes = dir_size(tmp)
+        evaluator = RAGEvaluator()
+        max_k = max(k_values)
+        recalls = {k: [] for k in k_values}
+        for item in ground_truth:
+            # over-fetch chunks so every chunker is compared on distinct recipes
+            results = rag.search(item['query'], top_k=max_k * 4)
+            retrieved = []
+            for chunk_id, _, _ in results:
+                fname = rag.chunk_to_file.get(chunk_id, "unknown")
+                if fname != "unknown" and fname not in retrieved:
+                    retrieved.append(fname)
+            for k in k_values:
+                recalls[k].append(evaluator.recall_at_k(retrieved, item['relevant_docs'], k))
+        out = {"index_bytes": index_bytes}
+        for k in k_values:
+            out[f"recall_at_{k}"] = sum(recalls[k]) / max(1, len(recalls[k]))
+        return out
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare recipe chunkers')
+    parser.add_argument('--recipes', default='data/recipes',
+                       help='Directory with recipe .txt files')
+    parser.add_argument('--ground-truth', default='data/ground_truth/ground_truth.jsonl',
+                       help='Path to ground truth JSONL file')
+    parser.add_argument('--chunkers', default=",".join(CHUNKERS),
+                       help='Comma-separated chunker names')
+    parser.add_argument('--k', default="1,5,10",
+                       help='Comma-separated k values for recall@k')
+    parser.add_argument('--static-only', action='store_true',
+                       help='Skip index builds (no embedding calls)')
+    parser.add_argument('--output', default='logs/chunker_report.json',
+                       help='Output file for the report')
+
+    args = parser.parse_args()
+    recipes = load_recipes(args.recipes)
+    k_values = [int(k) for k in args.k.split(",")]
+    ground_truth = [] if args.static_only else load_ground_truth(args.ground_truth)
+
+    report = {}
+    for name in args.chunkers.split(","):
+        chunker = get_chunker(name)
+        report[name] = static_stats(chunker, recipes)
+        if not args.static_only:
+            report[name].update(retrieval_stats(chunker, args.recipes, ground_truth, k_values))
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    columns = ["chunks", "chunks_per_recipe", "embedding_tokens", "index_bytes"] + [f"recall_at_{k}" for k in k_values]
+    columns = [c for c in columns if any(c in r for r in report.values())]
+    print("| chunker | " + " | ".join(columns) + " |")
+    print("|---" * (len(columns) + 1) + "|")
+    for name, row in report.items():
+        cells = []
+        for c in columns:
+            v = row.get(c, "")
+            cells.append(f"{v:.3f}" if isinstance(v, float) else str(v))
+        print(f"| {name} | " + " | ".join(cells) + " |")
+    print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
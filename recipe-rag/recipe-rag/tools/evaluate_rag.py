@@ -8,7 +8,7 @@ from pathlib import Path
 # Add parent directory to path to import backend modules
 sys.path.append(str(Path(__file__).parent.parent))
 
-from ragas.evaluator import RAGEvaluator
+from ragas.runner import EvaluationRunner, PersistentEmbeddingCache, EVAL_WORKERS, EMBED_CACHE_PATH
 from backend.rag import RAGPipeline
 
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +31,10 @@ def main():
                        help='Number of documents to retrieve for each query')
     parser.add_argument('--output', default='logs/evaluation_results.json',
                        help='Output file for evaluation results')
+    parser.add_argument('--workers', type=int, default=EVAL_WORKERS,
+                       help='Concurrent embedding/retrieval workers')
+    parser.add_argument('--embed-cache', default=EMBED_CACHE_PATH,
+                       help='Persistent query embedding cache (empty string disables)')
     
     args = parser.parse_args()
     
@@ -43,39 +47,27 @@ def main():
     rag_pipeline = RAGPipeline()
     rag_pipeline.setup()
     
-    # Initialize evaluator
-    evaluator = RAGEvaluator()
+    # Run evaluation (bulk query embedding, concurrent retrieval)
+    logger.info(f"Running evaluation on {args.workers} workers")
+    runner = EvaluationRunner(rag_pipeline.recipe_rag, k=args.k, workers=args.workers,
+                              cache=PersistentEmbeddingCache(args.embed_cache))
+    report = runner.run(ground_truth)
+    results = report["metrics"]
     
-    # Prepare evaluation data
-    evaluation_data = []
-    
-    for item in ground_truth:
-        query = item['query']
-        relevant_docs = item['relevant_docs']
-        
-        # Retrieve documents using RAG pipeline
-        retrieved_results = rag_pipeline.retrieve(query, k=args.k)
-        retrieved_docs = [result['filename'] for result in retrieved_results]
-        
-        evaluation_data.append({
-            'query': query,
-            'retrieved_docs': retrieved_docs,
-            'ground_truth': relevant_docs
-        })
-    
-    # Run evaluation
-    logger.info("Running evaluation")
-    results = evaluator.evaluate_dataset(evaluation_data)
-    
-    # Save results
+    # Save results; per-query rows carry retrieved docs, metrics and latency_ms
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
     with open(args.output, 'w') as f:
-        json.dump(results, f, indent=2)
+        json.dump(report, f, indent=2)
     
     # Print results
     print("\n=== RAG Evaluation Results ===")
     for metric, value in results.items():
         print(f"{metric}: {value:.4f}")
+    print("\n=== Latency (ms) ===")
+    for stat, value in report["latency_ms"].items():
+        print(f"{stat}: {value:.2f}")
+    for key, value in report["summary"].items():
+        print(f"{key}: {value}")
     
     logger.info(f"Results saved to {args.output}")
 
@@ -0,0 +1,53 @@
+# CLI script to bulk-ingest recipe dumps (JSONL / CSV / tar / zip) into the vector index
+import json
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.rag import RecipeRAG
+from backend.ingest import ingest, DEFAULT_FIELD_MAP, INGEST_BATCH_SIZE, INGEST_CHECKPOINT_EVERY
+
+
+def parse_field_overrides(pairs):
+    """--field id=sku --field instructions=method_text"""
+    field_map = {k: list(v) for k, v in DEFAULT_FIELD_MAP.items()}
+    for pair in pairs or []:
+        key, _, name = pair.partition("=")
+        if key not in field_map or not name:
+            raise SystemExit(f"Invalid --field '{pair}' (keys: {', '.join(field_map)})")
+        field_map[key].insert(0, name)
+    return field_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a recipe catalog dump into the vector index')
+    parser.add_argument('source', nargs='+',
+                       help='JSONL, CSV, tar(.gz) or zip files to ingest')
+    parser.add_argument('--checkpoint',
+                       help='Checkpoint file (default: <source>.checkpoint.json); only valid with one source')
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE,
+                       help='Records per embedding batch')
+    parser.add_argument('--checkpoint-every', type=int, default=INGEST_CHECKPOINT_EVERY,
+                       help='Persist index + checkpoint every N records')
+    parser.add_argument('--limit', type=int,
+                       help='Stop after N records (resume later from the checkpoint)')
+    parser.add_argument('--field', action='append', metavar='KEY=NAME',
+                       help='Map a record field onto id/title/ingredients/instructions/text')
+
+    args = parser.parse_args()
+    if args.checkpoint and len(args.source) > 1:
+        parser.error("--checkpoint can only be used with a single source")
+
+    field_map = parse_field_overrides(args.field)
+    rag = RecipeRAG()
+    for source in args.source:
+        stats = ingest(source, rag=rag, checkpoint_path=args.checkpoint, batch_size=args.batch_size,
+                       checkpoint_every=args.checkpoint_every, field_map=field_map, limit=args.limit)
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
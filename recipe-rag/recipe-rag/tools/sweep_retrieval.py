@@ -0,0 +1,290 @@
+# CLI script sweeping chunking and re-ranking parameters: quality vs index size vs query latency
+import os
+import json
+import time
+import shutil
+import argparse
+import itertools
+import tempfile
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path to import backend modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.chunkers import get_chunker
+from ragas.runner import PersistentEmbeddingCache, EMBED_CACHE_PATH
+
+# grid keys that change the index (one build per combination) vs. query-time re-ranking
+INDEX_KEYS = ("chunker", "chunk_size", "chunk_overlap", "chunk_max_tokens")
+RERANK_KEYS = ("top_k_raw", "embed_weight", "ing_weight")
+DEFAULTS = {
+    "chunker": os.getenv("CHUNKER", "fixed"),
+    "chunk_size": int(os.getenv("CHUNK_SIZE", 800)),
+    "chunk_overlap": int(os.getenv("CHUNK_OVERLAP", 100)),
+    "chunk_max_tokens": int(os.getenv("CHUNK_MAX_TOKENS", 512)),
+    "top_k_raw": int(os.getenv("RERANK_TOPK_RAW", 5)),
+    "embed_weight": float(os.getenv("RERANK_EMBED_WEIGHT", 0.75)),
+    "ing_weight": None,  # None = 1 - embed_weight
+}
+
+
+def load_recipes(recipe_dir: str):
+    recipes = []
+    for fname in sorted(os.listdir(recipe_dir)):
+        if fname.lower().endswith(".txt"):
+            with open(os.path.join(recipe_dir, fname), "r", encoding="utf-8") as fh:
+                recipes.append((fname, fh.read().strip()))
+    return recipes
+
+
+def load_ground_truth(file_path: str):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def dir_size(path: str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def make_chunker(params):
+    if params["chunker"] == "section":
+        return get_chunker("section", max_tokens=params["chunk_max_tokens"])
+    return get_chunker(params["chunker"], size=params["chunk_size"], overlap=params["chunk_overlap"])
+
+
+def index_key(params):
+    # section chunking ignores size/overlap, fixed ignores max_tokens: don't build duplicates
+    if params["chunker"] == "section":
+        return ("section", params["chunk_max_tokens"])
+    return (params["chunker"], params["chunk_size"], params["chunk_overlap"])
+
+
+def expand_grid(grid):
+    """Cartesian product of the grid over DEFAULTS -> {index_key: (index params, [rerank params])}."""
+    unknown = set(grid) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown grid keys: {', '.join(sorted(unknown))}")
+    keys = list(DEFAULTS)
+    axes = [grid.get(k, [DEFAULTS[k]]) for k in keys]
+    variants = {}
+    for combo in itertools.product(*axes):
+        params = dict(zip(keys, combo))
+        if params["ing_weight"] is None:
+            params["ing_weight"] = round(1.0 - params["embed_weight"], 6)
+        index_params = {k: params[k] for k in INDEX_KEYS}
+        # blank out what the chunker ignores so the table does not suggest it mattered
+        for k in (("chunk_size", "chunk_overlap") if params["chunker"] == "section" else ("chunk_max_tokens",)):
+            index_params[k] = None
+        rerank = {k: params[k] for k in RERANK_KEYS}
+        entry = variants.setdefault(index_key(index_params), (index_params, []))
+        if rerank not in entry[1]:
+            entry[1].append(rerank)
+    return variants
+
+
+def chain_query(item):
+    """Ingredient list for the chain: the item's "ingredients" if present, else the query words."""
+    return item.get("ingredients") or item["query"].split()
+
+
+class CachedEmbedder:
+    """Embedder stand-in for sweep workers: vectors come from the shared cache, misses go to the API."""
+
+    def __init__(self, cache: PersistentEmbeddingCache, model: str):
+        self.cache = cache
+        self.model = model
+        self.misses = 0
+        self._embedder = None
+
+    def embed(self, texts):
+        out = [self.cache.get(self.model, t) for t in texts]
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing:
+            if self._embedder is None:
+                from backend.embeddings import Embedder
+                self._embedder = Embedder(self.model)
+            self.misses += len(missing)
+            for i, emb in zip(missing, self._embedder.embed([texts[i] for i in missing])):
+                out[i] = emb
+        return [v.tolist() if hasattr(v, "tolist") else v for v in out]
+
+
+def prefetch_embeddings(variants, recipes, ground_truth, cache: PersistentEmbeddingCache, model: str):
+    """Embed every distinct chunk (across all variants) and query once; identical chunks are shared."""
+    texts = {}
+    for index_params, _ in variants.values():
+        chunker = make_chunker(index_params)
+        for _, raw in recipes:
+            for chunk in chunker(raw):
+                texts[chunk] = None
+    for item in ground_truth:
+        texts[item["query"]] = None
+        texts[" ".join(chain_query(item))] = None
+    missing = [t for t in texts if cache.get(model, t) is None]
+    start = time.perf_counter()
+    if missing:
+        from backend.embeddings import Embedder
+        for t, emb in zip(missing, Embedder(model).embed(missing)):
+            v = np.asarray(emb, dtype=np.float32)
+            if v.any():  # zero vectors mean the API failed; don't cache them
+                cache.put(model, t, v)
+    cache.save()
+    return {"distinct_texts": len(texts), "embedded": len(missing), "cached": len(texts) - len(missing),
+            "embed_seconds": round(time.perf_counter() - start, 3)}
+
+
+def _latency(values):
+    arr = np.asarray(values) if values else np.zeros(1)
+    return round(float(np.percentile(arr, 50)), 3), round(float(np.percentile(arr, 95)), 3)
+
+
+def evaluate_variant(index_params, rerank_params, recipe_dir, ground_truth, cache_path, model, k):
+    """Worker process: build one index in a temp store, score semantic search and every re-rank setting."""
+    from backend.rag import RecipeRAG
+    from backend.chains import RecipeChain
+    from ragas.evaluator import RAGEvaluator
+
+    cache = PersistentEmbeddingCache(cache_path)
+    embedder = CachedEmbedder(cache, model)
+    evaluator = RAGEvaluator()
+    tmp = tempfile.mkdtemp(prefix="sweep_")
+    try:
+        rag = RecipeRAG(recipe_dir=os.path.abspath(recipe_dir), persist_dir=tmp, chunker=make_chunker(index_params))
+        rag.embedder = embedder
+        start = time.perf_counter()
+        rag.build_index()
+        build_seconds = time.perf_counter() - start
+        base = {
+            **index_params,
+            "chunks": len(rag.chunk_to_file),
+            "index_bytes": dir_size(tmp),
+            "build_seconds": round(build_seconds, 3),
+        }
+
+        # semantic search depends on the index only
+        data, latencies = [], []
+        for item in ground_truth:
+            t0 = time.perf_counter()
+            results = rag.search(item["query"], top_k=k, collapse=True)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            data.append({"query": item["query"], "retrieved_docs": [r["recipe_id"] for r in results],
+                         "ground_truth": item["relevant_docs"]})
+        p50, p95 = _latency(latencies)
+        search = {f"search_{name}": float(v) for name, v in evaluator.evaluate_dataset(data).items()}
+        search.update(search_p50_ms=p50, search_p95_ms=p95)
+
+        # ingredient chain: one row per re-rank setting on the same index
+        rows = []
+        chain = RecipeChain(rag)
+        for rerank in rerank_params:
+            chain.top_k_raw, chain.alpha, chain.beta = rerank["top_k_raw"], rerank["embed_weight"], rerank["ing_weight"]
+            data, latencies = [], []
+            for item in ground_truth:
+                t0 = time.perf_counter()
+                # as served: the re-ranked pool is the top_k_raw nearest recipes, never topped up to k
+                result = chain.run(chain_query(item), top_n=min(k, rerank["top_k_raw"]))
+                latencies.append((time.perf_counter() - t0) * 1000)
+                data.append({"query": item["query"], "retrieved_docs": [r["recipe_id"] for r in result.get("results", [])],
+                             "ground_truth": item["relevant_docs"]})
+            p50, p95 = _latency(latencies)
+            metrics = {f"chain_{name}": float(v) for name, v in evaluator.evaluate_dataset(data).items()}
+            rows.append({**base, **rerank, **search, **metrics, "chain_p50_ms": p50, "chain_p95_ms": p95,
+                         "embedding_misses": embedder.misses})
+        return rows
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(",")] if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep chunking / re-ranking parameters against ground truth')
+    parser.add_argument('--recipes', default='data/recipes',
+                       help='Directory with recipe .txt files')
+    parser.add_argument('--ground-truth', default='data/ground_truth/ground_truth.jsonl',
+                       help='Path to ground truth JSONL file')
+    parser.add_argument('--grid', default=None,
+                       help='JSON object (or path to a JSON file) of parameter -> list of values, '
+                            f'keys: {", ".join(DEFAULTS)}')
+    parser.add_argument('--chunker', default=None, help='Comma-separated chunker names')
+    parser.add_argument('--chunk-size', default=None, help='Comma-separated CHUNK_SIZE values')
+    parser.add_argument('--chunk-overlap', default=None, help='Comma-separated CHUNK_OVERLAP values')
+    parser.add_argument('--chunk-max-tokens', default=None, help='Comma-separated CHUNK_MAX_TOKENS values (section chunker)')
+    parser.add_argument('--topk-raw', default=None, help='Comma-separated RERANK_TOPK_RAW values')
+    parser.add_argument('--embed-weight', default=None, help='Comma-separated RERANK_EMBED_WEIGHT values')
+    parser.add_argument('--ing-weight', default=None, help='Comma-separated RERANK_ING_WEIGHT values (default 1 - embed weight)')
+    parser.add_argument('--k', type=int, default=10,
+                       help='Results scored per query')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Worker processes (one index variant each)')
+    parser.add_argument('--embed-cache', default=EMBED_CACHE_PATH,
+                       help='Persistent embedding cache shared by all variants and runs')
+    parser.add_argument('--output', default='logs/sweep_retrieval.json',
+                       help='Output file for the sweep results')
+
+    args = parser.parse_args()
+    grid = {}
+    if args.grid:
+        grid = json.load(open(args.grid)) if os.path.exists(args.grid) else json.loads(args.grid)
+    for key, value, cast in [("chunker", args.chunker, str), ("chunk_size", args.chunk_size, int),
+                             ("chunk_overlap", args.chunk_overlap, int), ("chunk_max_tokens", args.chunk_max_tokens, int),
+                             ("top_k_raw", args.topk_raw, int), ("embed_weight", args.embed_weight, float),
+                             ("ing_weight", args.ing_weight, float)]:
+        values = parse_list(value, cast)
+        if values:
+            grid[key] = values
+
+    recipes = load_recipes(args.recipes)
+    ground_truth = load_ground_truth(args.ground_truth)
+    variants = expand_grid(grid)
+    n_configs = sum(len(r) for _, r in variants.values())
+    print(f"{len(variants)} index variants, {n_configs} configurations, {len(ground_truth)} queries")
+
+    from backend.embeddings import Embedder
+    # the active backend's model name ("hash-256" with EMBED_BACKEND=hash), so backends never share cache rows
+    model = Embedder().model
+    cache = PersistentEmbeddingCache(args.embed_cache)
+    prefetch = prefetch_embeddings(variants, recipes, ground_truth, cache, model)
+    print(f"Embeddings: {prefetch['distinct_texts']} distinct texts, {prefetch['cached']} cached, "
+          f"{prefetch['embedded']} embedded in {prefetch['embed_seconds']}s")
+
+    rows = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(variants)))) as pool:
+        futures = {pool.submit(evaluate_variant, index_params, rerank, args.recipes, ground_truth,
+                               cache.path, model, args.k): key
+                   for key, (index_params, rerank) in variants.items()}
+        for future in as_completed(futures):
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"Variant {futures[future]} failed: {e}")
+    elapsed = time.perf_counter() - start
+    rows.sort(key=lambda r: (-r.get("chain_mrr", 0.0), -r.get("search_mrr", 0.0), r["index_bytes"]))
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({"grid": grid, "embeddings": prefetch, "sweep_seconds": round(elapsed, 3), "results": rows}, f, indent=2)
+
+    columns = ["chunker", "chunk_size", "chunk_overlap", "chunk_max_tokens", "top_k_raw", "embed_weight", "ing_weight",
+               "chunks", "index_bytes", "search_recall_at_5", "search_mrr", "search_p50_ms",
+               "chain_recall_at_5", "chain_mrr", "chain_ndcg_at_10", "chain_p50_ms", "chain_p95_ms"]
+    print("| " + " | ".join(columns) + " |")
+    print("|---" * len(columns) + "|")
+    for row in rows:
+        cells = []
+        for c in columns:
+            v = row.get(c)
+            cells.append(f"{v:.3f}" if isinstance(v, float) else "-" if v is None else str(v))
+        print("| " + " | ".join(cells) + " |")
+    print(f"\nSwept {len(rows)} configurations in {elapsed:.1f}s; report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()